@@ -1,9 +1,13 @@
 """
 AI Analyzer - General-purpose photo analysis using local LLaVA via Ollama
 """
+import hashlib
+import io
 import os
 import json
 import re
+import threading
+import time
 
 try:
     import ollama
@@ -15,6 +19,20 @@ try:
 except ImportError:
     Image = None
 
+from core.duplicate_detector import full_hash
+from core.image_context import ImageContext
+
+# Longest side and JPEG quality of the image sent to the model (overridable
+# in the AI settings).  LLaVA's vision encoder works at a few hundred
+# pixels, so a full-size original only costs base64 and decode time on the
+# host.
+AI_IMAGE_SIZE = 1024
+AI_IMAGE_QUALITY = 85
+
+GENERATE_OPTIONS = {
+    'num_predict': 300,
+    'temperature': 0.1,
+}
 
 SCENE_TYPES = [
     'portrait', 'landscape', 'street', 'event', 'food', 'product',
@@ -35,6 +53,50 @@ SUBJECTS = [
 ]
 
 
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host=None):
+    """Return the shared ollama.Client for ``host`` (None: the default host).
+
+    A client holds an HTTP connection pool, so reusing it keeps connections
+    alive between calls instead of reconnecting for every photo.  Clients
+    are safe to use from several threads.
+    """
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = ollama.Client(host=host) if host else ollama.Client()
+            _clients[host] = client
+        return client
+
+
+def encode_for_model(ctx, max_side=AI_IMAGE_SIZE, quality=AI_IMAGE_QUALITY):
+    """Return ``(payload, encode_ms)``: ``ctx``'s image as a JPEG no larger than ``max_side``.
+
+    Reuses the context's reduced decode.  A JPEG that is already small
+    enough is sent as it is, and images Pillow cannot decode fall back to
+    the original bytes.
+    """
+    started = time.perf_counter()
+    img = ctx.image
+    if img is None or (img.format == 'JPEG' and max(ctx.size) <= max_side):
+        return ctx.data, 0.0
+    if max_side <= ctx.preview_size:
+        preview = ctx.preview
+    else:
+        preview = ImageContext(ctx.filepath, ctx.data, max_side).preview
+    if preview is None:
+        return ctx.data, 0.0
+    if max(preview.size) > max_side:
+        preview = preview.copy()
+        preview.thumbnail((max_side, max_side), Image.LANCZOS)
+    buf = io.BytesIO()
+    preview.save(buf, 'JPEG', quality=quality)
+    return buf.getvalue(), (time.perf_counter() - started) * 1000
+
+
 def get_correction_examples(db, limit=10):
     """Get examples of recent user corrections to help AI learn."""
     try:
@@ -54,31 +116,8 @@ def get_correction_examples(db, limit=10):
         return ""
 
 
-def analyze_image(image_path, db=None):
-    """Use local LLaVA to extract general metadata from a photo.
-
-    Returns a dict with keys: scene_type, composition, subjects,
-    dominant_colors, objects_detected, mood, ai_caption,
-    suggested_hashtags, content_rating, location.
-    """
-    if ollama is None:
-        print("  [Ollama not available — skipping AI analysis]")
-        return _empty_result()
-
-    if Image is None:
-        print("  [Pillow not available — skipping AI analysis]")
-        return _empty_result()
-
-    image = Image.open(image_path)
-
-    # Resize large images for faster processing (max 1024px on longest side)
-    max_size = 1024
-    if max(image.size) > max_size:
-        ratio = max_size / max(image.size)
-        new_size = tuple(int(dim * ratio) for dim in image.size)
-        image = image.resize(new_size, Image.Resampling.LANCZOS)
-        print(f"  [Resized to {new_size} for analysis]")
-
+def build_prompt(db=None):
+    """The analysis prompt, including examples of past user corrections when ``db`` is given."""
     # Build learning context from past corrections
     learning_context = ""
     if db:
@@ -89,7 +128,7 @@ def analyze_image(image_path, db=None):
                 + examples
             )
 
-    prompt = f"""Analyze this photo and respond with ONLY a JSON object. No extra text, no markdown.
+    return f"""Analyze this photo and respond with ONLY a JSON object. No extra text, no markdown.
 
 Return exactly this structure:
 {{
@@ -107,42 +146,303 @@ Return exactly this structure:
 
 Photo:"""
 
-    try:
-        # Use Ollama URL and model from DB settings if available
-        ollama_host = None
-        ollama_model = 'llava'
+
+# Per-call measurements; they describe one model call, so are not cached.
+_METRIC_KEYS = ('ai_payload_bytes', 'ai_encode_ms', 'ai_ttft_ms', 'ai_tokens', 'ai_generate_ms')
+
+
+class CachedResult(dict):
+    """An analysis served from ``ai_results``: no model call was made."""
+    from_cache = True
+
+
+class AnalyzerSession:
+    """Ollama settings and the finished prompt for one database, built once.
+
+    Building them costs a correction-examples query and a credentials
+    decrypt, which used to be paid for every photo.  A session is current
+    until a correction is saved or the Ollama settings change (in any
+    connection: see ``PhotoDatabase.ai_context_version``).  Use
+    :func:`get_session` to share one per database.
+    """
+
+    def __init__(self, db=None):
+        # Read before building, so a change made meanwhile still invalidates.
+        self.version = getattr(db, 'ai_context_version', 0)
+        ai_cfg = {}
         if db:
             try:
                 ai_cfg = db.get_credentials('ollama') or {}
-                if ai_cfg.get('url'):
-                    ollama_host = ai_cfg['url']
-                if ai_cfg.get('model'):
-                    ollama_model = ai_cfg['model']
             except Exception:
                 pass
+        self.host = ai_cfg.get('url') or None
+        self.model = ai_cfg.get('model') or 'llava'
+        self.image_size = int(ai_cfg.get('image_size') or AI_IMAGE_SIZE)
+        self.image_quality = int(ai_cfg.get('image_quality') or AI_IMAGE_QUALITY)
+        self.stream = bool(ai_cfg.get('stream', True))
+        self.prompt = build_prompt(db)
+        self.prompt_hash = prompt_hash(self.image_size, self.image_quality)
+
+    def is_current(self, db=None) -> bool:
+        return self.version == getattr(db, 'ai_context_version', 0)
+
+    @property
+    def client(self):
+        return get_client(self.host)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(db=None) -> AnalyzerSession:
+    """Return the shared AnalyzerSession for ``db``'s database file, rebuilt when stale."""
+    key = getattr(db, 'db_path', None) if db else None
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None or not session.is_current(db):
+            session = AnalyzerSession(db)
+            _sessions[key] = session
+        return session
+
 
-        client_kwargs = {}
-        if ollama_host:
-            client_kwargs['host'] = ollama_host
-
-        import ollama as _ollama_mod
-        client = _ollama_mod.Client(**client_kwargs) if client_kwargs else ollama
-
-        response = client.generate(
-            model=ollama_model,
-            prompt=prompt,
-            images=[image_path],
-            options={
-                'num_predict': 300,
-                'temperature': 0.1,
-            }
+class JsonStreamParser:
+    """Spot the end of the first JSON object in text that arrives in pieces.
+
+    Tracks brace depth outside string literals, so each piece is scanned
+    once.  A balanced span that does not parse (a stray brace in leading
+    chatter) is skipped and the search goes on after it.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.value = None
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece: str) -> dict | None:
+        """Add ``piece``; return the object once it is complete (and on every later call)."""
+        if self.value is not None:
+            return self.value
+        self.text += piece
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._start < 0:
+                if c == '{':
+                    self._start, self._depth = i, 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == '\\':
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == '{':
+                self._depth += 1
+            elif c == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        value = json.loads(text[self._start:i + 1])
+                    except ValueError:
+                        value = None
+                    if isinstance(value, dict):
+                        self.value = value
+                        self.text = text[:i + 1]
+                        return value
+                    self._start = -1
+        self._pos = len(text)
+        return None
+
+
+def _field(chunk, key):
+    # Responses are dicts in older ollama clients and subscriptable models in newer ones.
+    try:
+        return chunk[key]
+    except (KeyError, AttributeError, TypeError):
+        return None
+
+
+def generate_analysis(session, payload) -> tuple[str, dict]:
+    """Run the analysis prompt on ``payload``; return ``(text, metrics)``.
+
+    With ``session.stream`` the reply is read token by token and the stream
+    is closed as soon as a complete JSON object has arrived, which makes
+    Ollama stop generating (LLaVA tends to keep talking after the closing
+    brace).  ``metrics`` holds ``ai_ttft_ms`` (time to first token, streaming
+    only), ``ai_tokens`` and ``ai_generate_ms``.
+    """
+    started = time.perf_counter()
+    if not session.stream:
+        response = session.client.generate(
+            model=session.model,
+            prompt=session.prompt,
+            images=[payload],
+            options=GENERATE_OPTIONS,
         )
-        text = response['response'].strip()
-        return _parse_response(text)
+        return _field(response, 'response').strip(), {
+            'ai_ttft_ms': None,
+            'ai_tokens': _field(response, 'eval_count') or 0,
+            'ai_generate_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    parser = JsonStreamParser()
+    ttft_ms, tokens = None, 0
+    stream = session.client.generate(
+        model=session.model,
+        prompt=session.prompt,
+        images=[payload],
+        options=GENERATE_OPTIONS,
+        stream=True,
+    )
+    try:
+        for chunk in stream:
+            piece = _field(chunk, 'response') or ''
+            if piece:
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                tokens += 1
+            if parser.feed(piece) is not None:
+                break
+            if _field(chunk, 'done'):
+                tokens = _field(chunk, 'eval_count') or tokens
+                break
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+    return parser.text.strip(), {
+        'ai_ttft_ms': ttft_ms,
+        'ai_tokens': tokens,
+        'ai_generate_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def analyze_image(image_path, db=None, ctx=None, raise_errors=False,
+                  image_size=None, image_quality=None, force=False, session=None):
+    """Use local LLaVA to extract general metadata from a photo.
+
+    ``ctx`` is an optional ImageContext for ``image_path``; when omitted the
+    file is read once here and its bytes are handed to Ollama directly.
+    Failures return an empty result, or raise with ``raise_errors`` (so a
+    job queue can retry them).
+
+    The model gets a reduced JPEG (see :func:`encode_for_model`);
+    ``image_size``/``image_quality`` override the AI settings.  Its size
+    and encode time are returned as ``ai_payload_bytes`` and
+    ``ai_encode_ms``, along with the generation metrics from
+    :func:`generate_analysis`.
+
+    With a ``db``, results are cached in ``ai_results`` by file content,
+    model and prompt template (see :func:`prompt_hash`), so duplicates,
+    moved files and unchanged re-analyses return instantly as a
+    :class:`CachedResult`, without the metrics of the original call.
+    ``force`` skips the lookup and refreshes the cached entry.
+
+    Settings and prompt come from ``session``, by default the shared
+    :func:`get_session` for ``db``.
+
+    Returns a dict with keys: scene_type, composition, subjects,
+    dominant_colors, objects_detected, mood, ai_caption,
+    suggested_hashtags, content_rating, location.
+    """
+    if ctx is None:
+        ctx = ImageContext.load(image_path)
+
+    if session is None:
+        session = get_session(db)
+    image_size = int(image_size or session.image_size)
+    image_quality = int(image_quality or session.image_quality)
+    if (image_size, image_quality) == (session.image_size, session.image_quality):
+        p_hash = session.prompt_hash
+    else:
+        p_hash = prompt_hash(image_size, image_quality)
+
+    cache_key = None
+    if db:
+        cache_key = (full_hash(data=ctx.data), session.model, p_hash)
+        if not force:
+            try:
+                cached = db.get_ai_result(*cache_key)
+            except Exception:
+                cached = None
+            if cached is not None:
+                return CachedResult((k, v) for k, v in cached.items() if k not in _METRIC_KEYS)
+
+    if ollama is None:
+        if raise_errors:
+            raise RuntimeError("Ollama is not installed")
+        print("  [Ollama not available — skipping AI analysis]")
+        return _empty_result()
+
+    if Image is None:
+        if raise_errors:
+            raise RuntimeError("Pillow is not installed")
+        print("  [Pillow not available — skipping AI analysis]")
+        return _empty_result()
+
+    try:
+        payload, encode_ms = encode_for_model(ctx, image_size, image_quality)
+
+        text, metrics = generate_analysis(session, payload)
+        result = _parse_response(text)
+        result['ai_payload_bytes'] = len(payload)
+        result['ai_encode_ms'] = round(encode_ms, 1)
+        result.update(metrics)
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"  [AI analysis error: {e}]")
         return _empty_result()
 
+    # Unparseable output is not cached, so the next run asks again.
+    if cache_key and any(result.get(key) for key in ('scene_type', 'ai_caption', 'objects_detected')):
+        try:
+            db.put_ai_result(*cache_key, text,
+                             {k: v for k, v in result.items() if k not in _METRIC_KEYS})
+        except Exception as e:
+            print(f"  [Could not cache AI result: {e}]")
+    return result
+
+
+def generate_alt_text(image_path, db=None, session=None):
+    """One short sentence describing the photo for screen readers; raises on failure."""
+    if ollama is None:
+        raise RuntimeError("Ollama is not installed")
+    if session is None:
+        session = get_session(db)
+    payload, _encode_ms = encode_for_model(ImageContext.load(image_path),
+                                           session.image_size, session.image_quality)
+    response = session.client.chat(
+        model=session.model,
+        messages=[{
+            'role': 'user',
+            'content': (
+                'In one concise sentence (under 125 characters), describe this image '
+                'for a screen reader. Focus on the main subject and action.'
+            ),
+            'images': [payload],
+        }],
+    )
+    return _field(_field(response, 'message'), 'content').strip()
+
+
+def prompt_hash(image_size: int = AI_IMAGE_SIZE, image_quality: int = AI_IMAGE_QUALITY) -> str:
+    """Hash of the prompt template, generation options and image settings.
+
+    The correction examples are left out: they change with every saved
+    correction, which would invalidate the whole cache.  Use ``force`` to
+    re-run a photo with the current examples.
+    """
+    key = json.dumps([build_prompt(), GENERATE_OPTIONS, image_size, image_quality], sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
 
 def _empty_result():
     return {
@@ -0,0 +1,347 @@
+"""
+Concurrent AI analysis for PhotoFlow.
+
+An Ollama host can run several generations at once (``OLLAMA_NUM_PARALLEL``),
+but analysing photos one call at a time leaves it idle between requests.
+AnalyzerService keeps up to ``max_concurrency`` calls in flight over the
+shared keep-alive clients from core.ai_analyzer.
+
+How many calls to run at once is learned, not configured.  While latency
+stays close to the baseline, the host has spare capacity and the limit
+grows.  Once requests start queuing on the host, latency rises in
+proportion and the limit shrinks to match (a gradient limiter, as used for
+adaptive concurrency in RPC clients).  Failed calls halve the limit.
+
+The baseline is the lowest smoothed latency seen.  Every
+``_BASELINE_INTERVAL`` samples it is measured afresh: the limit drops to
+``min_concurrency`` for a few uncontended calls, whose fastest time
+becomes the new baseline.  So a fast outlier cannot pin the limit low for
+the rest of a session, and the baseline cannot creep up under a sustained
+overload either.  Only photo analyses are samples: results served from
+the ai_results cache (``from_cache``) and other calls submitted with
+:meth:`submit_call` say nothing about the model's latency.
+
+Requests carry a priority class: INTERACTIVE (a button in the UI),
+REANALYSIS (photos picked for re-analysis) or BULK (ingest).  Free slots go
+to the most urgent queued request, and an interactive request may use one
+slot over the limit.  So a user waits for at most one running call, even
+behind a 10k-photo import.  ``class_limits`` caps how many calls of a class
+run at once.
+
+``submit`` blocks once twice the current limit of a class is queued or
+running, so a caller that feeds a whole library cannot build an unbounded
+backlog.  One service per database is shared by every caller through
+:func:`get_scheduler`.
+"""
+import collections
+import functools
+import threading
+import time
+from concurrent.futures import Future
+
+from core.database import PhotoDatabase
+
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Priority classes, most urgent first.
+INTERACTIVE = 0
+REANALYSIS = 1
+BULK = 2
+PRIORITIES = (INTERACTIVE, REANALYSIS, BULK)
+
+# Running calls allowed per class (None: only the shared limit applies).
+DEFAULT_CLASS_LIMITS = {INTERACTIVE: 2, REANALYSIS: None, BULK: None}
+# Weight of a new sample in the smoothed latency and limit.
+_SMOOTHING = 0.2
+# Samples between re-measurements of the baseline latency, and the
+# uncontended calls each re-measurement takes.
+_BASELINE_INTERVAL = 100
+_PROBE_SAMPLES = 3
+
+
+def configured_concurrency(db) -> int:
+    """Upper bound on parallel Ollama calls from the AI settings."""
+    try:
+        value = int((db.get_credentials('ollama') or {}).get('parallel') or 0)
+    except Exception:
+        value = 0
+    return value if value > 0 else DEFAULT_MAX_CONCURRENCY
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(db_path, max_concurrency: int | None = None) -> 'AnalyzerService':
+    """Return the AnalyzerService shared by every AI caller on ``db_path``.
+
+    ``max_concurrency`` (e.g. from :func:`configured_concurrency`) updates
+    the shared service's upper bound.
+    """
+    with _schedulers_lock:
+        service = _schedulers.get(db_path)
+        if service is None or service.closed:
+            service = AnalyzerService(db_path, max_concurrency=max_concurrency or DEFAULT_MAX_CONCURRENCY)
+            _schedulers[db_path] = service
+        elif max_concurrency:
+            service.set_max_concurrency(max_concurrency)
+        return service
+
+
+class AnalyzerService:
+    """Run ``analyze(filepath, db)`` on a pool of threads with an adaptive concurrency limit.
+
+    Each worker thread opens its own PhotoDatabase on ``db_path`` (correction
+    examples and Ollama settings are read through it); with no ``db_path``
+    analyze gets None.  Results are delivered through the Future returned by
+    :meth:`submit`; cancelling a queued Future drops the request.
+    """
+
+    def __init__(self, db_path=None, analyze=None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 min_concurrency: int = 1, initial_concurrency: int | None = None,
+                 class_limits: dict | None = None):
+        if analyze is None:
+            from core.ai_analyzer import analyze_image
+            analyze = functools.partial(analyze_image, raise_errors=True)
+        self.db_path = db_path
+        self.analyze = analyze
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.class_limits = {**DEFAULT_CLASS_LIMITS, **(class_limits or {})}
+        start = initial_concurrency or self.min_concurrency
+        self._limit = float(max(self.min_concurrency, min(start, self.max_concurrency)))
+        self._latency = None  # smoothed seconds per call
+        self._best_latency = None
+        self._since_baseline = 0
+        self._probe_limit = None  # limit to restore while the baseline is re-measured
+        self._probe = []
+        self._cond = threading.Condition()
+        self._queues = {priority: collections.deque() for priority in PRIORITIES}
+        self._running = dict.fromkeys(PRIORITIES, 0)
+        self._active = 0
+        self._closed = False
+        self._threads = []
+        # One thread more than the limit can reach: the interactive headroom.
+        self._add_threads(self.max_concurrency + 1)
+
+    # ── Public API ──────────────────────────────────────────────────────
+
+    @property
+    def limit(self) -> int:
+        """Calls currently allowed to run at once."""
+        return int(self._limit)
+
+    @property
+    def latency(self) -> float | None:
+        """Smoothed seconds per call, once a call has finished."""
+        return self._latency
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def available(self, priority: int = BULK) -> int:
+        """How many more submits of ``priority`` would not block."""
+        with self._cond:
+            return max(0, self._capacity() - self._pending(priority))
+
+    def submit(self, filepath: str, block: bool = True, priority: int = BULK) -> Future:
+        """Queue one analysis; returns a Future for its result dict.
+
+        Blocks while ``priority`` is at capacity, or raises RuntimeError when
+        ``block`` is False (and after :meth:`shutdown`).
+        """
+        return self.submit_call(self.analyze, filepath, priority=priority, block=block, measure=True)
+
+    def submit_call(self, fn, *args, priority: int = INTERACTIVE, block: bool = True,
+                    measure: bool = False) -> Future:
+        """Queue ``fn(*args, db)`` in the AI slots; returns a Future for its result.
+
+        For model calls other than the photo analysis (alt text, say), so
+        they are ordered and limited together with it.  Their latency only
+        adapts the limit with ``measure`` (for analyses run through another
+        function).
+        """
+        future = self._enqueue(fn, args, priority, block, measure)
+        if future is None:
+            raise RuntimeError('AnalyzerService is at capacity')
+        return future
+
+    def try_submit(self, filepath: str, priority: int = BULK) -> Future | None:
+        """Queue one analysis if ``priority`` has room; return None when it is at capacity.
+
+        The check and the enqueue happen under one lock, so unlike
+        :meth:`available` followed by :meth:`submit` this cannot fail when
+        the limit drops in between (a failed call halves it).
+        """
+        return self._enqueue(self.analyze, (filepath,), priority, block=False, measure=True)
+
+    def try_submit_call(self, fn, *args, priority: int = INTERACTIVE,
+                        measure: bool = False) -> Future | None:
+        """Like :meth:`submit_call`, but return None instead of waiting for room."""
+        return self._enqueue(fn, args, priority, block=False, measure=measure)
+
+    def cancel(self, priority: int | None = None) -> int:
+        """Cancel the queued requests of ``priority`` (all classes when None); return how many."""
+        with self._cond:
+            dropped = []
+            for p in PRIORITIES if priority is None else (priority,):
+                dropped.extend(self._queues[p])
+                self._queues[p].clear()
+            self._cond.notify_all()
+        for _fn, _args, future, _measure in dropped:
+            future.cancel()
+        return len(dropped)
+
+    def set_max_concurrency(self, max_concurrency: int) -> None:
+        with self._cond:
+            self.max_concurrency = max(1, max_concurrency)
+            self.min_concurrency = min(self.min_concurrency, self.max_concurrency)
+            self._limit = max(self.min_concurrency, min(self._limit, self.max_concurrency))
+            if self._probe_limit is not None:
+                self._probe_limit = max(self.min_concurrency, min(self._probe_limit, self.max_concurrency))
+            self._add_threads(self.max_concurrency + 1)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {'limit': self.limit, 'active': self._active,
+                    'queued': sum(len(q) for q in self._queues.values()),
+                    'running': dict(self._running), 'latency': self._latency}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel queued analyses and stop the workers; running calls finish first."""
+        with self._cond:
+            self._closed = True
+        self.cancel()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    # ── Workers ─────────────────────────────────────────────────────────
+
+    def _add_threads(self, count: int):
+        while len(self._threads) < count:
+            thread = threading.Thread(target=self._worker, daemon=True,
+                                      name=f'AnalyzerService-{len(self._threads)}')
+            self._threads.append(thread)
+            thread.start()
+
+    def _enqueue(self, fn, args, priority: int, block: bool, measure: bool) -> Future | None:
+        with self._cond:
+            while not self._closed and self._pending(priority) >= self._capacity():
+                if not block:
+                    return None
+                self._cond.wait()
+            if self._closed:
+                raise RuntimeError('AnalyzerService is shut down')
+            future = Future()
+            self._queues[priority].append((fn, args, future, measure))
+            self._cond.notify_all()
+        return future
+
+    def _capacity(self) -> int:
+        # One limit's worth queued behind the running calls keeps the host busy.
+        return 2 * self.limit
+
+    def _pending(self, priority: int) -> int:
+        return len(self._queues[priority]) + self._running[priority]
+
+    def _next(self):
+        """Pop the most urgent request allowed to start now, or return None."""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if not queue:
+                continue
+            cap = self.class_limits.get(priority)
+            if cap is not None and self._running[priority] >= cap:
+                continue
+            # Interactive requests get one slot over the limit, so they only
+            # ever wait behind one running call.
+            headroom = 1 if priority == INTERACTIVE else 0
+            if self._active >= self.limit + headroom:
+                return None
+            return priority, queue.popleft()
+        return None
+
+    def _worker(self):
+        db = PhotoDatabase(self.db_path) if self.db_path else None
+        try:
+            while True:
+                with self._cond:
+                    item = None
+                    while not self._closed:
+                        item = self._next()
+                        if item is not None:
+                            break
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    priority, (fn, args, future, measure) = item
+                    self._active += 1
+                    self._running[priority] += 1
+                    alone = self._active <= self.min_concurrency
+                if not future.set_running_or_notify_cancel():
+                    self._finished(priority, None, ok=True)
+                    continue
+                started = time.monotonic()
+                try:
+                    result = fn(*args, db)
+                except Exception as e:
+                    self._finished(priority, None, ok=False)
+                    future.set_exception(e)
+                else:
+                    # A cached result says nothing about the model's latency.
+                    sampled = measure and not getattr(result, 'from_cache', False)
+                    self._finished(priority, time.monotonic() - started if sampled else None, ok=True,
+                                   alone=alone)
+                    future.set_result(result)
+        finally:
+            if db is not None:
+                db.close()
+
+    def _finished(self, priority: int, latency, ok: bool, alone: bool = False):
+        with self._cond:
+            saturated = self._active >= self.limit
+            # Uncontended from start to finish: a clean sample of the baseline.
+            alone = alone and self._active <= self.min_concurrency
+            self._active -= 1
+            self._running[priority] -= 1
+            if not ok:
+                # Timeouts and overload errors: back off quickly.
+                if self._probe_limit is not None:
+                    self._probe_limit = max(self.min_concurrency, self._probe_limit / 2)
+                else:
+                    self._limit = max(self.min_concurrency, self._limit / 2)
+            elif latency is not None:
+                self._adapt(latency, saturated, alone)
+            self._cond.notify_all()
+
+    def _adapt(self, latency: float, saturated: bool, alone: bool = False):
+        """Move the limit towards ``limit * best_latency / latency`` plus one call of headroom."""
+        if self._probe_limit is not None:
+            # Re-measuring the baseline: only uncontended calls count.
+            if alone:
+                self._probe.append(latency)
+            if len(self._probe) >= _PROBE_SAMPLES:
+                self._best_latency = min(self._probe)
+                self._limit, self._probe_limit, self._probe = self._probe_limit, None, []
+            return
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += _SMOOTHING * (latency - self._latency)
+        if self._best_latency is None or self._latency < self._best_latency:
+            self._best_latency = self._latency
+        self._since_baseline += 1
+        if self._since_baseline >= _BASELINE_INTERVAL:
+            self._since_baseline = 0
+            self._probe_limit, self._limit = self._limit, float(self.min_concurrency)
+            return
+        gradient = max(0.5, min(1.0, self._best_latency / self._latency))
+        target = self._limit * gradient + 1
+        if target > self._limit and not saturated:
+            return  # the limit was not in use, so this sample says nothing about a higher one
+        self._limit += _SMOOTHING * (target - self._limit)
+        self._limit = max(self.min_concurrency, min(self._limit, self.max_concurrency))
@@ -2,6 +2,7 @@
 Database management for PhotoFlow
 """
 import sqlite3
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 import json
@@ -9,6 +10,10 @@ from cryptography.fernet import Fernet
 import base64
 import hashlib
 
+# Attempts an analysis job gets before it is marked failed.
+MAX_JOB_ATTEMPTS = 3
+
+
 class CredentialEncryption:
     """Simple encryption/decryption for API credentials"""
     def __init__(self):
@@ -35,7 +40,35 @@ class CredentialEncryption:
         except Exception:
             return ""
 
+@dataclass
+class PhotoFilter:
+    """Filter spec for ``PhotoDatabase.get_filtered_photos``.
+
+    Empty/False fields are ignored. Text fields are matched as
+    case-insensitive substrings, mirroring the FiltersTab semantics.
+    """
+    statuses: list[str] = field(default_factory=list)
+    unanalyzed_only: bool = False
+    released_instagram: bool = False
+    released_tiktok: bool = False
+    scene_type: str = ''
+    mood: str = ''
+    subjects: str = ''
+    location: str = ''
+    package: str = ''
+    quality: str = ''
+    tag: str = ''
+    content_rating: str = ''
+    has_exif: bool = False
+    has_gps: bool = False
+
+
 class PhotoDatabase:
+    # Bumped, for every connection in the process, whenever the correction
+    # examples or the Ollama settings change.  Analyzer sessions
+    # (core.ai_analyzer) rebuild their prompt and client settings then.
+    ai_context_version = 0
+
     def __init__(self, db_path="data/photos.db"):
         """Initialize database connection"""
         self.db_path = db_path
@@ -96,6 +129,16 @@ class PhotoDatabase:
                 ("quality_issues", "TEXT DEFAULT ''"),
                 ("quality_score", "REAL DEFAULT 0.0"),
                 ("file_hash", "TEXT DEFAULT ''"),
+                ("file_size_bytes", "INTEGER DEFAULT 0"),
+                ("partial_hash", "TEXT DEFAULT ''"),
+                ("hash_tier", "TEXT DEFAULT ''"),
+                ("file_mtime_ns", "INTEGER DEFAULT NULL"),
+                ("file_inode", "INTEGER DEFAULT NULL"),
+                ("ai_payload_bytes", "INTEGER DEFAULT 0"),
+                ("ai_encode_ms", "REAL DEFAULT 0.0"),
+                ("ai_ttft_ms", "REAL DEFAULT NULL"),
+                ("ai_tokens", "INTEGER DEFAULT 0"),
+                ("ai_generate_ms", "REAL DEFAULT 0.0"),
                 ("is_trashed", "INTEGER DEFAULT 0"),
                 ("date_trashed", "TIMESTAMP DEFAULT NULL"),
                 ("alt_text", "TEXT DEFAULT ''"),
@@ -104,6 +147,13 @@ class PhotoDatabase:
             for col_name, col_def in new_cols:
                 if col_name not in cols:
                     self.cursor.execute(f"ALTER TABLE photos ADD COLUMN {col_name} {col_def}")
+            if cols and 'hash_tier' not in cols:
+                # file_hash used to be MD5; mark those rows so they are never
+                # compared with the BLAKE2b digests of the tiered hashes.
+                # Runs once, in the connection that adds the column.
+                self.cursor.execute(
+                    "UPDATE photos SET hash_tier = 'md5' WHERE COALESCE(file_hash, '') != ''"
+                )
             self.conn.commit()
         except Exception as e:
             print(f"Warning: could not ensure columns: {e}")
@@ -273,6 +323,49 @@ class PhotoDatabase:
             )
         ''')
 
+        # Duplicate groups: one row per photo that has at least one duplicate.
+        # group_id is the lowest photo id the group has had.
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS duplicate_groups (
+                photo_id INTEGER PRIMARY KEY REFERENCES photos(id) ON DELETE CASCADE,
+                group_id INTEGER NOT NULL,
+                match_type TEXT DEFAULT 'similar'
+            )
+        ''')
+
+        # Persisted analysis work: one row per file and stage ('local' for
+        # EXIF/quality/hashes, 'ai' for the LLaVA call), so an interrupted
+        # run resumes where it stopped.  ``source`` separates bulk imports
+        # from re-analysis runs.
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                filepath TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                photo_id INTEGER,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT DEFAULT '',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(source, filepath, stage)
+            )
+        ''')
+
+        # AI analysis results by image content, model and prompt, so a
+        # duplicate, moved or re-analysed file is not sent to the model again.
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ai_results (
+                file_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                raw_response TEXT DEFAULT '',
+                result TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (file_hash, model, prompt_hash)
+            )
+        ''')
+
         self.conn.commit()
         self._create_indexes()
         self.migrate_schema()
@@ -295,7 +388,7 @@ class PhotoDatabase:
         except Exception:
             pass
     
-    def add_photo(self, filepath, metadata=None):
+    def add_photo(self, filepath, metadata=None, commit=True):
         """Add a photo to the database"""
         filepath = str(Path(filepath).resolve())
         filename = Path(filepath).name
@@ -316,13 +409,14 @@ class PhotoDatabase:
             
             # Update metadata if provided
             if metadata:
-                self.update_photo_metadata(photo_id, metadata)
+                self.update_photo_metadata(photo_id, metadata, commit=False)
                 # If metadata contains package_name, sync into photo_packages
                 pkg = metadata.get('package_name') if isinstance(metadata, dict) else None
                 if pkg:
                     self.set_packages(photo_id, [pkg])
             
-            self.conn.commit()
+            if commit:
+                self.conn.commit()
             return photo_id
         except sqlite3.IntegrityError:
             # Photo already exists, return existing ID
@@ -339,16 +433,18 @@ class PhotoDatabase:
         'date_released_instagram', 'date_released_tiktok', 'date_released_fansly',
         'package_name', 'notes', 'tags', 'face_similarity', 'face_match_rating',
         'scene_type', 'composition', 'subjects', 'dominant_colors',
-        'objects_detected', 'mood', 'ai_caption', 'suggested_hashtags',
+        'objects_detected', 'mood', 'ai_caption', 'suggested_hashtags', 'alt_text',
         'perceptual_hash', 'file_size_kb', 'image_width', 'image_height',
         'color_profile', 'content_rating', 'platform_status',
         'exif_camera', 'exif_lens', 'exif_focal_length', 'exif_iso',
         'exif_aperture', 'exif_shutter', 'exif_gps_lat', 'exif_gps_lon',
         'exif_date_taken', 'blur_score', 'exposure_score', 'quality',
         'quality_issues', 'quality_score', 'file_hash', 'flagged',
+        'file_size_bytes', 'partial_hash', 'hash_tier', 'file_mtime_ns', 'file_inode',
+        'ai_payload_bytes', 'ai_encode_ms', 'ai_ttft_ms', 'ai_tokens', 'ai_generate_ms',
     })
 
-    def update_photo_metadata(self, photo_id, metadata):
+    def update_photo_metadata(self, photo_id, metadata, commit=True):
         """Update photo metadata — only known columns are written."""
         fields = []
         values = []
@@ -363,7 +459,8 @@ class PhotoDatabase:
             values.append(photo_id)
             query = f"UPDATE photos SET {', '.join(fields)} WHERE id = ?"
             self.cursor.execute(query, values)
-            self.conn.commit()
+            if commit:
+                self.conn.commit()
     
     def update_photo(self, photo_id, **kwargs):
         """Update photo with keyword arguments (convenience wrapper)"""
@@ -413,6 +510,219 @@ class PhotoDatabase:
         row = self.cursor.fetchone()
         return dict(row) if row else None
     
+    def get_analysis_state(self) -> dict:
+        """Return ``{filepath: (photo_id, analyzed, fingerprint)}`` for every known photo.
+
+        ``fingerprint`` is the stored ``(file_size_bytes, file_mtime_ns,
+        file_inode)``, or None for photos imported before fingerprints were
+        recorded.  Lets a bulk import decide what to skip with one query
+        instead of a ``get_photo_by_path`` lookup per file.
+        """
+        self.cursor.execute(
+            "SELECT id, filepath, COALESCE(scene_type, '') != '', "
+            "file_size_bytes, file_mtime_ns, file_inode FROM photos"
+        )
+        return {
+            row[1]: (row[0], bool(row[2]), (row[3], row[4], row[5]) if row[4] is not None else None)
+            for row in self.cursor.fetchall()
+        }
+
+    def set_fingerprints(self, rows, commit: bool = True) -> None:
+        """Store ``(photo_id, (size, mtime_ns, inode))`` file fingerprints in bulk."""
+        self.cursor.executemany(
+            "UPDATE photos SET file_size_bytes = ?, file_mtime_ns = ?, file_inode = ? WHERE id = ?",
+            [(size, mtime_ns, inode, photo_id) for photo_id, (size, mtime_ns, inode) in rows],
+        )
+        if commit:
+            self.conn.commit()
+
+    def clear_file_derived_fields(self, photo_id, commit: bool = True) -> None:
+        """Reset hashes and quality scores of a photo whose file content changed."""
+        self.cursor.execute(
+            "UPDATE photos SET file_hash = '', partial_hash = '', hash_tier = '', perceptual_hash = '', "
+            "blur_score = 0.0, exposure_score = 0.5, quality = '', quality_issues = '', quality_score = 0.0 "
+            "WHERE id = ?",
+            (photo_id,),
+        )
+        if commit:
+            self.conn.commit()
+
+    # ── AI result cache ───────────────────────────────────────────────────
+
+    def get_ai_result(self, file_hash: str, model: str, prompt_hash: str) -> dict | None:
+        """Return the cached parsed analysis for this content, model and prompt, or None."""
+        self.cursor.execute(
+            "SELECT result FROM ai_results WHERE file_hash = ? AND model = ? AND prompt_hash = ?",
+            (file_hash, model, prompt_hash),
+        )
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def put_ai_result(self, file_hash: str, model: str, prompt_hash: str,
+                      raw_response: str, result: dict, commit: bool = True) -> None:
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO ai_results (file_hash, model, prompt_hash, raw_response, result) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (file_hash, model, prompt_hash, raw_response, json.dumps(result)),
+        )
+        if commit:
+            self.conn.commit()
+
+    def clear_ai_results(self) -> None:
+        self.cursor.execute("DELETE FROM ai_results")
+        self.conn.commit()
+
+    # ── Analysis jobs ─────────────────────────────────────────────────────
+
+    def enqueue_jobs(self, source: str, jobs, commit: bool = True) -> None:
+        """Queue ``(filepath, stage, photo_id)`` jobs as pending.
+
+        A job already recorded for the same file and stage (done, failed or
+        left running by a crash) is reset, with its attempts and error
+        cleared.
+        """
+        self.cursor.executemany(
+            "INSERT INTO analysis_jobs (source, filepath, stage, photo_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(source, filepath, stage) DO UPDATE SET state = 'pending', attempts = 0, "
+            "last_error = '', photo_id = COALESCE(excluded.photo_id, photo_id), "
+            "updated_at = CURRENT_TIMESTAMP",
+            [(source, filepath, stage, photo_id) for filepath, stage, photo_id in jobs],
+        )
+        if commit:
+            self.conn.commit()
+
+    def claim_jobs(self, source: str, stage: str, limit: int,
+                   max_attempts: int = MAX_JOB_ATTEMPTS, commit: bool = True) -> list:
+        """Mark up to ``limit`` pending jobs as running and return them.
+
+        Returns ``(job_id, filepath, photo_id, attempts)`` tuples, oldest
+        first; ``attempts`` includes this one.
+        """
+        self.cursor.execute(
+            "SELECT id, filepath, photo_id, attempts FROM analysis_jobs "
+            "WHERE source = ? AND stage = ? AND state = 'pending' AND attempts < ? "
+            "ORDER BY id LIMIT ?",
+            (source, stage, max_attempts, limit),
+        )
+        jobs = [(row[0], row[1], row[2], row[3] + 1) for row in self.cursor.fetchall()]
+        self.cursor.executemany(
+            "UPDATE analysis_jobs SET state = 'running', attempts = ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = ?",
+            [(attempts, job_id) for job_id, _path, _pid, attempts in jobs],
+        )
+        if commit:
+            self.conn.commit()
+        return jobs
+
+    def finish_job(self, job_id, commit: bool = True) -> None:
+        self.cursor.execute(
+            "UPDATE analysis_jobs SET state = 'done', last_error = '', updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = ?",
+            (job_id,),
+        )
+        if commit:
+            self.conn.commit()
+
+    def fail_job(self, job_id, error: str, max_attempts: int = MAX_JOB_ATTEMPTS,
+                 commit: bool = True) -> None:
+        """Record a failed attempt: the job is retried until it has used ``max_attempts``."""
+        self.cursor.execute(
+            "UPDATE analysis_jobs SET last_error = ?, updated_at = CURRENT_TIMESTAMP, "
+            "state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END WHERE id = ?",
+            (str(error), max_attempts, job_id),
+        )
+        if commit:
+            self.conn.commit()
+
+    def release_jobs(self, job_ids, commit: bool = True) -> None:
+        """Return claimed jobs to pending without counting the attempt (run stopped)."""
+        self.cursor.executemany(
+            "UPDATE analysis_jobs SET state = 'pending', attempts = MAX(attempts - 1, 0) "
+            "WHERE id = ? AND state = 'running'",
+            [(job_id,) for job_id in job_ids],
+        )
+        if commit:
+            self.conn.commit()
+
+    def release_running_jobs(self, source: str) -> int:
+        """Return jobs a crashed run left running to pending; the attempt still counts."""
+        self.cursor.execute(
+            "UPDATE analysis_jobs SET state = 'pending' WHERE source = ? AND state = 'running'", (source,)
+        )
+        self.conn.commit()
+        return self.cursor.rowcount
+
+    def get_job_states(self, source: str, stage: str) -> dict:
+        """Return ``{filepath: state}`` for one stage of ``source``."""
+        self.cursor.execute(
+            "SELECT filepath, state FROM analysis_jobs WHERE source = ? AND stage = ?", (source, stage)
+        )
+        return {row[0]: row[1] for row in self.cursor.fetchall()}
+
+    def get_job_counts(self, source: str) -> dict:
+        """Return ``{(stage, state): count}`` for ``source``."""
+        self.cursor.execute(
+            "SELECT stage, state, COUNT(*) FROM analysis_jobs WHERE source = ? GROUP BY stage, state",
+            (source,),
+        )
+        return {(row[0], row[1]): row[2] for row in self.cursor.fetchall()}
+
+    def count_unfinished_jobs(self, source: str, max_attempts: int = MAX_JOB_ATTEMPTS) -> int:
+        """Number of files with a pending or running job (what a resumed run would do).
+
+        Jobs that have used up ``max_attempts`` are never claimed again, so
+        they are not counted.
+        """
+        self.cursor.execute(
+            "SELECT COUNT(DISTINCT filepath) FROM analysis_jobs "
+            "WHERE source = ? AND state IN ('pending', 'running') AND attempts < ?",
+            (source, max_attempts),
+        )
+        return self.cursor.fetchone()[0]
+
+    def discard_unfinished_jobs(self, source: str, max_attempts: int = MAX_JOB_ATTEMPTS) -> int:
+        """Delete the pending and running jobs of ``source`` (the user declined to resume them).
+
+        Jobs that have already failed an attempt, or used up ``max_attempts``,
+        are marked failed instead so they still show up for a retry.  Files
+        that were never analysed get new jobs on the next import of their
+        folder.  Returns the number of jobs deleted.
+        """
+        self.cursor.execute(
+            "UPDATE analysis_jobs SET state = 'failed', "
+            "last_error = CASE WHEN last_error = '' THEN 'Interrupted' ELSE last_error END, "
+            "updated_at = CURRENT_TIMESTAMP "
+            "WHERE source = ? AND state IN ('pending', 'running') AND (last_error != '' OR attempts >= ?)",
+            (source, max_attempts),
+        )
+        self.cursor.execute(
+            "DELETE FROM analysis_jobs WHERE source = ? AND state IN ('pending', 'running')", (source,)
+        )
+        deleted = self.cursor.rowcount
+        self.conn.commit()
+        self.prune_jobs(source)
+        return deleted
+
+    def get_failed_jobs(self, source: str) -> list:
+        self.cursor.execute(
+            "SELECT * FROM analysis_jobs WHERE source = ? AND state = 'failed' ORDER BY id", (source,)
+        )
+        return [dict(row) for row in self.cursor.fetchall()]
+
+    def prune_jobs(self, source: str) -> None:
+        """Delete the jobs of files whose every stage is done.  Failed jobs are kept."""
+        self.cursor.execute(
+            "DELETE FROM analysis_jobs WHERE source = ? AND filepath NOT IN "
+            "(SELECT filepath FROM analysis_jobs WHERE source = ? AND state != 'done')",
+            (source, source),
+        )
+        self.conn.commit()
+
     def get_photo_by_path(self, filepath):
         """Get photo by filepath"""
         filepath = str(Path(filepath).resolve())
@@ -450,6 +760,143 @@ class PhotoDatabase:
         self.cursor.execute(query, params)
         return [dict(row) for row in self.cursor.fetchall()]
 
+    def _compile_photo_filter(self, spec: PhotoFilter) -> tuple[str, list]:
+        """Translate a PhotoFilter into a WHERE clause and its parameters."""
+        clauses = ['(is_trashed IS NULL OR is_trashed = 0)']
+        params = []
+
+        if spec.unanalyzed_only:
+            clauses.append(
+                "(COALESCE(scene_type, '') = '' OR COALESCE(mood, '') = ''"
+                " OR COALESCE(subjects, '') = '' OR COALESCE(location, '') = '')"
+            )
+        if spec.statuses:
+            clauses.append(f"status IN ({', '.join('?' for _ in spec.statuses)})")
+            params.extend(spec.statuses)
+        if spec.released_instagram:
+            clauses.append('COALESCE(released_instagram, 0) != 0')
+        if spec.released_tiktok:
+            clauses.append('COALESCE(released_tiktok, 0) != 0')
+
+        # Case-insensitive substring matches; instr() avoids LIKE wildcard escaping.
+        for column, value in (
+            ('scene_type', spec.scene_type),
+            ('mood', spec.mood),
+            ('subjects', spec.subjects),
+            ('location', spec.location),
+            ('tags', spec.tag),
+        ):
+            if value:
+                clauses.append(f"instr(lower(COALESCE({column}, '')), ?) > 0")
+                params.append(value.lower())
+
+        if spec.package:
+            clauses.append(
+                "(EXISTS (SELECT 1 FROM photo_packages pp WHERE pp.photo_id = photos.id"
+                " AND instr(lower(pp.package_name), ?) > 0)"
+                " OR instr(lower(COALESCE(package_name, '')), ?) > 0)"
+            )
+            params.extend([spec.package.lower()] * 2)
+        if spec.quality:
+            clauses.append("COALESCE(quality, '') = ?")
+            params.append(spec.quality)
+        if spec.has_exif:
+            clauses.append("COALESCE(exif_camera, '') != ''")
+        if spec.has_gps:
+            clauses.append('COALESCE(exif_gps_lat, 0) != 0 AND COALESCE(exif_gps_lon, 0) != 0')
+        if spec.content_rating:
+            clauses.append("COALESCE(NULLIF(content_rating, ''), 'general') = ?")
+            params.append(spec.content_rating)
+
+        return ' AND '.join(clauses), params
+
+    def get_filtered_photos(self, spec: PhotoFilter) -> list:
+        """Return active photos matching ``spec``, newest first.
+
+        The whole spec is evaluated in a single parameterized query, so only
+        matching rows are materialised.
+        """
+        where, params = self._compile_photo_filter(spec)
+        self.cursor.execute(
+            f'SELECT * FROM photos WHERE {where} ORDER BY date_added DESC', params
+        )
+        return [dict(row) for row in self.cursor.fetchall()]
+
+    # Columns the Library table displays or searches; everything else stays on disk.
+    LIBRARY_COLUMNS = (
+        'id', 'filepath', 'filename', 'date_created', 'scene_type', 'mood',
+        'subjects', 'location', 'objects_detected', 'status',
+        'released_instagram', 'released_tiktok', 'package_name', 'tags',
+        'notes', 'ai_caption', 'suggested_hashtags', 'exif_camera',
+        'file_mtime_ns',
+    )
+
+    def get_library_rows(self, spec: PhotoFilter | None = None, photo_ids=None) -> list:
+        """Return lightweight Library rows, newest first.
+
+        Only ``LIBRARY_COLUMNS`` are selected.  Each row also carries a
+        ``packages`` list, fetched for the returned rows only, in batches
+        instead of one ``get_packages`` call per row.  ``photo_ids``
+        restricts the result to the given photos (used for incremental row
+        refreshes).
+        """
+        where, params = self._compile_photo_filter(spec or PhotoFilter())
+        columns = ', '.join(self.LIBRARY_COLUMNS)
+        rows = []
+        if photo_ids is None:
+            self.cursor.execute(
+                f'SELECT {columns} FROM photos WHERE {where} ORDER BY date_added DESC', params
+            )
+            rows = [dict(row) for row in self.cursor.fetchall()]
+        else:
+            ids = [int(pid) for pid in photo_ids]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ', '.join('?' for _ in chunk)
+                self.cursor.execute(
+                    f'SELECT {columns} FROM photos WHERE {where} AND id IN ({marks})'
+                    ' ORDER BY date_added DESC',
+                    params + chunk,
+                )
+                rows.extend(dict(row) for row in self.cursor.fetchall())
+        return self._attach_packages(rows)
+
+    def library_rows_from(self, photos: list) -> list:
+        """Project full photo rows (e.g. from ``get_filtered_photos``) onto Library rows.
+
+        Lets a caller that already ran the filter query fill the Library
+        table without running it again; only the packages of these photos
+        are queried.
+        """
+        return self._attach_packages([{col: photo.get(col) for col in self.LIBRARY_COLUMNS}
+                                      for photo in photos])
+
+    def _attach_packages(self, rows: list) -> list:
+        """Set ``row['packages']`` on each row, reading only these photos' packages."""
+        packages: dict[int, list] = {}
+        ids = [row['id'] for row in rows]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ', '.join('?' for _ in chunk)
+            self.cursor.execute(
+                f'SELECT photo_id, package_name FROM photo_packages WHERE photo_id IN ({marks}) ORDER BY id',
+                chunk,
+            )
+            for photo_id, package_name in self.cursor.fetchall():
+                packages.setdefault(photo_id, []).append(package_name)
+        for row in rows:
+            row['packages'] = packages.get(row['id'], [])
+        return rows
+
+    def count_photos(self, include_trashed: bool = False) -> int:
+        """Return the number of photos in the library."""
+        query = 'SELECT COUNT(*) FROM photos'
+        if not include_trashed:
+            query += ' WHERE (is_trashed IS NULL OR is_trashed = 0)'
+        self.cursor.execute(query)
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
     def get_rated_face_match_photos(self):
         """Get photos with a face-match rating > 0."""
         self.cursor.execute(
@@ -636,12 +1083,16 @@ class PhotoDatabase:
         indexes = [
             'CREATE INDEX IF NOT EXISTS idx_photos_status ON photos(status)',
             'CREATE INDEX IF NOT EXISTS idx_photos_file_hash ON photos(file_hash)',
+            'CREATE INDEX IF NOT EXISTS idx_photos_file_size_bytes ON photos(file_size_bytes)',
             'CREATE INDEX IF NOT EXISTS idx_photos_perceptual_hash ON photos(perceptual_hash)',
             'CREATE INDEX IF NOT EXISTS idx_scheduled_posts_status ON scheduled_posts(status, scheduled_time)',
             'CREATE INDEX IF NOT EXISTS idx_posting_history_photo ON posting_history(photo_id)',
             'CREATE INDEX IF NOT EXISTS idx_posting_history_platform ON posting_history(platform, date_posted)',
             'CREATE INDEX IF NOT EXISTS idx_album_photos_album ON album_photos(album_id)',
             'CREATE INDEX IF NOT EXISTS idx_album_photos_photo ON album_photos(photo_id)',
+            'CREATE INDEX IF NOT EXISTS idx_photo_packages_photo ON photo_packages(photo_id)',
+            'CREATE INDEX IF NOT EXISTS idx_duplicate_groups_group ON duplicate_groups(group_id)',
+            'CREATE INDEX IF NOT EXISTS idx_analysis_jobs_claim ON analysis_jobs(source, stage, state)',
         ]
         for stmt in indexes:
             try:
@@ -715,6 +1166,11 @@ class PhotoDatabase:
             VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
         ''', (photo_id, field, original_value, corrected_value))
         self.conn.commit()
+        self._ai_context_changed()
+
+    @staticmethod
+    def _ai_context_changed():
+        PhotoDatabase.ai_context_version += 1
     
     def get_corrections_for_field(self, field, limit=10):
         """Get recent corrections for a specific field to use as examples"""
@@ -885,6 +1341,8 @@ class PhotoDatabase:
                 VALUES (?, ?, CURRENT_TIMESTAMP)
             ''', (platform.lower(), encrypted_data))
             self.conn.commit()
+            if platform.lower() == 'ollama':
+                self._ai_context_changed()
             return True
         except Exception as e:
             print(f"Error storing credentials: {e}")
@@ -909,6 +1367,8 @@ class PhotoDatabase:
         try:
             self.cursor.execute('DELETE FROM api_credentials WHERE platform = ?', (platform.lower(),))
             self.conn.commit()
+            if platform.lower() == 'ollama':
+                self._ai_context_changed()
             return True
         except Exception as e:
             print(f"Error deleting credentials: {e}")
@@ -984,6 +1444,7 @@ class PhotoDatabase:
         try:
             self.cursor.execute('DELETE FROM ai_corrections')
             self.conn.commit()
+            self._ai_context_changed()
             return True
         except Exception as e:
             print(f"Error clearing AI corrections: {e}")
@@ -1151,6 +1612,126 @@ class PhotoDatabase:
             print(f'delete_caption_template error: {e}')
             return False
 
+    # ── Duplicate groups ─────────────────────────────────────────────────────
+
+    def get_phash_entries(self, after_id: int = 0) -> list:
+        """Return ``(id, perceptual_hash)`` for active photos with a hash and ``id > after_id``."""
+        self.cursor.execute(
+            "SELECT id, perceptual_hash FROM photos "
+            "WHERE id > ? AND COALESCE(perceptual_hash, '') != '' AND COALESCE(is_trashed, 0) = 0 "
+            "ORDER BY id",
+            (after_id,),
+        )
+        return [(row[0], row[1]) for row in self.cursor.fetchall()]
+
+    def get_photo_paths(self, after_id: int = 0, limit: int = 500) -> list:
+        """Return ``(id, filepath)`` for up to ``limit`` active photos with ``id > after_id``, in id order."""
+        self.cursor.execute(
+            "SELECT id, filepath FROM photos "
+            "WHERE id > ? AND COALESCE(is_trashed, 0) = 0 ORDER BY id LIMIT ?",
+            (after_id, limit),
+        )
+        return [(row[0], row[1]) for row in self.cursor.fetchall()]
+
+    def get_photo_ids_by_file_hash(self, file_hash: str) -> list:
+        """Return ids of active photos whose file hash equals ``file_hash``."""
+        if not file_hash:
+            return []
+        self.cursor.execute(
+            'SELECT id FROM photos WHERE file_hash = ? AND COALESCE(is_trashed, 0) = 0 ORDER BY id',
+            (file_hash,),
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def get_hash_peers(self, file_size_bytes: int, exclude_id=None) -> list:
+        """Return hash state for active photos with exactly ``file_size_bytes`` bytes.
+
+        Each entry is a dict with id, filepath, partial_hash, file_hash and hash_tier.
+        """
+        self.cursor.execute(
+            "SELECT id, filepath, COALESCE(partial_hash, '') AS partial_hash, "
+            "COALESCE(file_hash, '') AS file_hash, COALESCE(hash_tier, '') AS hash_tier "
+            "FROM photos WHERE file_size_bytes = ? AND id != ? AND COALESCE(is_trashed, 0) = 0",
+            (file_size_bytes, exclude_id if exclude_id is not None else -1),
+        )
+        return [dict(row) for row in self.cursor.fetchall()]
+
+    def link_duplicates(self, photo_ids, match_type: str = 'similar', commit: bool = True) -> int | None:
+        """Put ``photo_ids`` in one duplicate group, merging any groups they already belong to.
+
+        Returns the resulting group id, or None when fewer than two photos were given.
+        """
+        ids = sorted(set(photo_ids))
+        if len(ids) < 2:
+            return None
+        marks = ','.join('?' * len(ids))
+        self.cursor.execute(
+            f'SELECT DISTINCT group_id FROM duplicate_groups WHERE photo_id IN ({marks})', ids
+        )
+        existing = [row[0] for row in self.cursor.fetchall()]
+        group_id = min(ids + existing)
+        if existing:
+            self.cursor.execute(
+                f"UPDATE duplicate_groups SET group_id = ? WHERE group_id IN ({','.join('?' * len(existing))})",
+                [group_id] + existing,
+            )
+        self.cursor.executemany(
+            'INSERT INTO duplicate_groups (photo_id, group_id, match_type) VALUES (?, ?, ?) '
+            'ON CONFLICT(photo_id) DO UPDATE SET group_id = excluded.group_id',
+            [(pid, group_id, match_type) for pid in ids],
+        )
+        if commit:
+            self.conn.commit()
+        return group_id
+
+    def replace_duplicate_groups(self, groups: list) -> None:
+        """Replace every stored group with ``groups`` (lists of photo dicts from a full scan)."""
+        self.cursor.execute('DELETE FROM duplicate_groups')
+        for group in groups:
+            hashes = {p.get('file_hash') or '' for p in group}
+            match_type = 'exact' if len(hashes) == 1 and '' not in hashes else 'similar'
+            self.link_duplicates([p['id'] for p in group], match_type, commit=False)
+        self.conn.commit()
+
+    def remove_from_duplicate_groups(self, photo_ids, commit: bool = True) -> None:
+        """Drop photos from their duplicate groups (e.g. once reviewed)."""
+        rows = [(pid,) for pid in photo_ids]
+        if not rows:
+            return
+        self.cursor.executemany('DELETE FROM duplicate_groups WHERE photo_id = ?', rows)
+        if commit:
+            self.conn.commit()
+
+    def get_duplicate_group_ids(self, photo_ids) -> list:
+        """Return the ids of the duplicate groups ``photo_ids`` belong to."""
+        ids = list(photo_ids)
+        if not ids:
+            return []
+        self.cursor.execute(
+            f"SELECT DISTINCT group_id FROM duplicate_groups WHERE photo_id IN ({','.join('?' * len(ids))}) "
+            "ORDER BY group_id",
+            ids,
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def get_duplicate_groups(self) -> list:
+        """Return stored duplicate groups as lists of photo dicts.
+
+        Trashed photos are left out, as is any group with fewer than two
+        remaining members.
+        """
+        self.cursor.execute('''
+            SELECT p.*, d.group_id AS duplicate_group_id, d.match_type AS duplicate_match_type
+            FROM duplicate_groups d JOIN photos p ON p.id = d.photo_id
+            WHERE COALESCE(p.is_trashed, 0) = 0
+            ORDER BY d.group_id, p.id
+        ''')
+        groups: dict[int, list] = {}
+        for row in self.cursor.fetchall():
+            photo = dict(row)
+            groups.setdefault(photo['duplicate_group_id'], []).append(photo)
+        return [g for g in groups.values() if len(g) > 1]
+
     # ── Stash helpers ────────────────────────────────────────────────────────
 
     def get_stash_album_id(self) -> int:
@@ -1371,6 +1952,7 @@ class PhotoDatabase:
                     vals,
                 )
             self.conn.commit()
+            self._ai_context_changed()
             return len(rows)
         except Exception as e:
             print(f"Error importing AI corrections: {e}")
@@ -1,8 +1,10 @@
 """
 Duplicate photo detection for PhotoFlow.
-Uses MD5 (exact) and perceptual hash (similar/near-duplicate) matching.
+Uses tiered content hashing (exact) and perceptual hash (similar/near-duplicate) matching.
 """
 import hashlib
+import os
+from itertools import combinations
 from pathlib import Path
 
 try:
@@ -18,25 +20,100 @@ try:
 except ImportError:
     _PIL = False
 
+try:
+    import numpy as np
+    _NUMPY = True
+except ImportError:
+    _NUMPY = False
+
+
+# Above this many hashes the quadratic NumPy pass loses to the index.
+NUMPY_PAIRWISE_LIMIT = 20000
+# Scratch memory for one slab of the NumPy pass.  Each distance briefly
+# takes up to _PAIR_BYTES: the uint64 XOR, the popcount (plus its uint16
+# lookup without np.bitwise_count) and the match mask.
+PAIRWISE_BLOCK_BYTES = 32 * 1024 * 1024
+_PAIR_BYTES = 14
+
+# Exact-duplicate hashing is tiered: a file is only hashed further when the
+# cheaper tier collides with another file.  ``hash_tier`` records how far a
+# photo got so later lookups can reuse it.
+HASH_TIER_SIZE = 'size'        # only file_size_bytes is known
+HASH_TIER_PARTIAL = 'partial'  # partial_hash covers the first/last PARTIAL_HASH_BYTES
+HASH_TIER_FULL = 'full'        # file_hash covers every byte
+HASH_TIER_LEGACY = 'md5'       # file_hash is an MD5 digest from before tiering
+
+PARTIAL_HASH_BYTES = 2 * 1024 * 1024
+
+_POPCOUNT16 = None
+
+
+def _content_hasher():
+    return hashlib.blake2b(digest_size=20)
+
 
-def md5_hash(filepath: str) -> str:
-    """Compute MD5 hash of file bytes (exact duplicate detection)."""
-    h = hashlib.md5()
+def full_hash(filepath: str = '', data: bytes | None = None) -> str:
+    """BLAKE2b digest of every byte of a file (or of ``data``), or '' if it cannot be read."""
+    h = _content_hasher()
+    if data is not None:
+        h.update(data)
+        return h.hexdigest()
     try:
         with open(filepath, 'rb') as f:
-            for chunk in iter(lambda: f.read(65536), b''):
+            for chunk in iter(lambda: f.read(1 << 20), b''):
                 h.update(chunk)
         return h.hexdigest()
-    except Exception:
+    except OSError:
         return ''
 
 
-def perceptual_hash(filepath: str) -> str:
-    """Compute perceptual hash (similar image detection). Returns hex string."""
+def partial_hash(filepath: str = '', data: bytes | None = None) -> tuple[str, str]:
+    """Hash the first and last PARTIAL_HASH_BYTES of a file, from ``data`` if already read.
+
+    Returns ``(digest, tier)``.  Files no larger than the two windows are
+    hashed whole, so their digest equals :func:`full_hash` and the tier is
+    HASH_TIER_FULL.  Returns ``('', '')`` if the file cannot be read.
+    """
+    try:
+        if data is not None:
+            size = len(data)
+            if size <= 2 * PARTIAL_HASH_BYTES:
+                whole = data
+            else:
+                head, tail = data[:PARTIAL_HASH_BYTES], data[-PARTIAL_HASH_BYTES:]
+        else:
+            with open(filepath, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= 2 * PARTIAL_HASH_BYTES:
+                    whole = f.read()
+                else:
+                    head = f.read(PARTIAL_HASH_BYTES)
+                    f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+                    tail = f.read()
+    except OSError:
+        return '', ''
+
+    h = _content_hasher()
+    if size <= 2 * PARTIAL_HASH_BYTES:
+        h.update(whole)
+        return h.hexdigest(), HASH_TIER_FULL
+    h.update(b'partial:%d:' % size)
+    h.update(head)
+    h.update(tail)
+    return h.hexdigest(), HASH_TIER_PARTIAL
+
+
+def perceptual_hash(filepath: str, ctx=None) -> str:
+    """Compute perceptual hash (similar image detection). Returns hex string.
+
+    With an ImageContext, hashes its reduced preview instead of decoding the file.
+    """
     if not _IMAGEHASH:
         return ''
     try:
-        img = _PILImage.open(filepath)
+        img = ctx.preview if ctx is not None else None
+        if img is None:
+            img = _PILImage.open(filepath)
         return str(imagehash.phash(img))
     except Exception:
         return ''
@@ -46,12 +123,193 @@ def hash_distance(hash1: str, hash2: str) -> int:
     """Hamming distance between two perceptual hash strings. 0=identical."""
     if not hash1 or not hash2 or len(hash1) != len(hash2):
         return 999
-    try:
-        h1 = imagehash.hex_to_hash(hash1)
-        h2 = imagehash.hex_to_hash(hash2)
-        return h1 - h2
-    except Exception:
+    h1, h2 = phash_to_int(hash1), phash_to_int(hash2)
+    if h1 is None or h2 is None:
         return 999
+    return (h1 ^ h2).bit_count()
+
+
+def phash_to_int(hash_hex: str) -> int | None:
+    """Parse a hex perceptual hash into an integer, or None if it is not valid hex."""
+    if not hash_hex:
+        return None
+    try:
+        return int(hash_hex, 16)
+    except (TypeError, ValueError):
+        return None
+
+
+def _flip_masks(bits: int, radius: int) -> tuple[int, ...]:
+    """Every ``bits``-wide mask with at most ``radius`` bits set (0 first)."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks.extend(sum(1 << b for b in combo) for combo in combinations(range(bits), r))
+    return tuple(masks)
+
+
+class PHashIndex:
+    """Multi-index hash table over 64-bit perceptual hashes.
+
+    Each hash is split into ``chunks`` equal substrings and every substring
+    gets its own lookup table.  Two hashes within Hamming distance ``k`` must
+    agree to within ``k // chunks`` bits on at least one substring
+    (pigeonhole), so a query only probes those neighbouring buckets and
+    checks the few candidates they hold, instead of scanning every photo.
+    Inserts are incremental, so the index can grow as photos are ingested.
+    """
+
+    def __init__(self, items=None, bits: int = 64, chunks: int = 5):
+        self.bits = bits
+        self.chunks = chunks
+        # (shift, width) per substring; widths differ by at most one bit.
+        base, extra = divmod(bits, chunks)
+        self._spans = []
+        shift = 0
+        for i in range(chunks):
+            width = base + (1 if i < extra else 0)
+            self._spans.append((shift, width))
+            shift += width
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(chunks)]
+        self._ids: dict[int, list] = {}  # hash -> photo ids sharing it
+        self._size = 0
+        self._masks: dict[tuple[int, int], tuple[int, ...]] = {}
+        for photo_id, value in items or ():
+            self.add(photo_id, value)
+
+    def __len__(self):
+        return self._size
+
+    def _substrings(self, value: int):
+        for shift, width in self._spans:
+            yield (value >> shift) & ((1 << width) - 1)
+
+    def add(self, photo_id, value) -> bool:
+        """Insert ``photo_id`` with a hash given as int or hex string; False if the hash is unusable."""
+        if not isinstance(value, int):
+            value = phash_to_int(value)
+            if value is None:
+                return False
+        self._size += 1
+        ids = self._ids.get(value)
+        if ids is not None:
+            ids.append(photo_id)
+            return True
+        self._ids[value] = [photo_id]
+        for table, sub in zip(self._tables, self._substrings(value)):
+            table.setdefault(sub, []).append(value)
+        return True
+
+    def remove(self, photo_id, value) -> bool:
+        """Remove ``photo_id`` stored under ``value``; False if it was not there."""
+        if not isinstance(value, int):
+            value = phash_to_int(value)
+        ids = self._ids.get(value)
+        if not ids or photo_id not in ids:
+            return False
+        ids.remove(photo_id)
+        self._size -= 1
+        if not ids:
+            del self._ids[value]
+            for table, sub in zip(self._tables, self._substrings(value)):
+                bucket = table.get(sub)
+                if bucket is not None:
+                    bucket.remove(value)
+                    if not bucket:
+                        del table[sub]
+        return True
+
+    def query(self, value, max_distance: int) -> list[tuple[int, object]]:
+        """Return ``(distance, photo_id)`` for every entry within ``max_distance`` of ``value``."""
+        if not isinstance(value, int):
+            value = phash_to_int(value)
+            if value is None:
+                return []
+        radius = max_distance // self.chunks
+        candidates = set()
+        for table, sub, (_shift, width) in zip(self._tables, self._substrings(value), self._spans):
+            masks = self._masks.get((width, radius))
+            if masks is None:
+                masks = self._masks[(width, radius)] = _flip_masks(width, radius)
+            for bucket in map(table.get, [sub ^ mask for mask in masks]):
+                if bucket:
+                    candidates.update(bucket)
+
+        ids = self._ids
+        return [
+            (dist, pid)
+            for cand in candidates
+            if (dist := (cand ^ value).bit_count()) <= max_distance
+            for pid in ids[cand]
+        ]
+
+
+def _popcount64(x):
+    """Per-element popcount of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(x)
+    global _POPCOUNT16
+    if _POPCOUNT16 is None:
+        _POPCOUNT16 = np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+    return _POPCOUNT16[np.ascontiguousarray(x).view(np.uint16)].reshape(x.shape + (4,)).sum(-1, dtype=np.uint8)
+
+
+def hamming_pairs(values, threshold: int, block: int | None = None):
+    """Yield ``(i, j)`` index arrays (i < j) of hashes within ``threshold``.
+
+    ``values`` is a sequence of integer hashes.  Distances are computed in
+    ``block``-row slabs with XOR + popcount, which need up to
+    ``14 * block * len(values)`` bytes at once.  By default ``block`` is
+    sized to keep that within PAIRWISE_BLOCK_BYTES.  Requires NumPy.
+    """
+    v = np.asarray(values, dtype=np.uint64)
+    n = len(v)
+    if block is None:
+        block = max(1, PAIRWISE_BLOCK_BYTES // (_PAIR_BYTES * max(n, 1)))
+    for start in range(0, n, block):
+        rows = v[start:start + block]
+        dist = _popcount64(rows[:, None] ^ v[None, start:])
+        i, j = np.nonzero(dist <= threshold)
+        keep = j > i  # columns are offset by ``start`` too, so this is the upper triangle
+        if keep.any():
+            yield i[keep] + start, j[keep] + start
+
+
+def _index_pairs(values, threshold: int):
+    """Yield ``(i, j)`` pairs (i < j) within ``threshold`` using a PHashIndex."""
+    index = PHashIndex(enumerate(values))
+    for i, value in enumerate(values):
+        for _dist, j in index.query(value, threshold):
+            if j > i:
+                yield [i], [j]
+
+
+def _clusters(n: int, pair_batches) -> list[list[int]]:
+    """Union-find over index pairs; return components of size > 1.
+
+    Components are ordered by their smallest member, and members ascend, so
+    the result does not depend on the order pairs arrive in.
+    """
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for left, right in pair_batches:
+        for a, b in zip(left, right):
+            ra, rb = find(int(a)), find(int(b))
+            if ra != rb:
+                if ra < rb:
+                    parent[rb] = ra
+                else:
+                    parent[ra] = rb
+
+    members: dict[int, list[int]] = {}
+    for i in range(n):
+        members.setdefault(find(i), []).append(i)
+    return sorted((m for m in members.values() if len(m) > 1), key=lambda m: m[0])
 
 
 def find_duplicates(photos: list, threshold: int = 8) -> list[list[dict]]:
@@ -63,44 +321,153 @@ def find_duplicates(photos: list, threshold: int = 8) -> list[list[dict]]:
                ≤8 = visually similar, ≤16 = loosely similar)
 
     Returns list of groups, each group is a list of photo dicts.
-    Exact MD5 duplicates are always grouped regardless of threshold.
+    Exact file-hash duplicates are always grouped regardless of threshold.
+    Legacy MD5 hashes (``hash_tier`` HASH_TIER_LEGACY) are only compared
+    with each other; DuplicateTracker rehashes them when a size collides.
     """
     if not photos:
         return []
 
-    # First pass: group by MD5 hash (exact file duplicates)
-    exact_groups: dict[str, list] = {}
-    no_md5 = []
+    # First pass: group by file hash (exact file duplicates), like with like
+    exact_groups: dict[tuple, list] = {}
     for p in photos:
         h = p.get('file_hash') or ''
         if h:
-            exact_groups.setdefault(h, []).append(p)
-        else:
-            no_md5.append(p)
+            legacy = p.get('hash_tier') == HASH_TIER_LEGACY
+            exact_groups.setdefault((legacy, h), []).append(p)
 
     groups = [g for g in exact_groups.values() if len(g) > 1]
 
-    # Second pass: group ALL photos by perceptual hash similarity
-    # (including those that have an MD5 hash but no exact match found)
-    if _IMAGEHASH:
-        # Build list of photos not already in an exact-match group
-        already_grouped_ids = {p['id'] for g in groups for p in g}
-        ungrouped = [p for p in photos if p.get('perceptual_hash') and p['id'] not in already_grouped_ids]
-        used = set()
-
-        for i, p1 in enumerate(ungrouped):
-            if p1['id'] in used:
-                continue
-            group = [p1]
-            for j, p2 in enumerate(ungrouped):
-                if i == j or p2['id'] in used:
-                    continue
-                dist = hash_distance(p1['perceptual_hash'], p2['perceptual_hash'])
-                if dist <= threshold:
-                    group.append(p2)
-            if len(group) > 1:
-                for p in group:
-                    used.add(p['id'])
-                groups.append(group)
+    # Second pass: cluster the remaining photos by perceptual hash similarity.
+    # Near-duplicate pairs come from a vectorised all-pairs pass for small
+    # libraries (or the multi-index table for large ones) and are merged with
+    # union-find, so A~B and B~C end up in one group whatever the input order.
+    already_grouped_ids = {p['id'] for g in groups for p in g}
+    ungrouped, values = [], []
+    for p in photos:
+        if p['id'] in already_grouped_ids:
+            continue
+        value = phash_to_int(p.get('perceptual_hash'))
+        if value is not None:
+            ungrouped.append(p)
+            values.append(value)
+
+    if _NUMPY and len(values) <= NUMPY_PAIRWISE_LIMIT:
+        pairs = hamming_pairs(values, threshold)
+    else:
+        pairs = _index_pairs(values, threshold)
+    groups.extend([ungrouped[i] for i in members] for members in _clusters(len(values), pairs))
 
     return groups
+
+
+class DuplicateTracker:
+    """Keep the ``duplicate_groups`` table current as photos are ingested.
+
+    Each tracked photo is matched against the library by content (exact)
+    and by perceptual hash (within ``threshold``).  Any matches are linked
+    into one group.
+
+    Exact matching is tiered.  Only photos with the same byte size are
+    compared.  Their partial hashes are filled in if missing, and full
+    hashes are computed only for pairs whose partial hashes agree.  The
+    phash index is built from the database on first use and picks up rows
+    added by other connections before every lookup.
+    """
+
+    def __init__(self, db, threshold: int = 8):
+        self.db = db
+        self.threshold = threshold
+        self._index = PHashIndex()
+        self._indexed: dict = {}  # photo id -> indexed hash
+        self._max_id = 0
+
+    def _sync(self):
+        for photo_id, value in self.db.get_phash_entries(self._max_id):
+            self._add(photo_id, value)
+
+    def _add(self, photo_id, value):
+        if photo_id not in self._indexed and self._index.add(photo_id, value):
+            self._indexed[photo_id] = value
+        self._max_id = max(self._max_id, photo_id)
+
+    def forget(self, photo_id, commit: bool = True) -> None:
+        """Drop a photo whose file changed from the index and its duplicate group.
+
+        A later :meth:`track` call matches it again using its new hashes.
+        """
+        self._sync()
+        value = self._indexed.pop(photo_id, None)
+        if value is not None:
+            self._index.remove(photo_id, value)
+        self.db.remove_from_duplicate_groups([photo_id], commit=commit)
+
+    def _raise_tier(self, photo_id, filepath, tier, commit) -> dict:
+        """Hash ``filepath`` up to ``tier``, store the result and return the stored fields."""
+        if tier == HASH_TIER_FULL:
+            digest = full_hash(filepath)
+            fields = {'file_hash': digest, 'hash_tier': HASH_TIER_FULL} if digest else {}
+        else:
+            digest, reached = partial_hash(filepath)
+            fields = {'partial_hash': digest, 'hash_tier': reached} if digest else {}
+            if fields:
+                # Below the full tier there is no file hash (drops a legacy MD5).
+                fields['file_hash'] = digest if reached == HASH_TIER_FULL else ''
+        if fields:
+            self.db.update_photo_metadata(photo_id, fields, commit=commit)
+        return fields
+
+    def resolve_exact(self, photo_id, filepath: str, meta: dict, commit: bool = True) -> str:
+        """Escalate hashing for a new photo and its same-size peers; return its file hash.
+
+        ``meta`` holds whatever the photo already has (file_size_bytes,
+        partial_hash, hash_tier, file_hash) and is updated in place.
+        """
+        size = meta.get('file_size_bytes') or 0
+        peers = self.db.get_hash_peers(size, photo_id) if size else []
+        if not peers:
+            return meta.get('file_hash') or ''
+
+        if not meta.get('partial_hash'):
+            meta.update(self._raise_tier(photo_id, filepath, HASH_TIER_PARTIAL, commit))
+        partial = meta.get('partial_hash') or ''
+        if not partial:
+            return ''
+
+        matching = []
+        for peer in peers:
+            if not peer['partial_hash']:
+                peer.update(self._raise_tier(peer['id'], peer['filepath'], HASH_TIER_PARTIAL, commit))
+            if peer['partial_hash'] == partial:
+                matching.append(peer)
+        if not matching:
+            return meta.get('file_hash') or ''
+
+        if meta.get('hash_tier') != HASH_TIER_FULL:
+            meta.update(self._raise_tier(photo_id, filepath, HASH_TIER_FULL, commit))
+        for peer in matching:
+            if peer['hash_tier'] != HASH_TIER_FULL:
+                self._raise_tier(peer['id'], peer['filepath'], HASH_TIER_FULL, commit)
+        return meta.get('file_hash') or ''
+
+    def track(self, photo_id, meta: dict, filepath: str = '', commit: bool = True) -> list:
+        """Record duplicates of a newly stored photo; return the ids it was linked to.
+
+        ``meta`` is the metadata the photo was stored with.  With ``filepath``
+        the exact-duplicate tiers are escalated as needed first.
+        """
+        self._sync()
+        file_hash = meta.get('file_hash') or ''
+        if filepath:
+            file_hash = self.resolve_exact(photo_id, filepath, meta, commit)
+        exact = [pid for pid in self.db.get_photo_ids_by_file_hash(file_hash) if pid != photo_id]
+        similar = []
+        perceptual = meta.get('perceptual_hash') or ''
+        if perceptual:
+            similar = [pid for _dist, pid in self._index.query(perceptual, self.threshold)
+                       if pid != photo_id and pid not in exact]
+            self._add(photo_id, perceptual)
+        matches = exact + similar
+        if matches:
+            self.db.link_duplicates([photo_id] + matches, 'exact' if exact else 'similar', commit=commit)
+        return matches
@@ -0,0 +1,161 @@
+"""
+Embedded preview extraction for PhotoFlow.
+
+Camera JPEGs carry a small EXIF thumbnail (IFD1, typically 160x120), and
+TIFF-based RAW files (.cr2, .nef, .arw, .dng, .orf, .rw2) embed one or
+more JPEG previews, often at full resolution.  Reading one of those is a
+few seeks and a read of a few hundred KB.  Decoding the original instead
+means inflating a multi-megapixel JPEG, or failing outright on a RAW.
+
+Only the TIFF IFD chain and its SubIFDs are walked.  Maker-note previews
+and CR3 (ISO-BMFF) containers are not parsed, and callers fall back to a
+reduced decode of the original.
+"""
+import struct
+
+
+# JPEG start-of-frame markers for baseline/extended/progressive DCT.
+# Lossless JPEG (SOF3), used for raw sensor data in CR2/DNG, is skipped.
+_DCT_SOF = {0xC0, 0xC1, 0xC2}
+_MAX_IFDS = 32
+
+_TAG_COMPRESSION = 0x0103
+_TAG_STRIP_OFFSETS = 0x0111
+_TAG_STRIP_BYTE_COUNTS = 0x0117
+_TAG_SUB_IFDS = 0x014A
+_TAG_JPEG_OFFSET = 0x0201
+_TAG_JPEG_LENGTH = 0x0202
+_JPEG_COMPRESSION = {6, 7}
+
+
+class _Reader:
+    """Positional reads relative to the start of the TIFF structure."""
+
+    def __init__(self, f, base: int):
+        self._f = f
+        self.base = base
+
+    def read(self, offset: int, size: int) -> bytes:
+        self._f.seek(self.base + offset)
+        data = self._f.read(size)
+        if len(data) != size:
+            raise ValueError("truncated")
+        return data
+
+
+def _exif_base(f) -> int | None:
+    """File offset of the TIFF header inside a JPEG's Exif APP1 segment."""
+    pos = 2
+    while True:
+        f.seek(pos)
+        header = f.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker, length = header[1], struct.unpack('>H', header[2:])[0]
+        if marker == 0xE1 and f.read(6) == b'Exif\x00\x00':
+            return pos + 10
+        if marker == 0xDA or not 0xE0 <= marker <= 0xEF:
+            return None  # Exif always precedes the image data
+        pos += 2 + length
+
+
+def _ifd_value(reader, endian, typ, count, raw):
+    """Decode a SHORT/LONG entry into a list of ints."""
+    if typ not in (3, 4, 13):
+        return []
+    fmt, width = ('H', 2) if typ == 3 else ('I', 4)
+    if count * width > 4:
+        raw = reader.read(struct.unpack(endian + 'I', raw)[0], count * width)
+    return list(struct.unpack(f'{endian}{count}{fmt}', raw[:count * width]))
+
+
+def _jpeg_candidates(reader):
+    """Yield ``(offset, length)`` of every JPEG stream referenced by the IFDs."""
+    header = reader.read(0, 8)
+    endian = {b'II': '<', b'MM': '>'}.get(header[:2])
+    if endian is None:
+        return
+    pending = [struct.unpack(endian + 'I', header[4:])[0]]
+    seen = set()
+    while pending and len(seen) < _MAX_IFDS:
+        offset = pending.pop(0)
+        if not offset or offset in seen:
+            continue
+        seen.add(offset)
+        try:
+            count = struct.unpack(endian + 'H', reader.read(offset, 2))[0]
+            if count > 1000:
+                continue  # not an IFD
+            entries = reader.read(offset + 2, count * 12)
+            tags = {}
+            for i in range(count):
+                tag, typ, n, raw = struct.unpack(endian + 'HHI4s', entries[i * 12:i * 12 + 12])
+                if tag in (_TAG_COMPRESSION, _TAG_STRIP_OFFSETS, _TAG_STRIP_BYTE_COUNTS,
+                           _TAG_SUB_IFDS, _TAG_JPEG_OFFSET, _TAG_JPEG_LENGTH):
+                    tags[tag] = _ifd_value(reader, endian, typ, n, raw)
+            pending.append(struct.unpack(endian + 'I', reader.read(offset + 2 + count * 12, 4))[0])
+        except (ValueError, struct.error):
+            continue  # a damaged IFD does not hide previews found elsewhere
+        pending.extend(tags.get(_TAG_SUB_IFDS, []))
+
+        if tags.get(_TAG_JPEG_OFFSET) and tags.get(_TAG_JPEG_LENGTH):
+            yield tags[_TAG_JPEG_OFFSET][0], tags[_TAG_JPEG_LENGTH][0]
+        elif (set(tags.get(_TAG_COMPRESSION, [])) & _JPEG_COMPRESSION
+              and len(tags.get(_TAG_STRIP_OFFSETS, [])) == 1
+              and len(tags.get(_TAG_STRIP_BYTE_COUNTS, [])) == 1):
+            yield tags[_TAG_STRIP_OFFSETS][0], tags[_TAG_STRIP_BYTE_COUNTS][0]
+
+
+def _jpeg_dimensions(reader, offset: int = 0):
+    """``(width, height)`` of the DCT-coded JPEG at ``offset``, or None."""
+    if reader.read(offset, 2) != b'\xff\xd8':
+        return None
+    pos = offset + 2
+    while True:
+        header = reader.read(pos, 4)
+        if header[0] != 0xFF:
+            return None
+        marker, length = header[1], struct.unpack('>H', header[2:])[0]
+        if marker in _DCT_SOF:
+            height, width = struct.unpack('>HH', reader.read(pos + 5, 4))
+            return width, height
+        if 0xC3 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return None  # lossless/arithmetic: not a preview
+        if marker == 0xDA:
+            return None
+        pos += 2 + length
+
+
+def embedded_preview(filepath: str, min_side: int = 0) -> bytes | None:
+    """Return the smallest embedded JPEG preview whose longer side is at least ``min_side``.
+
+    Returns None when the file has no usable preview, including when every
+    preview is smaller than ``min_side``, or when the file cannot be parsed.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            magic = f.read(4)
+            if magic[:2] == b'\xff\xd8':
+                base = _exif_base(f)
+                if base is None:
+                    return None
+            elif magic[:2] in (b'II', b'MM'):
+                base = 0
+            else:
+                return None
+            reader = _Reader(f, base)
+            best = None
+            for offset, length in _jpeg_candidates(reader):
+                try:
+                    size = _jpeg_dimensions(reader, offset)
+                except ValueError:
+                    continue
+                if size is None or max(size) < min_side:
+                    continue
+                if best is None or max(size) < best[0]:
+                    best = (max(size), offset, length)
+            if best is None:
+                return None
+            return reader.read(best[1], best[2])
+    except (OSError, ValueError, struct.error):
+        return None
@@ -14,13 +14,15 @@ except ImportError:
     GPSTAGS = {}
 
 
-def extract_exif(filepath: str) -> dict:
+def extract_exif(filepath: str, ctx=None) -> dict:
     """Extract EXIF metadata from an image file.
 
     Returns a flat dict with keys matching the photos table columns:
     exif_camera, exif_lens, exif_focal_length, exif_iso,
     exif_aperture, exif_shutter, exif_gps_lat, exif_gps_lon,
     exif_date_taken, image_width, image_height, file_size_kb.
+
+    Pass an ImageContext as ``ctx`` to reuse its parsed header.
     """
     result = {
         'exif_camera': '',
@@ -38,8 +40,8 @@ def extract_exif(filepath: str) -> dict:
     }
 
     try:
-        path = Path(filepath)
-        result['file_size_kb'] = int(path.stat().st_size / 1024)
+        size = ctx.file_size if ctx is not None else Path(filepath).stat().st_size
+        result['file_size_kb'] = int(size / 1024)
     except Exception:
         pass
 
@@ -47,7 +49,9 @@ def extract_exif(filepath: str) -> dict:
         return result
 
     try:
-        img = Image.open(filepath)
+        img = ctx.image if ctx is not None else Image.open(filepath)
+        if img is None:
+            raise ValueError("unsupported image format")
         result['image_width'], result['image_height'] = img.size
 
         try:
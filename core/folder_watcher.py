@@ -1,11 +1,25 @@
 """
 Folder watcher for PhotoFlow — auto-imports new image files.
-Uses a polling QThread (no watchdog dependency required).
-If watchdog is installed, uses it for more efficient event-driven watching.
+
+With watchdog installed, file system events (inotify, FSEvents,
+ReadDirectoryChangesW) drive discovery.  A slow safety rescan also runs,
+for shares that do not deliver events.  Without watchdog the folder is
+polled.  Each poll is one DirectoryScanner walk (core/scanner.py) that
+skips the file listing of directories whose mtime has not changed.
+
+A new file is only reported once its size and mtime have stayed the same
+for ``settle_secs``, so files still being copied are not imported
+half-written.  Settled files are reported in batches of up to
+``batch_size`` files, or after ``batch_ms``, so a large drop costs the UI
+one bulk import instead of a refresh per file.  With ``import_photos``
+the watcher stores each batch and links duplicates itself (duplicate
+checks may read whole files), and the GUI only gets the new ids.
 """
 import os
+import threading
 import time
-from pathlib import Path
+
+from core.scanner import DirectoryScanner, is_image_file
 
 try:
     from PyQt6.QtCore import QThread, pyqtSignal
@@ -13,82 +27,269 @@ try:
 except ImportError:
     _QT = False
 
-_IMAGE_EXTENSIONS = {
-    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif',
-    '.webp', '.heic', '.heif', '.raw', '.cr2', '.nef', '.arw',
-}
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    _WATCHDOG = True
+except ImportError:
+    _WATCHDOG = False
+
+# With event-driven watching the full rescan is only a safety net.
+_EVENT_RESCAN_SECS = 600
+
+
+if _WATCHDOG:
+    class _EventCollector(FileSystemEventHandler):
+        """Collect candidate paths from watchdog's observer thread."""
+
+        def __init__(self):
+            super().__init__()
+            self.lock = threading.Lock()
+            self.paths: set[str] = set()
+
+        def _add(self, path):
+            if path and is_image_file(path):
+                with self.lock:
+                    self.paths.add(os.fsdecode(path))
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self._add(event.src_path)
+
+        def on_modified(self, event):
+            if not event.is_directory:
+                self._add(event.src_path)
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                self._add(event.dest_path)
+
+        def drain(self) -> set:
+            with self.lock:
+                paths, self.paths = self.paths, set()
+            return paths
+
 
 if _QT:
     class FolderWatcher(QThread):
         """
-        Polls a directory for new image files every `interval_secs` seconds.
-        Emits `new_photo_found(filepath)` for each new file discovered.
+        Watches a directory for new image files.
+        Emits `new_photos_found([(filepath, metadata), ...])` for batches of
+        new files once they have finished being written.  `metadata` holds
+        the EXIF/quality/hash fields when `read_metadata` is set (computed
+        on this thread, off the GUI thread), otherwise it is empty.  Uses
+        watchdog events when available and otherwise polls every
+        `interval_secs` seconds.  With `import_photos` each batch is added
+        to the database on this thread instead, duplicates are tracked, and
+        `photos_imported(photo_ids, duplicate_group_ids)` is emitted.
         """
-        new_photo_found = pyqtSignal(str)
+        new_photos_found = pyqtSignal(list)
+        photos_imported = pyqtSignal(list, list)  # new photo ids, duplicate groups they joined
         status_update = pyqtSignal(str)
 
         def __init__(self, folder: str, db, interval_secs: int = 15,
-                     include_subfolders: bool = True, auto_analyze: bool = True):
+                     include_subfolders: bool = True, settle_secs: float = 2.0,
+                     use_events: bool = True,
+                     batch_size: int = 200, batch_ms: int = 500, read_metadata: bool = False,
+                     import_photos: bool = False):
             super().__init__()
             self.folder = folder
             self.db = db
             self.interval_secs = interval_secs
             self.include_subfolders = include_subfolders
-            self.auto_analyze = auto_analyze
+            self.settle_secs = settle_secs
+            self.use_events = use_events and _WATCHDOG
+            self.batch_size = batch_size
+            self.batch_ms = batch_ms
+            self.read_metadata = read_metadata
+            self.import_photos = import_photos
+            self._import_db = None
+            self._duplicates = None
+            self._batch: list[str] = []
+            self._batch_started = 0.0
             self._running = False
             self._known_paths: set[str] = set()
+            self._settling: dict[str, tuple] = {}  # path -> ((size, mtime_ns), last change)
+            self._scanner = None
+            self._observer = None
+            self._events = None
+            self._folder_changed = False
 
         def run(self):
             self._running = True
             # Seed known paths from DB to avoid re-importing existing
-            try:
-                existing = self.db.get_all_photos()
-                self._known_paths = {p['filepath'] for p in existing}
-            except Exception:
-                self._known_paths = set()
-
-            self.status_update.emit(f'Watching: {self.folder}')
+            self._known_paths = self._load_known_paths()
+            self._start_watching()
+            next_scan = 0.0
 
             while self._running:
                 try:
-                    self._scan()
+                    if self._folder_changed:
+                        self._folder_changed = False
+                        # Settled files are already in _known_paths; report
+                        # them now or they would never be imported.
+                        self._flush_batch(force=True)
+                        self._stop_observer()
+                        self._known_paths = self._load_known_paths()
+                        self._settling.clear()
+                        self._start_watching()
+                        next_scan = 0.0
+                    if time.monotonic() >= next_scan:
+                        self._scan()
+                        rescan = _EVENT_RESCAN_SECS if self._observer else self.interval_secs
+                        next_scan = time.monotonic() + rescan
+                    if self._events is not None:
+                        for path in self._events.drain():
+                            self._consider(path)
+                    self._release_settled()
+                    self._flush_batch()
                 except Exception as e:
                     self.status_update.emit(f'Watcher error: {e}')
+                time.sleep(0.25)
+            try:
+                self._flush_batch(force=True)
+            except Exception as e:
+                self.status_update.emit(f'Watcher error: {e}')
+            self._stop_observer()
+            if self._import_db is not None:
+                self._import_db.close()
+                self._import_db = None
+
+        def _load_known_paths(self) -> set:
+            # The caller's connection belongs to the GUI thread; SQLite
+            # connections cannot be shared, so read through a private one.
+            try:
+                from core.database import PhotoDatabase
+                db = PhotoDatabase(self.db.db_path)
+                try:
+                    return set(db.get_analysis_state())
+                finally:
+                    db.close()
+            except Exception:
+                return set()
 
-                for _ in range(self.interval_secs * 10):
-                    if not self._running:
-                        break
-                    time.sleep(0.1)
+        def _start_watching(self):
+            self._scanner = DirectoryScanner(self.folder, self.include_subfolders)
+            mode = 'polling'
+            if self.use_events and os.path.isdir(self.folder):
+                try:
+                    self._events = _EventCollector()
+                    self._observer = Observer()
+                    self._observer.schedule(self._events, self._scanner.root,
+                                            recursive=self.include_subfolders)
+                    self._observer.start()
+                    mode = 'events'
+                except Exception as e:
+                    self.status_update.emit(f'Watcher: event watching unavailable, polling instead: {e}')
+                    self._observer = None
+                    self._events = None
+            self.status_update.emit(f'Watching: {self.folder} ({mode})')
+
+        def _stop_observer(self):
+            if self._observer is not None:
+                try:
+                    self._observer.stop()
+                    self._observer.join(2)
+                except Exception:
+                    pass
+            self._observer = None
+            self._events = None
 
         def _scan(self):
-            folder = Path(self.folder)
-            if not folder.is_dir():
+            if not os.path.isdir(self.folder):
                 return
+            for entry in self._scanner.scan():
+                self._consider(entry.path, (entry.size, entry.mtime_ns))
 
-            if self.include_subfolders:
-                candidates = (
-                    str(p) for ext in _IMAGE_EXTENSIONS
-                    for p in folder.rglob(f'*{ext}')
-                )
-            else:
-                candidates = (
-                    str(p) for ext in _IMAGE_EXTENSIONS
-                    for p in folder.glob(f'*{ext}')
-                )
-
-            new_found = 0
-            for fp in candidates:
-                if fp not in self._known_paths:
+        def _consider(self, fp: str, signature=None):
+            """Start (or restart) the settle timer for a candidate new file."""
+            if fp in self._known_paths:
+                return
+            if signature is None:
+                try:
+                    st = os.stat(fp)
+                except OSError:
+                    self._settling.pop(fp, None)
+                    return
+                signature = (st.st_size, st.st_mtime_ns)
+            previous = self._settling.get(fp)
+            if previous is None or previous[0] != signature:
+                self._settling[fp] = (signature, time.monotonic())
+
+        def _release_settled(self):
+            """Report files whose size and mtime have not changed for ``settle_secs``."""
+            if not self._settling:
+                return
+            now = time.monotonic()
+            for fp, (signature, changed_at) in list(self._settling.items()):
+                try:
+                    st = os.stat(fp)
+                except OSError:
+                    del self._settling[fp]
+                    continue
+                current = (st.st_size, st.st_mtime_ns)
+                if current != signature:
+                    self._settling[fp] = (current, now)
+                elif now - changed_at >= self.settle_secs and st.st_size > 0:
+                    del self._settling[fp]
                     self._known_paths.add(fp)
-                    self.new_photo_found.emit(fp)
-                    new_found += 1
+                    if not self._batch:
+                        self._batch_started = now
+                    self._batch.append(fp)
+                    if len(self._batch) >= self.batch_size:
+                        self._flush_batch()
+
+        def _flush_batch(self, force: bool = False):
+            """Emit the pending batch once it is full or ``batch_ms`` old."""
+            if not self._batch:
+                return
+            age_ms = (time.monotonic() - self._batch_started) * 1000
+            if not force and len(self._batch) < self.batch_size and age_ms < self.batch_ms:
+                return
+            paths, self._batch = self._batch, []
+            if self.read_metadata or self.import_photos:
+                from core.ingest_pipeline import local_metadata
+                items = [(fp, local_metadata(fp)) for fp in paths]
+            else:
+                items = [(fp, {}) for fp in paths]
+            if self.import_photos:
+                self._import(items)
+            else:
+                self.new_photos_found.emit(items)
+            self.status_update.emit(f'Watcher: {len(items)} new file(s) found in {self.folder}')
+
+        def _import(self, items):
+            """Store a batch in one transaction and link its duplicates, on this thread."""
+            from core.database import PhotoDatabase
+            from core.duplicate_detector import DuplicateTracker
 
-            if new_found:
-                self.status_update.emit(f'Watcher: {new_found} new file(s) found in {self.folder}')
+            if self._import_db is None:
+                self._import_db = PhotoDatabase(self.db.db_path)
+            db = self._import_db
+            if self._duplicates is None:
+                self._duplicates = DuplicateTracker(db)
+            photo_ids, linked = [], []
+            db.begin_transaction()
+            try:
+                for filepath, meta in items:
+                    photo_id = db.add_photo(filepath, meta, commit=False)
+                    if photo_id:
+                        photo_ids.append(photo_id)
+                        if self._duplicates.track(photo_id, meta, filepath, commit=False):
+                            linked.append(photo_id)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                # Its index may now hold rows that were rolled back.
+                self._duplicates = None
+                self.status_update.emit(f'Watcher: error importing {len(items)} file(s): {e}')
+                return
+            if photo_ids:
+                self.photos_imported.emit(photo_ids, db.get_duplicate_group_ids(linked))
 
         def stop(self):
             self._running = False
 
         def set_folder(self, folder: str):
             self.folder = folder
-            self._known_paths.clear()
+            self._folder_changed = True
@@ -0,0 +1,119 @@
+"""
+Shared decoded-image context for PhotoFlow.
+
+Ingesting one photo used to open the file five times (EXIF, blur,
+exposure, phash, AI) and then read it again for the MD5.  ImageContext
+parses the header once for size and EXIF and makes a single
+reduced-resolution decode.  The EXIF, quality and hashing helpers accept
+it through ``ctx=``.
+
+The file is not read up front: Pillow reads what the header and the
+decode need, so a RAW file it cannot decode costs a header probe rather
+than 30-60 MB of I/O.  ``data`` reads the whole file on first use.
+"""
+import io
+import os
+from pathlib import Path
+
+try:
+    from PIL import Image
+    _PIL = True
+except ImportError:
+    _PIL = False
+
+
+# Longest side of the shared preview decode.  JPEG draft mode picks the
+# nearest 1/2, 1/4 or 1/8 scale at or above this, so it costs a fraction
+# of a full decode.
+PREVIEW_SIZE = 1024
+
+
+class ImageContext:
+    """Decoded views of one image file (and its bytes, on demand), each computed once."""
+
+    def __init__(self, filepath: str, data: bytes | None = None, preview_size: int = PREVIEW_SIZE,
+                 file_size: int | None = None):
+        self.filepath = str(filepath)
+        self._data = data
+        self._file_size = file_size
+        self.preview_size = preview_size
+        self._image = None
+        self._opened = False
+        self._preview = None
+        self._gray = None
+        self.size = (0, 0)
+
+    @classmethod
+    def load(cls, filepath: str, preview_size: int = PREVIEW_SIZE) -> 'ImageContext':
+        """Context for ``filepath``; nothing is read yet.  Raises OSError if it does not exist."""
+        return cls(filepath, None, preview_size, os.stat(filepath).st_size)
+
+    @property
+    def data(self) -> bytes:
+        """Every byte of the file, read on first use."""
+        if self._data is None:
+            with open(self.filepath, 'rb') as f:
+                self._data = f.read()
+        return self._data
+
+    @property
+    def file_size(self) -> int:
+        if self._file_size is None:
+            self._file_size = len(self.data)
+        return self._file_size
+
+    def _source(self):
+        return io.BytesIO(self._data) if self._data is not None else self.filepath
+
+    @property
+    def image(self):
+        """The lazily opened PIL image (header parsed, pixels not decoded), or None."""
+        if not self._opened:
+            self._opened = True
+            if _PIL:
+                try:
+                    self._image = Image.open(self._source())
+                    self.size = self._image.size
+                except Exception:
+                    self._image = None
+        return self._image
+
+    def close(self) -> None:
+        """Release the file handle the header parse keeps open."""
+        if self._image is not None:
+            self._image.close()
+
+    @property
+    def preview(self):
+        """An RGB decode no larger than ``preview_size`` on its longest side, or None."""
+        if self._preview is None and self.image is not None:
+            try:
+                img = Image.open(self._source())
+                img.draft('RGB', (self.preview_size, self.preview_size))
+                img = img.convert('RGB')
+                img.thumbnail((self.preview_size, self.preview_size))
+                self._preview = img
+            except Exception:
+                self._preview = None
+        return self._preview
+
+    @property
+    def gray(self):
+        """Greyscale ('L') version of :attr:`preview`, or None."""
+        if self._gray is None and self.preview is not None:
+            self._gray = self.preview.convert('L')
+        return self._gray
+
+    def exif(self) -> dict:
+        """Raw EXIF tag dict from the header, or an empty dict."""
+        img = self.image
+        if img is None:
+            return {}
+        try:
+            raw = img.getexif()
+            return dict(raw) if raw else {}
+        except Exception:
+            return {}
+
+    def __repr__(self):
+        return f"ImageContext({Path(self.filepath).name!r}, {self.file_size} bytes)"
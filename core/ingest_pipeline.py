@@ -0,0 +1,414 @@
+"""
+Staged ingest pipeline for PhotoFlow.
+
+Importing a folder used to run every step for one file before starting the
+next, so cheap EXIF/quality/hash work waited behind the slow LLaVA call.
+Here each step is a stage joined by queues:
+
+    analysis_jobs ──► local pool (processes) ──► writer ──► AI workers ──► writer
+
+* Planning compares each file's (size, mtime, inode) fingerprint with the
+  one stored for it.  Only new files, modified files and photos not yet
+  analysed get a job, so re-scanning an unchanged library costs one query
+  and no file reads.
+* Jobs are persisted in the ``analysis_jobs`` table, one per file and
+  stage.  The writer claims them in small batches and records each outcome
+  in the same transaction as the data, so an interrupted run (stopped or
+  crashed) resumes where it left off.  Failed jobs are retried a few times
+  and then kept, with their error, as failed.
+* EXIF, quality and hashing run in a process pool and use every core.
+* The AI stage hands photos to an AnalyzerService, which runs several
+  Ollama calls at once and adapts their number to the host's latency.
+* A single writer owns the database connection and commits in batches,
+  linking each new photo into its duplicate group as it goes.
+
+Local metadata for a folder lands within minutes, while AI analysis keeps
+running in the background.
+"""
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from core.analyzer_service import BULK, AnalyzerService
+from core.database import MAX_JOB_ATTEMPTS, PhotoDatabase
+from core.exif_extractor import extract_exif
+from core.quality_scorer import score_image
+from core.duplicate_detector import DuplicateTracker, perceptual_hash, HASH_TIER_SIZE
+from core.image_context import ImageContext
+from core.scanner import ScanEntry
+
+
+_STOP = object()
+
+
+def local_metadata(filepath: str) -> dict:
+    """Return EXIF, quality and hash fields for one file.
+
+    Runs inside a worker process, so it must stay a picklable module-level
+    function.  One ImageContext (one header parse, one reduced decode) is
+    shared by every extractor; each extractor fails independently.
+    """
+    meta = {}
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return meta
+    ctx = ImageContext(filepath, file_size=st.st_size)
+    # Fingerprint used by later scans to tell whether the file changed.
+    meta.update(file_mtime_ns=st.st_mtime_ns, file_inode=st.st_ino)
+    # Only the size tier here: the writer's DuplicateTracker reads partial
+    # and full hashes if another photo has the same size.
+    meta.update(file_size_bytes=st.st_size, hash_tier=HASH_TIER_SIZE)
+    try:
+        try:
+            meta.update(extract_exif(filepath, ctx=ctx))
+        except Exception:
+            pass
+        try:
+            quality = score_image(filepath, ctx=ctx)
+            for k in ('blur_score', 'exposure_score', 'quality'):
+                meta[k] = quality[k]
+            meta['quality_issues'] = ', '.join(quality.get('quality_issues') or [])
+            meta['quality_score'] = quality['blur_score']
+        except Exception:
+            pass
+        p_hash = perceptual_hash(filepath, ctx=ctx)
+        if p_hash:
+            meta['perceptual_hash'] = p_hash
+    finally:
+        ctx.close()
+    return meta
+
+
+class IngestPipeline:
+    """Run the local and AI stages for ``files`` concurrently.
+
+    ``files`` holds paths or ScanEntry items from core.scanner.  Entries
+    carry the file's fingerprint.  A photo is re-processed when its size or
+    mtime differs from the stored fingerprint, and its hashes, quality
+    scores and duplicate links are reset first.  Entries are taken to be
+    resolved already (scan from a ``realpath`` root); bare paths are
+    resolved here.
+
+    Jobs are recorded under ``source``.  Unfinished jobs of that source
+    from an earlier run are processed too, so a run with no ``files`` just
+    resumes.  A photo whose local stage finished in an earlier run goes
+    straight to the AI stage.
+
+    AI calls go through ``analyzer`` (an AnalyzerService, shared with other
+    callers) at ``priority``, or through a private one running ``analyze``
+    on at most ``ai_workers`` calls at once.
+
+    Callbacks are invoked from the thread that called :meth:`run` (the
+    writer), after the corresponding batch has been committed:
+
+    * ``on_local(photo_id)``: local metadata for a photo has been stored.
+    * ``on_changed(photo_id, path)``: a known photo's file was modified and
+      re-processed (cached thumbnails of it are stale).
+    * ``on_ai(photo_id)``: AI fields for a photo have been stored.
+    * ``on_progress(done, local_done, total, filename)``: counts are files;
+      ``done`` and ``local_done`` include the :attr:`skipped` ones.
+    * ``on_error(message)``
+    """
+
+    def __init__(self, db_path, files, analyze=None, local=local_metadata,
+                 cpu_workers=None, ai_workers=1, use_processes=True,
+                 queue_size=64, batch_size=25, batch_interval=0.5, track_duplicates=True,
+                 source='import', max_attempts=MAX_JOB_ATTEMPTS, analyzer=None, priority=BULK):
+        if analyze is None:
+            from core.ai_analyzer import analyze_image
+            analyze = functools.partial(analyze_image, raise_errors=True)
+        self.db_path = db_path
+        self.files = list(files)
+        self.analyze = analyze
+        self.local = local
+        self.cpu_workers = cpu_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.ai_workers = max(1, ai_workers)
+        self.use_processes = use_processes
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.track_duplicates = track_duplicates
+        self.source = source
+        self.max_attempts = max_attempts
+        self.analyzer = analyzer
+        self.priority = priority
+        self._duplicates = None
+
+        self.on_local = None
+        self.on_changed = None
+        self.on_ai = None
+        self.on_progress = None
+        self.on_error = None
+
+        self._stop = threading.Event()
+        # Only claimed jobs are queued, so the claim limits bound every queue.
+        self._scan_q: queue.Queue = queue.Queue()
+        self._write_q: queue.Queue = queue.Queue()
+        self._ai_futures: dict = {}  # job_id -> Future of its AnalyzerService call
+
+        self.total = 0
+        self._skipped = 0
+        self._resumed = 0
+        self._changed: set = set()  # paths of known photos whose file was modified
+        self._claimed: dict = {}  # job_id -> stage, until its outcome is written
+        self._local_done = 0
+        self._ai_done = 0
+        self._failed = 0
+
+    @property
+    def skipped(self) -> int:
+        """Files left alone because they are analysed and unchanged."""
+        return self._skipped
+
+    @property
+    def failed(self) -> int:
+        """Jobs given up on in this run; their errors are kept in ``analysis_jobs``."""
+        return self._failed
+
+    def stop(self):
+        """Ask every stage to wind down; already finished work is still committed."""
+        self._stop.set()
+
+    # ── Jobs ────────────────────────────────────────────────────────────
+
+    def _plan(self, db):
+        """Queue a job for the next stage of every file that needs work."""
+        known = db.get_analysis_state()
+        local_states = db.get_job_states(self.source, 'local')
+        jobs, adopted = [], []
+        for item in self.files:
+            if isinstance(item, ScanEntry):
+                path, fingerprint = item.path, (item.size, item.mtime_ns, item.inode)
+            else:
+                path, fingerprint = str(Path(item).resolve()), None
+            state = known.get(path)
+            photo_id, changed = None, False
+            if state:
+                photo_id, analyzed, stored = state
+                if fingerprint is not None:
+                    if stored is None or stored[:2] == fingerprint[:2]:
+                        if stored != fingerprint:
+                            # Legacy row or only the inode moved (copied
+                            # share, restored backup): adopt, no re-read.
+                            adopted.append((photo_id, fingerprint))
+                    else:
+                        changed = True
+                if analyzed and not changed:
+                    self._skipped += 1
+                    continue
+            if changed:
+                self._changed.add(path)
+            if photo_id is not None and not changed and local_states.get(path) == 'done':
+                jobs.append((path, 'ai', photo_id))
+            else:
+                jobs.append((path, 'local', photo_id))
+        db.begin_transaction()
+        db.set_fingerprints(adopted, commit=False)
+        db.enqueue_jobs(self.source, jobs, commit=False)
+        db.commit()
+        self._resumed = db.get_job_counts(self.source).get(('ai', 'pending'), 0)
+        self.total = self._skipped + db.count_unfinished_jobs(self.source)
+
+    def _claim(self, db) -> int:
+        """Top up the local and AI queues from the jobs table; return the number claimed."""
+        if self._stop.is_set():
+            return 0
+        busy = {'local': 0, 'ai': 0}
+        for stage in self._claimed.values():
+            busy[stage] += 1
+        claimed = 0
+        room = self.queue_size - busy['local']
+        if room > 0:
+            for job in db.claim_jobs(self.source, 'local', room, self.max_attempts):
+                self._claimed[job[0]] = 'local'
+                self._scan_q.put((job, job[1] in self._changed))
+                claimed += 1
+        # The service applies backpressure: claim only what it takes without blocking.
+        room = self.analyzer.available(self.priority)
+        if room > 0:
+            jobs = db.claim_jobs(self.source, 'ai', room, self.max_attempts)
+            for i, job in enumerate(jobs):
+                # The limit can drop after ``available`` (a failed call halves
+                # it): jobs the service no longer takes go back to pending.
+                future = self.analyzer.try_submit(job[1], priority=self.priority)
+                if future is None:
+                    db.release_jobs([rest[0] for rest in jobs[i:]])
+                    # Still work to do: keep the writer loop from finishing.
+                    claimed += len(jobs) - i
+                    break
+                self._claimed[job[0]] = 'ai'
+                self._ai_futures[job[0]] = future
+                future.add_done_callback(lambda f, job=job: self._ai_finished(f, job))
+                claimed += 1
+        return claimed
+
+    # ── Stages ──────────────────────────────────────────────────────────
+
+    def _dispatch_local(self, executor):
+        while True:
+            item = self._scan_q.get()
+            if item is _STOP or self._stop.is_set():
+                break
+            job, changed = item
+            try:
+                future = executor.submit(self.local, job[1])
+            except RuntimeError:  # executor shut down by stop()
+                break
+            future.add_done_callback(
+                lambda f, job=job, changed=changed: self._local_finished(f, job, changed)
+            )
+
+    def _local_finished(self, future, job, changed=False):
+        if future.cancelled() or self._stop.is_set():
+            return
+        meta, error = None, None
+        try:
+            meta = future.result()
+        except Exception as e:
+            error = e
+            self._report_error(f"Error reading {Path(job[1]).name}: {e}")
+        self._write_q.put(('changed' if changed else 'local', job, meta, error))
+
+    def _ai_finished(self, future, job):
+        # Runs on an AnalyzerService thread.
+        if future.cancelled() or self._stop.is_set():
+            return
+        result, error = None, future.exception()
+        if error is None:
+            result = future.result()
+        # Errors are kept on the job rather than reported per photo: with
+        # Ollama down every photo would fail.  See ``failed``.
+        self._write_q.put(('ai', job, result, error))
+
+    # ── Writer ──────────────────────────────────────────────────────────
+
+    def _finished(self, claimed: int) -> bool:
+        if self._stop.is_set():
+            return self._write_q.empty()
+        return not claimed and not self._claimed
+
+    def _write_batch(self, db, batch) -> list:
+        """Apply a batch in one transaction; return the events to report afterwards."""
+        outcomes = []  # (kind, photo_id, path, final)
+        db.begin_transaction()
+        try:
+            for kind, (job_id, path, photo_id, attempts), meta, error in batch:
+                if error is not None:
+                    db.fail_job(job_id, error, self.max_attempts, commit=False)
+                    outcomes.append((kind, None, path, attempts >= self.max_attempts))
+                    continue
+                if kind != 'ai':
+                    if photo_id is None:
+                        photo_id = db.add_photo(path, meta or {}, commit=False)
+                    else:
+                        if kind == 'changed':
+                            db.clear_file_derived_fields(photo_id, commit=False)
+                            if self._duplicates is not None:
+                                self._duplicates.forget(photo_id, commit=False)
+                        if meta:
+                            db.update_photo_metadata(photo_id, meta, commit=False)
+                    if photo_id is not None:
+                        if self._duplicates is not None:
+                            self._duplicates.track(photo_id, meta or {}, path, commit=False)
+                        db.enqueue_jobs(self.source, [(path, 'ai', photo_id)], commit=False)
+                elif meta:
+                    for field in db.get_corrected_fields_for_photo(photo_id):
+                        meta.pop(field, None)
+                    db.update_photo_metadata(photo_id, meta, commit=False)
+                db.finish_job(job_id, commit=False)
+                outcomes.append((kind, photo_id, path, True))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._report_error(f"Database write failed: {e}")
+            if self._duplicates is not None:
+                # Its index may now hold rows that were rolled back.
+                self._duplicates = DuplicateTracker(db)
+            # The jobs are still marked running: count the attempt so they are retried.
+            for _kind, job, _meta, _error in batch:
+                db.fail_job(job[0], f"Database write failed: {e}", self.max_attempts)
+            outcomes = [(kind, None, job[1], job[3] >= self.max_attempts)
+                        for kind, job, _meta, _error in batch]
+
+        for _kind, job, _meta, _error in batch:
+            self._claimed.pop(job[0], None)
+            self._ai_futures.pop(job[0], None)
+        for kind, photo_id, path, final in outcomes:
+            if photo_id is None and final:
+                self._failed += 1
+            if kind != 'ai':
+                if photo_id is not None:
+                    self._local_done += 1
+                elif final:
+                    # Given up on (or not storable): no AI stage will follow.
+                    self._local_done += 1
+                    self._ai_done += 1
+            elif final:
+                self._ai_done += 1
+        return [(kind, photo_id, path) for kind, photo_id, path, _final in outcomes if photo_id is not None]
+
+    def _report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+
+    def run(self):
+        """Run the pipeline to completion (or until :meth:`stop`) in the calling thread."""
+        db = PhotoDatabase(self.db_path)
+        self._duplicates = DuplicateTracker(db) if self.track_duplicates else None
+        # Jobs still marked running were claimed by a run that crashed.
+        db.release_running_jobs(self.source)
+        self._plan(db)
+        owns_analyzer = self.analyzer is None
+        if owns_analyzer:
+            self.analyzer = AnalyzerService(self.db_path, self.analyze, max_concurrency=self.ai_workers)
+        pool_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        executor = pool_cls(max_workers=self.cpu_workers)
+        dispatcher = threading.Thread(target=self._dispatch_local, args=(executor,), daemon=True)
+        dispatcher.start()
+
+        try:
+            while not self._finished(self._claim(db)):
+                batch = []
+                deadline = time.monotonic() + self.batch_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._write_q.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                if not batch:
+                    continue
+                for kind, photo_id, path in self._write_batch(db, batch):
+                    if kind == 'changed' and self.on_changed:
+                        self.on_changed(photo_id, path)
+                    callback = self.on_ai if kind == 'ai' else self.on_local
+                    if callback:
+                        callback(photo_id)
+                # Once per batch, so failed jobs move the count along too.
+                if self.on_progress:
+                    self.on_progress(self._skipped + self._ai_done,
+                                     self._skipped + self._resumed + self._local_done,
+                                     self.total, Path(batch[-1][1][1]).name)
+            if not self._stop.is_set():
+                db.prune_jobs(self.source)
+        finally:
+            self._stop.set()
+            # Unblock the dispatcher if it is waiting for work.
+            self._scan_q.put(_STOP)
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future in self._ai_futures.values():
+                future.cancel()
+            if owns_analyzer:
+                # A call already running finishes in the background; its result is dropped.
+                self.analyzer.shutdown(wait=False)
+                self.analyzer = None
+            # Unwritten claims go back to pending for the next run.
+            db.release_jobs(list(self._claimed))
+            db.close()
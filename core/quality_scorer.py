@@ -2,6 +2,12 @@
 Image quality scoring for PhotoFlow.
 Detects blur, exposure issues, and gives an overall quality grade.
 Uses OpenCV (if available) with Pillow fallback.
+
+Both checks run on a greyscale image no larger than ANALYSIS_SIZE, the
+size of the shared ImageContext preview.  Laplacian variance grows as an
+image is scaled down, so scoring every photo at that one scale keeps the
+scores comparable across cameras and between the ingest path (which
+passes the preview) and direct calls (which decode the file the same way).
 """
 
 try:
@@ -17,6 +23,12 @@ try:
 except ImportError:
     _PIL = False
 
+from core.image_context import PREVIEW_SIZE, ImageContext
+
+
+# Longest side, in pixels, of the image blur and exposure are measured on.
+ANALYSIS_SIZE = PREVIEW_SIZE
+
 
 QUALITY_EXCELLENT = 'excellent'   # Sharp, well-exposed
 QUALITY_GOOD = 'good'             # Minor issues
@@ -24,12 +36,15 @@ QUALITY_FAIR = 'fair'             # Noticeable blur or exposure problems
 QUALITY_POOR = 'poor'             # Severely blurry or black/white clipped
 
 
-def score_image(filepath: str) -> dict:
+def score_image(filepath: str, ctx=None) -> dict:
     """Score image quality. Returns dict with:
       blur_score (float, higher=sharper),
       exposure_score (float, 0-1, 0.5=ideal),
       quality (str: excellent/good/fair/poor),
       quality_issues (list of str describing problems)
+
+    With an ImageContext, both checks run on its shared greyscale preview;
+    otherwise the file is decoded to the same size first.
     """
     result = {
         'blur_score': 0.0,
@@ -38,14 +53,17 @@ def score_image(filepath: str) -> dict:
         'quality_issues': [],
     }
 
-    blur = _detect_blur(filepath)
-    exposure = _check_exposure(filepath)
+    gray = _analysis_gray(filepath, ctx)
+    blur = _detect_blur(filepath, gray)
+    exposure = _check_exposure(filepath, gray)
 
     result['blur_score'] = blur
     result['exposure_score'] = exposure
 
-    # Thresholds differ by backend:
+    # Thresholds differ by backend, and hold at ANALYSIS_SIZE:
     # Laplacian variance (CV2) ranges ~0–5000+; PIL stddev*2 ranges ~0–60.
+    # At that scale a Laplacian variance of 50 is roughly a 1.2 px Gaussian
+    # blur of a natural scene (~5 px on a 12 MP frame) and 200 one of 0.75 px.
     if _CV2:
         blur_blurry_threshold = 50.0
         blur_sharp_threshold = 200.0
@@ -73,11 +91,29 @@ def score_image(filepath: str) -> dict:
     return result
 
 
-def _detect_blur(filepath: str) -> float:
+def _analysis_gray(filepath: str, ctx=None):
+    """Greyscale image of ``filepath`` no larger than ANALYSIS_SIZE, or None."""
+    if not _PIL:
+        return None
+    try:
+        if ctx is None or ctx.preview_size != ANALYSIS_SIZE:
+            ctx = ImageContext.load(filepath)
+        return ctx.gray
+    except Exception:
+        return None
+
+
+def _detect_blur(filepath: str, gray=None) -> float:
     """Laplacian variance — higher = sharper. Returns 0 on failure."""
     if _CV2:
         try:
-            img = cv2.imread(filepath, cv2.IMREAD_GRAYSCALE)
+            if gray is not None:
+                img = np.asarray(gray)
+            else:
+                img = cv2.imread(filepath, cv2.IMREAD_GRAYSCALE)
+                if img is not None and max(img.shape) > ANALYSIS_SIZE:
+                    scale = ANALYSIS_SIZE / max(img.shape)
+                    img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
             if img is None:
                 return 100.0
             return float(cv2.Laplacian(img, cv2.CV_64F).var())
@@ -86,7 +122,7 @@ def _detect_blur(filepath: str) -> float:
 
     if _PIL:
         try:
-            img = Image.open(filepath).convert('L')
+            img = gray if gray is not None else Image.open(filepath).convert('L')
             w, h = img.size
             # Sample center crop for speed
             cx, cy = w // 2, h // 2
@@ -99,11 +135,12 @@ def _detect_blur(filepath: str) -> float:
     return 100.0  # Can't score, assume ok
 
 
-def _check_exposure(filepath: str) -> float:
+def _check_exposure(filepath: str, gray=None) -> float:
     """Returns 0.0 (black) to 1.0 (white). 0.4-0.6 is ideal."""
     if _PIL:
         try:
-            img = Image.open(filepath).convert('L').resize((100, 100))
+            img = gray if gray is not None else Image.open(filepath).convert('L')
+            img = img.resize((100, 100))
             stat = ImageStat.Stat(img)
             return stat.mean[0] / 255.0
         except Exception:
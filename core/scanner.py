@@ -0,0 +1,144 @@
+"""
+Directory scanning for PhotoFlow.
+
+One ``os.scandir`` walk serves every caller: the bulk import, the folder
+watcher and relinking.  Globbing once per extension (and again in upper
+case) would cost many passes over the tree.  Entries come back as
+``ScanEntry(path, size, mtime_ns, inode)`` straight from the directory
+listing; on most platforms that needs no extra stat per file.
+"""
+import fnmatch
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+
+IMAGE_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif',
+    '.webp', '.heic', '.heif', '.raw', '.cr2', '.nef', '.arw',
+})
+
+
+class ScanEntry(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+def is_image_file(name: str, extensions=IMAGE_EXTENSIONS) -> bool:
+    """Case-insensitive match of ``name`` against ``extensions``."""
+    return os.path.splitext(name)[1].lower() in extensions
+
+
+def _excluded(root: str, path: str, name: str, exclude) -> bool:
+    if not exclude:
+        return False
+    rel = os.path.relpath(path, root)
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel, pattern) for pattern in exclude)
+
+
+def list_directory(path: str, root: str, extensions=IMAGE_EXTENSIONS, exclude=(), recursive=True):
+    """List one directory: return ``(files, subdirs)``.
+
+    ``files`` holds ScanEntry items matching ``extensions`` (all files when
+    None).  ``subdirs`` is empty unless ``recursive``.  Entries matching an
+    ``exclude`` glob, by name or by path relative to ``root``, are skipped.
+    Raises OSError when the directory itself cannot be read.
+    """
+    files, subdirs = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and not _excluded(root, entry.path, entry.name, exclude):
+                        subdirs.append(entry.path)
+                    continue
+                if extensions is not None and not is_image_file(entry.name, extensions):
+                    continue
+                if not entry.is_file() or _excluded(root, entry.path, entry.name, exclude):
+                    continue
+                st = entry.stat()
+                files.append(ScanEntry(entry.path, st.st_size, st.st_mtime_ns, st.st_ino or entry.inode()))
+            except OSError:
+                continue
+    return files, subdirs
+
+
+def _walk(top: str, root: str, extensions, exclude, recursive):
+    stack = [top]
+    while stack:
+        try:
+            files, subdirs = list_directory(stack.pop(), root, extensions, exclude, recursive)
+        except OSError:
+            continue
+        yield from files
+        stack.extend(subdirs)
+
+
+def scan_files(root: str, extensions=IMAGE_EXTENSIONS, recursive: bool = True,
+               exclude=(), workers: int = 1):
+    """Yield a ScanEntry for every matching file under ``root``.
+
+    ``workers`` > 1 walks the top-level subdirectories in parallel threads,
+    which hides latency on network file systems; entries then arrive in
+    no particular order.
+    """
+    try:
+        files, subdirs = list_directory(root, root, extensions, exclude, recursive)
+    except OSError:
+        return
+    yield from files
+    if workers <= 1 or len(subdirs) < 2:
+        for subdir in subdirs:
+            yield from _walk(subdir, root, extensions, exclude, recursive)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(lambda d: list(_walk(d, root, extensions, exclude, recursive)), subdir)
+                   for subdir in subdirs]
+        for future in futures:
+            yield from future.result()
+
+
+class DirectoryScanner:
+    """Incremental walk that only lists directories that changed.
+
+    A directory's mtime changes when entries are added, removed or renamed in
+    it, so an unchanged directory cannot hold new files.  Its file listing is
+    skipped, but its cached subdirectories are still visited.
+    """
+
+    def __init__(self, root: str, recursive: bool = True, extensions=IMAGE_EXTENSIONS, exclude=()):
+        self.root = os.path.realpath(root)
+        self.recursive = recursive
+        self.extensions = extensions
+        self.exclude = tuple(exclude)
+        self._dirs: dict[str, tuple] = {}  # path -> (mtime_ns, subdirs)
+
+    def reset(self):
+        self._dirs.clear()
+
+    def scan(self):
+        """Yield a ScanEntry for each matching file in directories that changed since the last scan."""
+        stack = [self.root]
+        seen = set()
+        while stack:
+            path = stack.pop()
+            seen.add(path)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._dirs.get(path)
+            if cached is not None and cached[0] == mtime:
+                stack.extend(cached[1])
+                continue
+            try:
+                files, subdirs = list_directory(path, self.root, self.extensions, self.exclude, self.recursive)
+            except OSError:
+                continue
+            yield from files
+            self._dirs[path] = (mtime, subdirs)
+            stack.extend(subdirs)
+        for gone in self._dirs.keys() - seen:
+            del self._dirs[gone]
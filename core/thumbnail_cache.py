@@ -0,0 +1,105 @@
+"""
+In-memory thumbnail cache for PhotoFlow.
+
+Sits in front of the on-disk ``thumbnail_cache`` folder so that tab
+switches and re-sorts reuse decoded pixmaps instead of hashing paths,
+stat-ing files and decoding JPEGs again.  Entries are evicted least
+recently used first once their combined size exceeds a byte budget.
+"""
+from collections import OrderedDict
+
+
+DEFAULT_BUDGET_BYTES = 128 * 1024 * 1024
+
+
+def image_cost(image) -> int:
+    """Approximate decoded size in bytes of a QPixmap/QImage (or anything with width/height/depth)."""
+    try:
+        depth = image.depth() or 32
+        return max(1, image.width() * image.height() * depth // 8)
+    except Exception:
+        return 1
+
+
+class ThumbnailCache:
+    """Byte-budgeted LRU of decoded thumbnails.
+
+    Keys are ``(filepath, size)``.  Each entry also remembers a version
+    (the source file's mtime when it was built).  A lookup that passes a
+    different version is a miss and drops the stale entry.  ``hits`` and
+    ``misses`` count lookups since creation or :meth:`reset_stats`.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (version, image, cost)
+        self._paths: dict[str, set] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, version=None):
+        """Return the cached image for ``key``, or None."""
+        entry = self._entries.get(key)
+        if entry is None or (version is not None and entry[0] != version):
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, image, version=None) -> None:
+        """Store ``image`` under ``key``, evicting older entries to stay within budget."""
+        if key in self._entries:
+            self._remove(key)
+        cost = image_cost(image)
+        if cost > self.max_bytes:
+            return
+        self._entries[key] = (version, image, cost)
+        self._paths.setdefault(key[0], set()).add(key)
+        self.total_bytes += cost
+        while self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, filepath: str) -> list:
+        """Drop every size cached for ``filepath`` (e.g. after the file was edited); return the keys dropped."""
+        keys = list(self._paths.get(filepath, ()))
+        for key in keys:
+            self._remove(key)
+        return keys
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._paths.clear()
+        self.total_bytes = 0
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key) -> None:
+        _version, _image, cost = self._entries.pop(key)
+        self.total_bytes -= cost
+        keys = self._paths.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._paths[key[0]]
@@ -0,0 +1,400 @@
+"""
+Background thumbnail generation for PhotoFlow.
+
+Views ask the ThumbnailService for thumbnails while painting.  Thumbnails
+that are already decoded come straight from the in-memory ThumbnailCache.
+Anything else is queued on a QThreadPool.  Every size is derived from
+the photo's master thumbnail in the ThumbnailStore.  When there is no
+current master, an embedded EXIF/RAW preview that is large enough is
+used.  Failing that, the original is decoded at reduced size:
+QImageReader scales JPEGs during DCT decoding, the same trick as PIL's
+draft mode.  The result is announced through ``thumbnail_ready``.
+
+The newest requests run first, so whatever is on screen now wins over
+cells that were painted earlier in a scroll.  Queued work for cells that
+scrolled out of view is cancelled.
+
+ThumbnailPrewarmer fills the store for new photos in the background.
+It runs only while no view is waiting for thumbnails.
+"""
+import os
+import time
+
+from core.embedded_preview import embedded_preview
+from core.thumbnail_store import MASTER_QUALITY, MASTER_SIZE
+
+try:
+    from PyQt6.QtCore import (
+        QBuffer, QByteArray, QIODevice, QObject, QRunnable, QThread, QThreadPool, QTimer, Qt, pyqtSignal,
+    )
+    from PyQt6.QtGui import QImage, QImageReader, QPixmap
+    _QT = True
+except ImportError:
+    _QT = False
+
+
+MISSING = '[Missing]'
+NO_PREVIEW = '[No Preview]'
+
+# Queued requests a view has not repainted within this long after scrolling
+# are treated as scrolled away and cancelled.
+_VIEWPORT_SETTLE_MS = 200
+
+
+def _fit(image, size: int):
+    if image.width() <= size and image.height() <= size:
+        return image
+    return image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+
+def _encode_jpeg(image) -> bytes:
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "JPG", MASTER_QUALITY)
+    return bytes(buffer.data())
+
+
+def file_version(filepath: str):
+    """The source's st_mtime_ns, or None; rows store the same value as ``file_mtime_ns``."""
+    try:
+        return os.stat(filepath).st_mtime_ns
+    except OSError:
+        return None
+
+
+def render_thumbnail(filepath: str, size: int, store):
+    """Load or build a thumbnail no larger than ``size``; safe to call from any thread.
+
+    ``store`` is a ThumbnailStore.  Returns ``(image, version, failure)``: a
+    QImage and the source's :func:`file_version` on success, otherwise
+    ``(None, version, MISSING | NO_PREVIEW)``.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None, None, MISSING
+    mtime = st.st_mtime
+    version = st.st_mtime_ns
+
+    data = store.get(filepath, mtime, st.st_size)
+    if data is not None:
+        master = QImage.fromData(QByteArray(data))
+        if not master.isNull():
+            return _fit(master, size), version, None
+
+    target = max(size, MASTER_SIZE)
+    image = _read_preview(filepath, size, target)
+    from_preview = image is not None
+    if not from_preview:
+        image = _read_scaled(QImageReader(filepath), target)
+    if image.isNull():
+        return None, version, NO_PREVIEW
+    # A preview smaller than the master size still serves this request,
+    # but is not stored as the master.
+    if size <= MASTER_SIZE and (not from_preview or max(image.width(), image.height()) >= MASTER_SIZE):
+        store.put(filepath, mtime, st.st_size, _encode_jpeg(image), image.width(), image.height())
+    return _fit(image, size), version, None
+
+
+def _read_scaled(reader, target: int):
+    source_size = reader.size()
+    if source_size.isValid() and (source_size.width() > target or source_size.height() > target):
+        # Lets the JPEG decoder skip most of the full-resolution work.
+        reader.setScaledSize(source_size.scaled(target, target, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+def _read_preview(filepath: str, size: int, target: int):
+    """Decode the embedded preview if one covers ``size``; None otherwise.
+
+    Prefers a preview big enough to become the master.
+    """
+    data = embedded_preview(filepath, target)
+    if data is None and size < target:
+        data = embedded_preview(filepath, size)
+    if data is None:
+        return None
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    image = _read_scaled(QImageReader(buffer), target)
+    if image.isNull():
+        return None
+    # Some cameras letterbox the EXIF thumbnail of a JPEG; skip previews
+    # whose shape does not match the image.
+    source_size = QImageReader(filepath).size() if filepath.lower().endswith(('.jpg', '.jpeg')) else None
+    if source_size is not None and source_size.isValid() and source_size.height() and image.height():
+        source_ratio = source_size.width() / source_size.height()
+        if abs(image.width() / image.height() - source_ratio) > 0.02 * source_ratio:
+            return None
+    return image
+
+
+if _QT:
+    class _Signals(QObject):
+        done = pyqtSignal(object, object, object, object)  # key, QImage | None, version, failure
+
+    class _ThumbnailTask(QRunnable):
+        def __init__(self, key, store, signals, owner=None, version=None):
+            super().__init__()
+            self.setAutoDelete(False)  # the service keeps it until done or cancelled
+            self.key = key
+            self.owner = owner
+            self.version = version  # what the requester knows; None: whatever was rendered
+            self._store = store
+            self._signals = signals
+
+        def run(self):
+            filepath, size = self.key
+            try:
+                image, version, failure = render_thumbnail(filepath, size, self._store)
+            except Exception as e:
+                print(f"[Thumbnails] Could not render {filepath}: {e}")
+                image, version, failure = None, file_version(filepath), NO_PREVIEW
+            if self.version is not None:
+                version = self.version
+            self._signals.done.emit(self.key, image, version, failure)
+
+    class ThumbnailService(QObject):
+        """Decode thumbnails on a thread pool and hand them to the GUI thread.
+
+        ``request(filepath, size, owner)`` returns a QPixmap when one is
+        cached, a placeholder string when the file has no preview, or None
+        while the thumbnail is being generated.  Views pass the row's
+        stored ``file_mtime_ns`` as ``version``; a cached pixmap or failure
+        kept under a different version is rebuilt, so a file the rescan
+        found modified is re-rendered without stat-ing anything while
+        painting.  Edits seen elsewhere go through :meth:`invalidate`.
+        ``thumbnail_ready(filepath, size)`` fires once it lands in the
+        cache.  Views pass an ``owner`` name and call :meth:`viewport_changed`
+        when they scroll, so their queued requests for cells that are no
+        longer painted get cancelled.
+        """
+
+        thumbnail_ready = pyqtSignal(str, int)
+
+        def __init__(self, cache, store, max_threads: int | None = None, parent=None):
+            super().__init__(parent)
+            self.cache = cache
+            self.store = store
+            self._pool = QThreadPool(self)
+            self._pool.setMaxThreadCount(max_threads or max(2, QThread.idealThreadCount() - 1))
+            self._signals = _Signals(self)
+            self._signals.done.connect(self._on_done)
+            self._pending: dict = {}   # key -> _ThumbnailTask (queued or running)
+            self._failed: dict = {}    # key -> (placeholder text, file version it failed at)
+            self._wanted: dict = {}    # owner -> keys requested since its last scroll
+            self._dirty_owners: set = set()
+            self._seq = 0
+            self.last_request = 0.0  # time.monotonic() of the latest request
+            self._settle_timer = QTimer(self)
+            self._settle_timer.setSingleShot(True)
+            self._settle_timer.setInterval(_VIEWPORT_SETTLE_MS)
+            self._settle_timer.timeout.connect(self._cancel_unwanted)
+
+        def request(self, filepath: str, size: int, owner=None, version=None):
+            """``version`` is the row's stored ``file_mtime_ns``; None accepts any cached entry.
+
+            Never touches the disk: this runs on every paint of every cell.
+            """
+            key = (filepath, size)
+            self.last_request = time.monotonic()
+            pixmap = self.cache.get(key, version)
+            if pixmap is not None:
+                return pixmap
+            failed = self._failed.get(key)
+            if failed is not None:
+                if version is None or failed[1] == version:
+                    return failed[0]
+                # The file appeared or changed since it failed; try again.
+                del self._failed[key]
+            if owner is not None:
+                self._wanted.setdefault(owner, set()).add(key)
+
+            # Newer requests get higher priority, so cells painted last
+            # (the ones on screen now) are decoded first.
+            self._seq += 1
+            task = self._pending.get(key)
+            if task is not None:
+                task.owner = owner
+                task.version = version
+                if self._pool.tryTake(task):
+                    self._pool.start(task, self._seq)
+                return None
+            task = _ThumbnailTask(key, self.store, self._signals, owner, version)
+            self._pending[key] = task
+            self._pool.start(task, self._seq)
+            return None
+
+        def pending_count(self) -> int:
+            return len(self._pending)
+
+        def viewport_changed(self, owner) -> None:
+            """Note that ``owner``'s view scrolled or was reset.
+
+            Once it has been repainted, its queued requests that were not
+            repeated are cancelled.
+            """
+            self._wanted[owner] = set()
+            self._dirty_owners.add(owner)
+            self._settle_timer.start()
+
+        def cancel(self, keys) -> int:
+            """Drop queued (not yet running) requests for ``keys``; return how many were dropped."""
+            dropped = 0
+            for key in list(keys):
+                task = self._pending.get(key)
+                if task is not None and self._pool.tryTake(task):
+                    del self._pending[key]
+                    dropped += 1
+            return dropped
+
+        def invalidate(self, filepath: str) -> None:
+            """Forget everything known about ``filepath`` (its pixels changed).
+
+            Views showing it are told through ``thumbnail_ready``, so they
+            repaint and request the new pixels.
+            """
+            dropped = set(self.cache.invalidate(filepath))
+            self.store.remove(filepath)
+            for key in [k for k in self._failed if k[0] == filepath]:
+                del self._failed[key]
+                dropped.add(key)
+            for _path, size in dropped:
+                self.thumbnail_ready.emit(filepath, size)
+
+        def clear(self) -> None:
+            self.cancel(list(self._pending))
+            self._failed.clear()
+            self.cache.clear()
+            self.store.clear()
+
+        def shutdown(self, timeout_ms: int = 2000) -> None:
+            self._settle_timer.stop()
+            self._pool.clear()
+            self._pool.waitForDone(timeout_ms)
+            self.store.flush()
+
+        def _cancel_unwanted(self):
+            owners, self._dirty_owners = self._dirty_owners, set()
+            for owner in owners:
+                wanted = self._wanted.get(owner, set())
+                self.cancel([key for key, task in self._pending.items()
+                             if task.owner == owner and key not in wanted])
+
+        def _on_done(self, key, image, version, failure):
+            self._pending.pop(key, None)
+            if image is not None:
+                self.cache.put(key, QPixmap.fromImage(image), version)
+            else:
+                self._failed[key] = (failure or NO_PREVIEW, version)
+            self.thumbnail_ready.emit(key[0], key[1])
+
+    class _PrewarmSignals(QObject):
+        done = pyqtSignal(int, bool)
+
+    class _PrewarmTask(QRunnable):
+        def __init__(self, photo_id, filepath, store, signals):
+            super().__init__()
+            self.photo_id = photo_id
+            self.filepath = filepath
+            self._store = store
+            self._signals = signals
+
+        def run(self):
+            QThread.currentThread().setPriority(QThread.Priority.LowestPriority)
+            built = False
+            try:
+                st = os.stat(self.filepath)
+                if not self._store.contains(self.filepath, st.st_mtime, st.st_size):
+                    built = render_thumbnail(self.filepath, MASTER_SIZE, self._store)[0] is not None
+            except OSError:
+                pass
+            except Exception as e:
+                print(f"[Thumbnails] Could not prewarm {self.filepath}: {e}")
+            self._signals.done.emit(self.photo_id, built)
+
+    class ThumbnailPrewarmer(QObject):
+        """Build missing master thumbnails in the background while the app is idle.
+
+        Every grid size is derived from the master, so one master per photo
+        warms all of them.  Photos are walked in id order from
+        ``checkpoint``.  ``fetch(after_id, limit)`` returns ``(id, filepath)``
+        pairs, and ``checkpoint_changed(last_id)`` fires after each batch so
+        the caller can persist progress and resume after a restart.
+
+        One file is built at a time, on a single lowest-priority thread.
+        Nothing runs while the service has queued requests, within
+        ``idle_ms`` of its last request, or while ``is_busy()`` is true.
+        """
+
+        checkpoint_changed = pyqtSignal(int)
+        finished = pyqtSignal(int)  # thumbnails built in this run
+
+        def __init__(self, service, fetch, is_busy=None, checkpoint: int = 0,
+                     interval_ms: int = 100, idle_ms: int = 1500, batch_size: int = 200, parent=None):
+            super().__init__(parent)
+            self.service = service
+            self._fetch = fetch
+            self._is_busy = is_busy
+            self.checkpoint = checkpoint
+            self.idle_ms = idle_ms
+            self.batch_size = batch_size
+            self.built = 0
+            self._queue: list = []
+            self._in_flight = False
+            self._pool = QThreadPool(self)
+            self._pool.setMaxThreadCount(1)
+            self._signals = _PrewarmSignals(self)
+            self._signals.done.connect(self._on_done)
+            self._timer = QTimer(self)
+            self._timer.setInterval(interval_ms)
+            self._timer.timeout.connect(self._tick)
+
+        def is_running(self) -> bool:
+            return self._timer.isActive()
+
+        def start(self) -> None:
+            """Start (or resume) warming photos after the checkpoint; a no-op while running."""
+            if not self._timer.isActive():
+                self.built = 0
+                self._timer.start()
+
+        def stop(self, timeout_ms: int = 2000) -> None:
+            self._timer.stop()
+            self._queue.clear()
+            self._pool.waitForDone(timeout_ms)
+            self.checkpoint_changed.emit(self.checkpoint)
+
+        def reset(self) -> None:
+            """Forget progress, e.g. after the store was cleared."""
+            self._queue.clear()
+            self.checkpoint = 0
+            self.checkpoint_changed.emit(0)
+
+        def _busy(self) -> bool:
+            if self.service.pending_count():
+                return True
+            if (time.monotonic() - self.service.last_request) * 1000 < self.idle_ms:
+                return True
+            return bool(self._is_busy and self._is_busy())
+
+        def _tick(self):
+            if self._in_flight or self._busy():
+                return
+            if not self._queue:
+                self._queue = list(self._fetch(self.checkpoint, self.batch_size))
+                if not self._queue:
+                    self._timer.stop()
+                    self.finished.emit(self.built)
+                    return
+            photo_id, filepath = self._queue.pop(0)
+            self._in_flight = True
+            self._pool.start(_PrewarmTask(photo_id, filepath, self.service.store, self._signals))
+
+        def _on_done(self, photo_id, built):
+            self._in_flight = False
+            self.built += int(built)
+            self.checkpoint = max(self.checkpoint, photo_id)
+            if not self._queue:
+                self.checkpoint_changed.emit(self.checkpoint)
@@ -0,0 +1,152 @@
+"""
+Packed on-disk thumbnail store for PhotoFlow.
+
+The old cache wrote one ``<md5>_<size>.jpg`` per photo and size, each
+decoded from the full original.  On a network share that meant tens of
+thousands of small files and slow directory lookups.  This store keeps a
+single master JPEG per photo as a blob in one SQLite file; the views
+derive every smaller size from it.
+
+Masters are keyed by file path and carry the source mtime and size, so a
+lookup for a file edited since is a miss.  The file is capped at
+``max_bytes`` of JPEG data: the least recently used masters are evicted
+first.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# Longest side of the stored master.  Large enough for the biggest grid
+# size (250) and the 300 px detail preview.
+MASTER_SIZE = 320
+MASTER_QUALITY = 90
+DEFAULT_STORE_BYTES = 512 * 1024 * 1024
+
+
+class ThumbnailStore:
+    """SQLite-backed store of master thumbnails; safe to share between threads."""
+
+    def __init__(self, db_path, max_bytes: int = DEFAULT_STORE_BYTES):
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS masters (
+                filepath TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                file_size INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                nbytes INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                data BLOB NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_masters_last_used ON masters(last_used)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(nbytes), 0) FROM masters').fetchone()[0]
+
+    def get(self, filepath: str, mtime: float, file_size: int) -> bytes | None:
+        """Return the master JPEG for ``filepath`` if it was built from this version of the file."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT mtime, file_size, data FROM masters WHERE filepath = ?', (filepath,)
+            ).fetchone()
+            if row is None or row[0] != mtime or row[1] != file_size:
+                return None
+            # Access times are written with the next put (or flush) rather
+            # than costing a write per lookup.
+            self._touched[filepath] = time.time()
+            return row[2]
+
+    def contains(self, filepath: str, mtime: float, file_size: int) -> bool:
+        """Whether a current master exists, without reading the blob."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM masters WHERE filepath = ? AND mtime = ? AND file_size = ?',
+                (filepath, mtime, file_size),
+            ).fetchone()
+        return row is not None
+
+    def put(self, filepath: str, mtime: float, file_size: int, data: bytes,
+            width: int = 0, height: int = 0) -> None:
+        """Store (or replace) the master for ``filepath`` and evict down to the cap."""
+        with self._lock:
+            old = self.conn.execute('SELECT nbytes FROM masters WHERE filepath = ?', (filepath,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO masters '
+                '(filepath, mtime, file_size, width, height, nbytes, last_used, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (filepath, mtime, file_size, width, height, len(data), time.time(), data),
+            )
+            self.total_bytes += len(data) - (old[0] if old else 0)
+            self._touched.pop(filepath, None)
+            self._write_touched()
+            self._evict()
+            self.conn.commit()
+
+    def remove(self, filepath: str) -> None:
+        with self._lock:
+            row = self.conn.execute('SELECT nbytes FROM masters WHERE filepath = ?', (filepath,)).fetchone()
+            if row:
+                self.conn.execute('DELETE FROM masters WHERE filepath = ?', (filepath,))
+                self.conn.commit()
+                self.total_bytes -= row[0]
+            self._touched.pop(filepath, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute('DELETE FROM masters')
+            self.conn.commit()
+            self.conn.execute('VACUUM')
+            self.total_bytes = 0
+            self._touched.clear()
+
+    def flush(self) -> None:
+        """Persist pending access times."""
+        with self._lock:
+            self._write_touched()
+            self.conn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self.conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self.conn.execute('SELECT COUNT(*) FROM masters').fetchone()[0]
+        return {'entries': count, 'bytes': self.total_bytes, 'max_bytes': self.max_bytes}
+
+    def __len__(self):
+        return self.stats()['entries']
+
+    # Callers hold self._lock.
+
+    def _write_touched(self):
+        if self._touched:
+            self.conn.executemany(
+                'UPDATE masters SET last_used = ? WHERE filepath = ?',
+                [(used, path) for path, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Drop down to 90% so a full store does not evict on every put.
+        target = self.max_bytes * 9 // 10
+        victims = []
+        for filepath, nbytes in self.conn.execute('SELECT filepath, nbytes FROM masters ORDER BY last_used'):
+            if self.total_bytes <= target:
+                break
+            victims.append((filepath,))
+            self.total_bytes -= nbytes
+        self.conn.executemany('DELETE FROM masters WHERE filepath = ?', victims)
@@ -20,12 +20,13 @@ from pathlib import Path
 import os
 import math
 import time
-import hashlib
 import shutil
 import json
 import base64
 import traceback
+import functools
 import threading
+from concurrent.futures import FIRST_COMPLETED, CancelledError, wait
 from datetime import datetime
 try:
     import numpy as np
@@ -62,8 +63,14 @@ from ui.learning_tab import AILearningTab
 from ui.vocabularies_tab import VocabulariesTab
 from ui.face_matching_tab import FaceMatchingTab
 
-from core.database import PhotoDatabase
+from core.database import MAX_JOB_ATTEMPTS, PhotoDatabase, PhotoFilter
 from core.ai_analyzer import analyze_image
+from core.analyzer_service import REANALYSIS, configured_concurrency, get_scheduler
+from core.ingest_pipeline import IngestPipeline
+from core.scanner import scan_files
+from core.thumbnail_cache import ThumbnailCache
+from core.thumbnail_service import ThumbnailPrewarmer, ThumbnailService, render_thumbnail
+from core.thumbnail_store import ThumbnailStore
 from core.image_retoucher import ImageRetoucher
 
 
@@ -3629,140 +3636,56 @@ class ImageLightboxDialog(QDialog):
 class AnalyzerThread(QThread):
     """Background thread for analyzing images"""
     progress = pyqtSignal(int, int, str)  # current, total, filename
-    photo_analyzed = pyqtSignal(dict)  # photo data
+    photo_analyzed = pyqtSignal(dict)  # photo data, once local metadata is stored
+    photo_updated = pyqtSignal(int)  # photo id, once AI fields are stored
+    file_changed = pyqtSignal(str)  # path of a known photo whose file was modified
     finished = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, folder_path, include_subfolders, db_path):
+    def __init__(self, folder_path, include_subfolders, db_path, ai_workers=None):
         super().__init__()
         self.folder_path = folder_path
         self.include_subfolders = include_subfolders
         self.db_path = db_path  # Store path instead of connection
+        self.ai_workers = ai_workers
         self._is_running = True
+        self._pipeline = None
 
     def run(self):
         """Analyze all images in the folder"""
         db = PhotoDatabase(self.db_path)
 
         try:
-            # Get all image files (including raw, HEIC, WEBP for modern cameras)
-            image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp',
-                                '.webp', '.tiff', '.tif', '.heic', '.heif',
-                                '.raw', '.cr2', '.nef', '.arw')
-
-            if self.include_subfolders:
-                files = []
-                for ext in image_extensions:
-                    files.extend(Path(self.folder_path).rglob(f'*{ext}'))
-                    files.extend(Path(self.folder_path).rglob(f'*{ext.upper()}'))
-            else:
-                files = []
-                for ext in image_extensions:
-                    files.extend(Path(self.folder_path).glob(f'*{ext}'))
-                    files.extend(Path(self.folder_path).glob(f'*{ext.upper()}'))
-
-            # Deduplicate (case-insensitive) to avoid double-counting on case-insensitive FS
-            seen: set = set()
-            deduped = []
-            for f in files:
-                key = str(f).lower()
-                if key not in seen:
-                    seen.add(key)
-                    deduped.append(f)
-            files = deduped
-
-            total = len(files)
-            
-            start_time = time.time()
-
-            for i, filepath in enumerate(files):
-                if not self._is_running:
-                    break
-                
-                filepath = str(filepath)
-                filename = Path(filepath).name
-                
-                # Calculate ETA
-                if i > 0:
-                    elapsed = time.time() - start_time
-                    avg_time = elapsed / i
-                    remaining = (total - i) * avg_time
-                    eta_mins = int(remaining / 60)
-                    eta_secs = int(remaining % 60)
-                    status = f"{filename} (ETA: {eta_mins}m {eta_secs}s)"
-                else:
-                    status = filename
-                
-                self.progress.emit(i + 1, total, status)
-                
-                try:
-                    # Check if already analyzed
-                    existing = db.get_photo_by_path(filepath)
-                    if existing and existing.get('scene_type'):
-                        continue  # Skip already analyzed
-
-                    # EXIF extraction
-                    try:
-                        from core.exif_extractor import extract_exif
-                        exif_meta = extract_exif(filepath)
-                    except Exception:
-                        exif_meta = {}
+            # One scandir walk; extensions match case-insensitively, so no
+            # per-extension globbing or case dedup is needed.
+            # Entries carry (size, mtime, inode), so the pipeline skips
+            # unchanged photos and re-processes modified ones.  Without a
+            # folder the run only resumes unfinished jobs.
+            files = []
+            if self.folder_path:
+                files = list(scan_files(os.path.realpath(self.folder_path),
+                                        recursive=self.include_subfolders, workers=4))
+
+            # Local metadata and AI analysis run as separate stages; see
+            # core/ingest_pipeline.py.  AI calls run concurrently, up to the
+            # configured number of parallel Ollama requests, through the
+            # shared scheduler at bulk priority, so requests from the UI
+            # are served first.
+            ai_workers = self.ai_workers or configured_concurrency(db)
+            self._pipeline = IngestPipeline(self.db_path, files,
+                                            analyzer=get_scheduler(self.db_path, ai_workers))
+            self._pipeline.on_local = lambda photo_id: self._emit_analyzed(db, photo_id)
+            self._pipeline.on_ai = self.photo_updated.emit
+            self._pipeline.on_changed = lambda photo_id, path: self.file_changed.emit(path)
+            self._pipeline.on_progress = self._on_pipeline_progress
+            self._pipeline.on_error = self.error.emit
+            self._start_time = time.time()
+            if self._is_running:
+                self._pipeline.run()
+            if self._pipeline.failed:
+                self.error.emit(f"{self._pipeline.failed} photo(s) could not be analyzed; "
+                                "they will be retried on the next run.")
 
-                    # Quality scoring
-                    try:
-                        from core.quality_scorer import score_image
-                        quality_meta = score_image(filepath)
-                    except Exception:
-                        quality_meta = {}
-
-                    # Perceptual hash (for duplicate detection)
-                    try:
-                        from core.duplicate_detector import perceptual_hash, md5_hash
-                        p_hash = perceptual_hash(filepath)
-                        f_hash = md5_hash(filepath)
-                    except Exception:
-                        p_hash = ''
-                        f_hash = ''
-
-                    # Analyze image with AI
-                    metadata = analyze_image(filepath, db)
-
-                    # Merge EXIF, quality, and hash data (non-destructive: AI fields take priority)
-                    for k, v in exif_meta.items():
-                        if k not in metadata:
-                            metadata[k] = v
-                    for k in ('blur_score', 'exposure_score', 'quality', 'quality_issues'):
-                        if k in quality_meta:
-                            metadata[k] = quality_meta[k]
-                    if 'blur_score' in quality_meta:
-                        metadata['quality_score'] = quality_meta['blur_score']
-                    if p_hash:
-                        metadata['perceptual_hash'] = p_hash
-                    if f_hash:
-                        metadata['file_hash'] = f_hash
-
-                    # Add or update in database
-                    if existing:
-                        # Protect user corrections
-                        corrected_fields = db.get_corrected_fields_for_photo(existing['id'])
-                        if corrected_fields:
-                            for field in corrected_fields:
-                                if field in metadata:
-                                    del metadata[field]
-
-                        if metadata:
-                            db.update_photo_metadata(existing['id'], metadata)
-                        photo_id = existing['id']
-                    else:
-                        photo_id = db.add_photo(filepath, metadata)
-
-                    # Get complete photo data and emit
-                    photo_data = db.get_photo(photo_id)
-                    self.photo_analyzed.emit(photo_data)
-
-                except Exception as e:
-                    self.error.emit(f"Error analyzing {filename}: {str(e)}")
-            
             self.finished.emit()
         
         except Exception as e:
@@ -3770,23 +3693,51 @@ class AnalyzerThread(QThread):
         finally:
             db.close()
 
+    def _emit_analyzed(self, db, photo_id):
+        # Pipeline callbacks run on this thread, after the batch is committed.
+        photo_data = db.get_photo(photo_id)
+        if photo_data:
+            self.photo_analyzed.emit(photo_data)
+
+    def _on_pipeline_progress(self, done, local_done, total, filename):
+        status = f"{filename} (metadata {local_done}/{total})"
+        # Skipped photos cost nothing, so the rate only counts this run's work.
+        processed = done - self._pipeline.skipped
+        if processed > 0:
+            elapsed = time.time() - self._start_time
+            remaining = (total - done) * elapsed / processed
+            status = f"{filename} (metadata {local_done}/{total}, ETA: {int(remaining / 60)}m {int(remaining % 60)}s)"
+        self.progress.emit(done, total, status)
+
     def stop(self):
         """Stop the analyzer thread"""
         self._is_running = False
+        if self._pipeline is not None:
+            self._pipeline.stop()
 
 
 class ReanalyzerThread(QThread):
-    """Background thread for re-analyzing selected photos"""
+    """Background thread for re-analyzing selected photos.
+
+    The photos are queued as 'reanalyze' jobs in ``analysis_jobs`` and
+    claimed one at a time, so a run that is stopped or crashes can be
+    resumed: a thread created with no photos finishes the queued ones.
+    Cached results in ``ai_results`` are reused unless ``force`` is set.
+    """
     progress = pyqtSignal(int, int, str)  # current, total, status
     finished = pyqtSignal()
     error = pyqtSignal(str)
     photo_analyzed = pyqtSignal(dict)  # photo data (for compatibility)
+
+    JOB_SOURCE = 'reanalyze'
     
-    def __init__(self, photos_to_analyze, db_path):
+    def __init__(self, photos_to_analyze, db_path, force=False):
         super().__init__()
         self.photos_to_analyze = photos_to_analyze
         self.db_path = db_path
+        self.force = force
         self._is_running = True
+        self._running = {}  # Future -> claimed job, cancelled by stop()
         # Add attributes for compatibility with shared handlers
         self.folder_path = None
         self.include_subfolders = False
@@ -3796,53 +3747,100 @@ class ReanalyzerThread(QThread):
         db = PhotoDatabase(self.db_path)
         
         try:
-            start_time = time.time()
-            total = len(self.photos_to_analyze)
-            
-            for i, photo in enumerate(self.photos_to_analyze):
-                if not self._is_running:
-                    break
-                
-                # Calculate ETA
-                filename = photo.get('filename') or 'Unknown'
-                filepath = photo.get('filepath')
-                
-                if not filepath:
-                    self.error.emit(f"Photo has no filepath: {photo.get('id')}")
-                    continue
-                
-                if i > 0:
-                    elapsed = time.time() - start_time
-                    avg_time = elapsed / i
-                    remaining = (total - i) * avg_time
-                    eta_mins = int(remaining / 60)
-                    eta_secs = int(remaining % 60)
-                    status = f"{filename} (ETA: {eta_mins}m {eta_secs}s)"
+            db.release_running_jobs(self.JOB_SOURCE)
+            jobs = []
+            for photo in self.photos_to_analyze or []:
+                if photo.get('filepath'):
+                    jobs.append((photo['filepath'], 'ai', photo['id']))
                 else:
-                    status = filename
-                
-                self.progress.emit(i + 1, total, status)
-                
-                try:
-                    # Re-analyze with AI
-                    metadata = analyze_image(filepath, db)
-                    
-                    # Get fields that user has manually corrected
-                    corrected_fields = db.get_corrected_fields_for_photo(photo['id'])
-                    
-                    # Preserve user corrections
-                    if corrected_fields:
-                        for field in corrected_fields:
-                            if field in metadata:
-                                del metadata[field]
-                    
-                    # Update database
-                    if metadata:
-                        db.update_photo_metadata(photo['id'], metadata)
-                
-                except Exception as e:
-                    self.error.emit(f"Error analyzing {filename}: {str(e)}")
-            
+                    self.error.emit(f"Photo has no filepath: {photo.get('id')}")
+            db.enqueue_jobs(self.JOB_SOURCE, jobs)
+
+            start_time = time.time()
+            total = db.count_unfinished_jobs(self.JOB_SOURCE)
+            done = failed = 0
+            # Several Ollama calls run at once through the shared scheduler,
+            # ahead of bulk imports; it limits how many jobs are claimed
+            # ahead of the results.
+            analyze = functools.partial(analyze_image, raise_errors=True, force=self.force)
+            service = get_scheduler(self.db_path, configured_concurrency(db))
+            running = self._running
+            try:
+                while self._is_running:
+                    room = service.available(REANALYSIS)
+                    deferred = False
+                    if room:
+                        jobs = db.claim_jobs(self.JOB_SOURCE, 'ai', room)
+                        for i, job in enumerate(jobs):
+                            future = service.try_submit_call(analyze, job[1], priority=REANALYSIS,
+                                                            measure=True)
+                            if future is None:
+                                # The limit dropped since ``available``.
+                                db.release_jobs([rest[0] for rest in jobs[i:]])
+                                deferred = True
+                                break
+                            running[future] = job
+                    if not running:
+                        if not deferred:
+                            break
+                        time.sleep(0.5)
+                        continue
+                    finished, _pending = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        if not self._is_running:
+                            break  # stopped: the job is released below, not written
+                        job_id, filepath, photo_id, attempts = running.pop(future)
+                        filename = os.path.basename(filepath)
+                        try:
+                            metadata = future.result()
+
+                            # Get fields that user has manually corrected
+                            corrected_fields = db.get_corrected_fields_for_photo(photo_id)
+
+                            # Preserve user corrections
+                            if corrected_fields:
+                                for field in corrected_fields:
+                                    if field in metadata:
+                                        del metadata[field]
+
+                            # Update database together with the job state
+                            if metadata:
+                                db.update_photo_metadata(photo_id, metadata, commit=False)
+                            db.finish_job(job_id)
+                            done += 1
+                        except CancelledError:
+                            db.release_jobs([job_id])
+                            continue
+                        except Exception as e:
+                            # Retried until MAX_JOB_ATTEMPTS; the error stays on the job.
+                            db.fail_job(job_id, e)
+                            if attempts >= MAX_JOB_ATTEMPTS:
+                                done += 1
+                                failed += 1
+
+                        # Calculate ETA
+                        if done > 0:
+                            elapsed = time.time() - start_time
+                            remaining = (total - done) * elapsed / done
+                            eta_mins = int(remaining / 60)
+                            eta_secs = int(remaining % 60)
+                            status = f"{filename} (ETA: {eta_mins}m {eta_secs}s)"
+                        else:
+                            status = filename
+                        self.progress.emit(min(done, total), total, status)
+            finally:
+                # Calls already running finish in the background; their results are dropped.
+                for future in running:
+                    future.cancel()
+                # Photos not finished stay queued for the next run.
+                db.release_jobs([job[0] for job in list(running.values())])
+                running.clear()
+
+            if self._is_running:
+                db.prune_jobs(self.JOB_SOURCE)
+            if failed:
+                self.error.emit(f"{failed} photo(s) could not be re-analyzed; "
+                                "see the failed jobs in analysis_jobs.")
             self.finished.emit()
         
         except Exception as e:
@@ -3851,8 +3849,13 @@ class ReanalyzerThread(QThread):
             db.close()
     
     def stop(self):
-        """Stop the reanalyzer thread"""
+        """Stop the reanalyzer thread and cancel the calls it has queued on the scheduler.
+
+        Their claimed jobs are released by ``run`` when it returns.
+        """
         self._is_running = False
+        for future in list(self._running):
+            future.cancel()
 
 
 class MainWindow(QMainWindow):
@@ -3869,6 +3872,19 @@ class MainWindow(QMainWindow):
         self.db = PhotoDatabase()
         self.cache_dir = Path("thumbnail_cache")
         self.cache_dir.mkdir(exist_ok=True)
+        self.thumbnail_cache = ThumbnailCache()
+        self.thumbnail_store = ThumbnailStore(self.cache_dir / "thumbnails.db")
+        self.thumbnail_service = ThumbnailService(self.thumbnail_cache, self.thumbnail_store, parent=self)
+        self.thumbnail_prewarmer = ThumbnailPrewarmer(
+            self.thumbnail_service, self.db.get_photo_paths, is_busy=self._is_importing,
+            checkpoint=int(self.settings.value("thumbnails/prewarm_after_id", 0) or 0), parent=self,
+        )
+        self.thumbnail_prewarmer.checkpoint_changed.connect(
+            lambda last_id: self.settings.setValue("thumbnails/prewarm_after_id", last_id)
+        )
+        # Catch up on photos added since the last run once startup has settled.
+        QTimer.singleShot(5000, self.thumbnail_prewarmer.start)
+        QTimer.singleShot(1500, self._offer_job_resume)
         self.retouch_audit_path = Path("data") / "retouch_audit.jsonl"
         self.retouch_audit_path.parent.mkdir(parents=True, exist_ok=True)
         self.batch_retouch_settings = {"algorithm": "telea", "radius": 3, "padding": 2}
@@ -4163,6 +4179,8 @@ class MainWindow(QMainWindow):
 
     def _append_retouch_audit(self, entry):
         """Append a JSONL audit record for retouch operations."""
+        # Every in-app overwrite of a photo (retouch, revert) is audited here.
+        self.invalidate_thumbnail(entry.get("output_path") or entry.get("target_path"))
         try:
             payload = dict(entry)
             payload["timestamp"] = datetime.utcnow().isoformat() + "Z"
@@ -5081,6 +5099,22 @@ class MainWindow(QMainWindow):
         cache_path_label = QLabel(f"Thumbnail Cache: {self.cache_dir}")
         cache_path_label.setStyleSheet("color: gray; font-size: 9px;")
         info_layout.addWidget(cache_path_label)
+
+        stats = self.thumbnail_cache.stats()
+        memory_label = QLabel(
+            f"In memory: {stats['entries']} thumbnails, {stats['bytes'] / 1048576:.1f} MB "
+            f"({stats['hits']} hits / {stats['misses']} misses)"
+        )
+        memory_label.setStyleSheet("color: gray; font-size: 9px;")
+        info_layout.addWidget(memory_label)
+
+        disk = self.thumbnail_store.stats()
+        disk_label = QLabel(
+            f"On disk: {disk['entries']} thumbnails, {disk['bytes'] / 1048576:.1f} "
+            f"of {disk['max_bytes'] / 1048576:.0f} MB"
+        )
+        disk_label.setStyleSheet("color: gray; font-size: 9px;")
+        info_layout.addWidget(disk_label)
         
         clear_cache_btn = QPushButton("Clear Thumbnail Cache")
         clear_cache_btn.setIcon(_icon('trash'))
@@ -5122,10 +5156,11 @@ class MainWindow(QMainWindow):
     def clear_thumbnail_cache(self):
         """Clear the thumbnail cache"""
         try:
-            import shutil
-            if self.cache_dir.exists():
-                shutil.rmtree(self.cache_dir)
-                self.cache_dir.mkdir(exist_ok=True)
+            self.thumbnail_service.clear()
+            self.thumbnail_prewarmer.reset()
+            # Loose <md5>_<size>.jpg files left by the old per-size cache.
+            for legacy in self.cache_dir.glob("*_*.jpg"):
+                legacy.unlink()
             QMessageBox.information(self, "Cache Cleared", "Thumbnail cache has been cleared.")
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to clear cache: {e}")
@@ -5325,31 +5360,11 @@ class MainWindow(QMainWindow):
         return self.gallery_tab
 
     def get_photo_id_from_row(self, row: int) -> int:
-        """Safely extract photo ID from table row using COL_ID constant"""
-        try:
-            id_item = self.photo_table.item(row, self.COL_ID)
-            if id_item:
-                return int(id_item.text())
-        except (ValueError, AttributeError):
-            pass
+        """Return the photo ID shown at a Library table view row."""
+        if hasattr(self, 'photos_tab') and self.photos_tab:
+            return self.photos_tab.get_photo_id_from_row(row)
         return None
 
-    def on_row_checkbox_toggled(self, state: int):
-        """Handle toggling of the persistent selection checkbox widgets."""
-        try:
-            sender = self.sender()
-            if not sender:
-                return
-            photo_id = sender.property('photo_id')
-            if photo_id is None:
-                return
-            if state == Qt.CheckState.Checked.value:
-                self.persistent_selected_ids.add(int(photo_id))
-            else:
-                self.persistent_selected_ids.discard(int(photo_id))
-        except Exception as e:
-            print(f"Checkbox toggle error: {e}")
-
     def get_checked_photo_ids(self) -> set:
         """Return a set of photo IDs that are checked in the checkbox column."""
         if hasattr(self, 'persistent_selected_ids'):
@@ -5360,13 +5375,9 @@ class MainWindow(QMainWindow):
 
     def get_selected_photo_ids(self) -> set:
         """Return a set of photo IDs based on current table selection (fallback)."""
-        rows = {it.row() for it in self.photo_table.selectedItems()} if self.photo_table.selectedItems() else set()
-        ids = set()
-        for r in rows:
-            pid = self.get_photo_id_from_row(r)
-            if pid is not None:
-                ids.add(pid)
-        return ids
+        if hasattr(self, 'photos_tab') and self.photos_tab:
+            return set(self.photos_tab.selected_photo_ids())
+        return set()
 
     def get_target_photo_ids(self) -> list:
         """Prefer checked IDs; otherwise use selected IDs. Returns a list for stable iteration."""
@@ -5375,76 +5386,6 @@ class MainWindow(QMainWindow):
             return list(checked)
         return list(self.get_selected_photo_ids())
 
-    def map_photo_ids_to_rows(self, photo_ids: set) -> dict:
-        """Build a mapping from photo_id to current table row index for the given IDs."""
-        id_to_row = {}
-        if not photo_ids:
-            return id_to_row
-        row_count = self.photo_table.rowCount()
-        for r in range(row_count):
-            pid = self.get_photo_id_from_row(r)
-            if pid in photo_ids:
-                id_to_row[pid] = r
-                if len(id_to_row) == len(photo_ids):
-                    break
-        return id_to_row
-
-    def debug_log_cell_click(self, row: int, col: int):
-        """Verbose logging for a clicked cell: row, column, header, constants, and content."""
-        try:
-            header_item = self.photo_table.horizontalHeaderItem(col)
-            header = header_item.text() if header_item else "<no header>"
-            pid = self.get_photo_id_from_row(row)
-
-            # Map constant name for the column
-            col_constants = {
-                self.COL_CHECKBOX: 'COL_CHECKBOX',
-                self.COL_ID: 'COL_ID',
-                self.COL_THUMBNAIL: 'COL_THUMBNAIL',
-                self.COL_SCENE: 'COL_SCENE',
-                self.COL_MOOD: 'COL_MOOD',
-                self.COL_SUBJECTS: 'COL_SUBJECTS',
-                self.COL_LOCATION: 'COL_LOCATION',
-                self.COL_OBJECTS: 'COL_OBJECTS',
-                self.COL_STATUS: 'COL_STATUS',
-                self.COL_IG: 'COL_IG',
-                self.COL_TIKTOK: 'COL_TIKTOK',
-                self.COL_PACKAGE: 'COL_PACKAGE',
-                self.COL_TAGS: 'COL_TAGS',
-                self.COL_DATE: 'COL_DATE',
-                self.COL_FILEPATH: 'COL_FILEPATH'
-            }
-            col_const_name = col_constants.get(col, '<no-const>')
-
-            # Determine item vs widget content
-            item = self.photo_table.item(row, col)
-            widget = self.photo_table.cellWidget(row, col)
-            item_text = item.text() if item else '<no item>'
-            widget_info = '<no widget>'
-            if widget:
-                # Try to pull checkbox state if present
-                cb = None
-                lay = widget.layout() if hasattr(widget, 'layout') else None
-                if lay and lay.count():
-                    maybe = lay.itemAt(0).widget()
-                    if isinstance(maybe, QCheckBox):
-                        cb = maybe
-                if cb:
-                    widget_info = f"QCheckBox(checked={cb.isChecked()}, photo_id={cb.property('photo_id')})"
-                else:
-                    widget_info = widget.__class__.__name__
-
-            # Field mapping if applicable
-            mapped_field = self.COLUMN_TO_FIELD.get(col, '<no field>')
-
-            print("[CellClick] row=", row, "col=", col, "header=", header,
-                  "const=", col_const_name, "photo_id=", pid,
-                  "item=", item_text, "widget=", widget_info, "field=", mapped_field)
-            if self.statusBar():
-                self.statusBar().showMessage(f"Clicked r{row} c{col} [{header}] -> {col_const_name}", 3000)
-        except Exception as e:
-            print(f"debug_log_cell_click error: {e}")
-
     # Notes pane on main UI removed; no row-click notes loader
 
     def eventFilter(self, obj, event):
@@ -5462,10 +5403,9 @@ class MainWindow(QMainWindow):
                 if event.button() == Qt.MouseButton.MiddleButton:
                     idx = self.photos_tab.photo_table.indexAt(event.pos())
                     if idx.isValid() and idx.column() == self.photos_tab.COL_THUMBNAIL:
-                        row = idx.row()
-                        fp_item = self.photos_tab.photo_table.item(row, self.photos_tab.COL_FILEPATH)
-                        if fp_item:
-                            path = fp_item.text()
+                        row_data = self.photos_tab.row_data(idx.row())
+                        if row_data:
+                            path = row_data.get('filepath') or ''
                             folder = os.path.dirname(path)
                             if folder and os.path.isdir(folder):
                                 os.startfile(folder)
@@ -5508,14 +5448,12 @@ class MainWindow(QMainWindow):
         if not target_ids:
             QMessageBox.information(self, "No Selection", "Please check photos to stage (or select cells)")
             return
-        id_to_row = self.map_photo_ids_to_rows(target_ids)
         root = self.folder_input.text().strip()
         if not root:
             QMessageBox.warning(self, "No Root Folder", "Please set the root folder at the top and try again.")
             return
         moved = 0
         for photo_id in target_ids:
-            row = id_to_row.get(photo_id)
             photo = self.db.get_photo(photo_id)
             if not photo or not photo.get('filepath'):
                 continue
@@ -5530,11 +5468,10 @@ class MainWindow(QMainWindow):
                     shutil.move(photo['filepath'], dest_path)
                 # Update DB and table
                 self.db.update_photo_metadata(photo_id, {'filepath': dest_path})
-                if row is not None:
-                    self.photo_table.item(row, self.COL_FILEPATH).setText(dest_path)
                 moved += 1
             except Exception as e:
                 print(f"Stage move error for {photo_id}: {e}")
+        self.photos_tab.refresh_rows(target_ids)
         self.statusBar().showMessage(f"Staged {moved} photo(s) to {platform}", 3000)
 
     def move_to_released(self, photo_id: int, platform: str):
@@ -5564,7 +5501,6 @@ class MainWindow(QMainWindow):
         if not target_ids:
             QMessageBox.information(self, "No Selection", "Please check photos to unstage (or select cells)")
             return
-        id_to_row = self.map_photo_ids_to_rows(target_ids)
         root = self.folder_input.text().strip()
         if not root:
             QMessageBox.warning(self, "No Root Folder", "Please set the root folder at the top and try again.")
@@ -5572,7 +5508,6 @@ class MainWindow(QMainWindow):
         moved = 0
         root_path = Path(root)
         for photo_id in target_ids:
-            row = id_to_row.get(photo_id)
             photo = self.db.get_photo(photo_id)
             if not photo or not photo.get('filepath'):
                 continue
@@ -5596,11 +5531,10 @@ class MainWindow(QMainWindow):
                 if src_path.resolve() != dest_path.resolve():
                     shutil.move(str(src_path), str(dest_path))
                 self.db.update_photo_metadata(photo_id, {'filepath': str(dest_path)})
-                if row is not None:
-                    self.photo_table.item(row, self.COL_FILEPATH).setText(str(dest_path))
                 moved += 1
             except Exception as e:
                 print(f"Unstage move error for {photo_id}: {e}")
+        self.photos_tab.refresh_rows(target_ids)
         self.statusBar().showMessage(f"Unstaged {moved} photo(s) to root", 3000)
 
     def unpackage_selected(self):
@@ -5609,14 +5543,12 @@ class MainWindow(QMainWindow):
         if not target_ids:
             QMessageBox.information(self, "No Selection", "Please check photos to unpackage (or select cells)")
             return
-        id_to_row = self.map_photo_ids_to_rows(target_ids)
         root = self.folder_input.text().strip()
         if not root:
             QMessageBox.warning(self, "No Root Folder", "Please set the root folder at the top and try again.")
             return
         moved = 0
         for photo_id in target_ids:
-            row = id_to_row.get(photo_id)
             photo = self.db.get_photo(photo_id)
             if not photo or not photo.get('filepath'):
                 continue
@@ -5630,12 +5562,10 @@ class MainWindow(QMainWindow):
                 # Clear packages and update DB + table
                 self.db.set_packages(photo_id, [])
                 self.db.update_photo_metadata(photo_id, {'filepath': dest_path})
-                if row is not None:
-                    self.photo_table.item(row, self.COL_PACKAGE).setText('')
-                    self.photo_table.item(row, self.COL_FILEPATH).setText(dest_path)
                 moved += 1
             except Exception as e:
                 print(f"Unpackage move error for {photo_id}: {e}")
+        self.photos_tab.refresh_rows(target_ids)
         self.statusBar().showMessage(f"Unpackaged {moved} photo(s) to root and cleared package", 3000)
 
     def on_table_cell_double_clicked(self, row: int, col: int):
@@ -5776,8 +5706,13 @@ class MainWindow(QMainWindow):
             # Optionally refresh UI immediately
             self.refresh_photos()
 
-    def _start_folder_watcher(self, folder: str):
-        """Start (or restart) the background folder watcher for the given folder."""
+    def _start_folder_watcher(self, folder: str, interval_secs=None, include_subfolders=None):
+        """Start (or restart) the background folder watcher for the given folder.
+
+        Every watcher imports on its own thread and reports through
+        ``_on_photos_imported``; the Settings tab starts it here too.
+        Returns the watcher, or None if it could not be started.
+        """
         try:
             # Stop any existing watcher
             fw = getattr(self, '_folder_watcher', None)
@@ -5786,45 +5721,52 @@ class MainWindow(QMainWindow):
                 fw.wait(1000)
 
             from core.folder_watcher import FolderWatcher
-            include_sub = self.subfolder_checkbox.isChecked() if hasattr(self, 'subfolder_checkbox') else True
+            include_sub = include_subfolders
+            if include_sub is None:
+                include_sub = self.subfolder_checkbox.isChecked() if hasattr(self, 'subfolder_checkbox') else True
             # Read watcher interval from Settings tab if available (default 30s)
-            interval = 30
-            try:
-                st = getattr(self, 'settings_tab', None)
-                if st and hasattr(st, 'watcher_interval_spin'):
-                    interval = st.watcher_interval_spin.value()
-            except Exception:
-                pass
+            interval = interval_secs or 30
+            if interval_secs is None:
+                try:
+                    st = getattr(self, 'settings_tab', None)
+                    if st and hasattr(st, 'watcher_interval_spin'):
+                        interval = st.watcher_interval_spin.value()
+                except Exception:
+                    pass
             self._folder_watcher = FolderWatcher(folder, self.db, interval_secs=interval,
-                                                  include_subfolders=include_sub)
-            self._folder_watcher.new_photo_found.connect(self._on_new_photo_found)
+                                                  include_subfolders=include_sub, import_photos=True)
+            self._folder_watcher.photos_imported.connect(self._on_photos_imported)
             self._folder_watcher.status_update.connect(
                 lambda msg: self.statusBar().showMessage(msg, 3000) if self.statusBar() else None
             )
             self._folder_watcher.start()
+            return self._folder_watcher
         except Exception as e:
             print(f"[FolderWatcher] Could not start: {e}")
+            return None
 
-    def _on_new_photo_found(self, filepath: str):
-        """Handle a new file detected by the folder watcher — add it to DB."""
-        try:
-            from core.exif_extractor import extract_exif
-            from core.duplicate_detector import perceptual_hash, md5_hash
-
-            meta = extract_exif(filepath)
-            meta['perceptual_hash'] = perceptual_hash(filepath)
-            meta['file_hash'] = md5_hash(filepath)
-            photo_id = self.db.add_photo(filepath, meta)
-            photo_data = self.db.get_photo(photo_id)
-            if photo_data:
-                self.add_photo_to_table(photo_data)
-                self.refresh_gallery()
-                if self.statusBar():
-                    self.statusBar().showMessage(
-                        f"New photo detected: {Path(filepath).name}", 4000
-                    )
-        except Exception as e:
-            print(f"[FolderWatcher] Error importing {filepath}: {e}")
+    def _on_photos_imported(self, photo_ids: list, group_ids: list):
+        """Refresh the views once for a batch the folder watcher has stored.
+
+        The watcher thread wrote the photos and linked their duplicates;
+        ``group_ids`` are the duplicate groups the batch joined.
+        """
+        if hasattr(self, 'photos_tab') and self.photos_tab:
+            self.photos_tab.refresh_rows(photo_ids)
+        self.refresh_gallery()
+        self.thumbnail_prewarmer.start()
+        dup_tab = getattr(self, 'duplicates_tab', None)
+        if group_ids and dup_tab is not None and dup_tab._loaded:
+            dup_tab.load_saved_groups()
+        if self.statusBar():
+            if len(photo_ids) == 1:
+                photo = self.db.get_photo(photo_ids[0])
+                message = f"New photo detected: {photo['filename']}" if photo else "New photo detected"
+            else:
+                message = f"{len(photo_ids)} new photos imported"
+            if group_ids:
+                message += f" ({len(group_ids)} duplicate group(s) updated)"
+            self.statusBar().showMessage(message, 4000)
     
     def save_last_folder(self, folder):
         """Save the last used folder to settings"""
@@ -5878,14 +5820,13 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "No Change", "The selected folder matches the current root; no relink needed.")
             return
 
-        # Optional: build filename index under new_root for fallback matching
+        # One walk of new_root: the set of existing paths replaces a stat per
+        # photo, and the filename index serves the fallback matching.
         fname_index = {}
-        try:
-            for root, _dirs, files in os.walk(new_root):
-                for f in files:
-                    fname_index.setdefault(f.lower(), os.path.join(root, f))
-        except Exception:
-            fname_index = {}
+        existing = set()
+        for entry in scan_files(new_root, extensions=None, workers=4):
+            existing.add(os.path.normcase(os.path.normpath(entry.path)))
+            fname_index.setdefault(os.path.basename(entry.path).lower(), entry.path)
 
         def try_relative(fp_str: str, old_root_str: str):
             # Case-insensitive prefix check for Windows
@@ -5909,13 +5850,13 @@ class MainWindow(QMainWindow):
             new_path = None
             if rel:
                 candidate = os.path.join(new_root, rel)
-                if os.path.exists(candidate):
+                if os.path.normcase(os.path.normpath(candidate)) in existing:
                     new_path = candidate
             # Fallback: match by filename anywhere under new_root
             if not new_path:
                 fname = os.path.basename(fp).lower()
                 match = fname_index.get(fname)
-                if match and os.path.exists(match):
+                if match:
                     new_path = match
                     by_name += 1
 
@@ -5948,6 +5889,10 @@ class MainWindow(QMainWindow):
         profile = self._import_profiles.get(profile_name, self._import_profiles["Default"])
         self._active_import_profile = profile
 
+        self._start_analyzer(folder, self.subfolder_checkbox.isChecked())
+
+    def _start_analyzer(self, folder, include_subfolders):
+        """Run an AnalyzerThread over ``folder``; with no folder it only resumes queued jobs."""
         self.analyze_btn.setEnabled(False)
         self.cancel_btn.setEnabled(True)
         self.progress_bar.setVisible(True)
@@ -5956,11 +5901,13 @@ class MainWindow(QMainWindow):
 
         self.analyzer_thread = AnalyzerThread(
             folder,
-            self.subfolder_checkbox.isChecked(),
+            include_subfolders,
             self.db.db_path
         )
         self.analyzer_thread.progress.connect(self.update_progress)
         self.analyzer_thread.photo_analyzed.connect(self.handle_photo_analyzed)
+        self.analyzer_thread.photo_updated.connect(self.refresh_photo_row)
+        self.analyzer_thread.file_changed.connect(self.invalidate_thumbnail)
         self.analyzer_thread.finished.connect(self.analysis_finished)
         self.analyzer_thread.error.connect(self.analysis_error)
         self.analyzer_thread.start()
@@ -5995,6 +5942,10 @@ class MainWindow(QMainWindow):
         self.progress_bar.setValue(current)
         self.status_label.setText(f"Analyzing {current}/{total}: {filename}")
     
+    def _is_importing(self):
+        """Whether an import/analysis run is using the CPU (thumbnail prewarming waits for it)."""
+        return bool(self.analyzer_thread and self.analyzer_thread.isRunning())
+
     def analysis_finished(self):
         """Called when analysis is complete"""
         self.analyze_btn.setEnabled(True)
@@ -6004,6 +5955,7 @@ class MainWindow(QMainWindow):
         QMessageBox.information(self, "Complete", "Image analysis finished!")
         self.refresh_photos()
         self.refresh_gallery()
+        self.thumbnail_prewarmer.start()
     
     def analysis_error(self, error_msg):
         """Called when an error occurs"""
@@ -6011,120 +5963,45 @@ class MainWindow(QMainWindow):
         self.status_label.setText(f"Error: {error_msg}")
     
     def add_photo_to_table(self, photo):
-        """Add a single photo to the table"""
-        is_batch_analyzing = bool(
-            getattr(self, 'analyzer_thread', None)
-            and self.analyzer_thread.isRunning()
-        )
-
-        photos_tab = getattr(self, 'photos_tab', None)
-        selected_ids = getattr(photos_tab, 'persistent_selected_ids', getattr(self, 'persistent_selected_ids', set()))
-        thumb_sizes = getattr(photos_tab, 'thumbnail_sizes', getattr(self, 'thumbnail_sizes', {'off': 0, 'small': 50, 'medium': 100, 'large': 150}))
-        current_thumb_size = getattr(photos_tab, 'current_thumb_size', getattr(self, 'current_thumb_size', 'medium'))
-
-        row = self.photo_table.rowCount()
-        self.photo_table.insertRow(row)
-        
-        # Block signals and sorting while populating
-        self.photo_table.blockSignals(True)
-        self.photo_table.setSortingEnabled(False)
-        
-        # Set row height based on thumbnail size
-        thumb_size = thumb_sizes.get(current_thumb_size, 100)
-        if thumb_size > 0:
-            self.photo_table.setRowHeight(row, thumb_size + 10)
-        
-        # Checkbox column (column 0) - use an actual QCheckBox widget for reliability
-        chk = QCheckBox()
-        chk.setTristate(False)
-        chk.setChecked(photo['id'] in selected_ids)
-        chk.setProperty('photo_id', int(photo['id']))
-        chk.stateChanged.connect(self.on_row_checkbox_toggled)
-        # Center the checkbox
-        chk_container = QWidget()
-        c_layout = QHBoxLayout(chk_container)
-        c_layout.setContentsMargins(0, 0, 0, 0)
-        c_layout.addWidget(chk, alignment=Qt.AlignmentFlag.AlignCenter)
-        self.photo_table.setCellWidget(row, self.COL_CHECKBOX, chk_container)
-        
-        # ID column - read only (now column 1)
-        id_item = QTableWidgetItem(f"{photo['id']:06d}")
-        id_item.setFlags(id_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-        self.photo_table.setItem(row, self.COL_ID, id_item)
-        
-        # Add thumbnail (now column 2). During active batch analysis, defer
-        # expensive thumbnail generation until the final refresh.
-        if is_batch_analyzing:
-            self.photo_table.setItem(row, self.COL_THUMBNAIL, QTableWidgetItem(""))
-        else:
-            self.add_thumbnail(row, self.COL_THUMBNAIL, photo['filepath'])
-        
-        self.photo_table.setItem(row, self.COL_SCENE, QTableWidgetItem(photo.get('scene_type') or ''))
-        self.photo_table.setItem(row, self.COL_MOOD, QTableWidgetItem(photo.get('mood') or ''))
-        self.photo_table.setItem(row, self.COL_SUBJECTS, QTableWidgetItem(photo.get('subjects') or ''))
-        location_item = QTableWidgetItem(photo.get('location') or '')
-        location_item.setToolTip(f"Location: {photo.get('location') or 'Not set'}")
-        self.photo_table.setItem(row, self.COL_LOCATION, location_item)
-        self.photo_table.setItem(row, self.COL_OBJECTS, QTableWidgetItem(photo.get('objects_detected') or ''))
-
-        # Status text
-        status_map = {'raw': 'Unreviewed', 'needs_edit': 'Editing', 'ready': 'Ready', 'released': 'Published'}
-        self.photo_table.setItem(row, self.COL_STATUS, QTableWidgetItem(status_map.get(photo.get('status', 'raw'), 'Unreviewed')))
-
-        # Checkboxes for release status
-        ig_item = QTableWidgetItem()
-        ig_item.setFlags(ig_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-        ig_item.setCheckState(Qt.CheckState.Checked if photo['released_instagram'] else Qt.CheckState.Unchecked)
-        self.photo_table.setItem(row, self.COL_IG, ig_item)
-
-        tiktok_item = QTableWidgetItem()
-        tiktok_item.setFlags(tiktok_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-        tiktok_item.setCheckState(Qt.CheckState.Checked if photo['released_tiktok'] else Qt.CheckState.Unchecked)
-        self.photo_table.setItem(row, self.COL_TIKTOK, tiktok_item)
-        
-        packages = [] if is_batch_analyzing else self.db.get_packages(photo['id'])
-        package_display = ', '.join(packages) if packages else (photo.get('package_name') or '')
-        self.photo_table.setItem(row, self.COL_PACKAGE, QTableWidgetItem(package_display))
-        
-        # Tags column (column 17)
-        self.photo_table.setItem(row, self.COL_TAGS, QTableWidgetItem(photo['tags'] or ''))
-        
-        # Date Created - read only (column 18) without fractional seconds
-        raw_date = str(photo['date_created'] or '')
-        if '.' in raw_date:
-            raw_date = raw_date.split('.')[0]
-        date_item = QTableWidgetItem(raw_date)
-        date_item.setFlags(date_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-        self.photo_table.setItem(row, self.COL_DATE, date_item)
-        
-        # Filepath (column 20)
-        filepath_item = QTableWidgetItem(photo['filepath'] or '')
-        filepath_item.setToolTip(photo['filepath'] or 'No path')
-        self.photo_table.setItem(row, self.COL_FILEPATH, filepath_item)
-        
-        self.photo_table.blockSignals(False)
-        self.photo_table.setSortingEnabled(True)
+        """Add (or update) a single photo row in the Library table."""
+        if hasattr(self, 'photos_tab') and self.photos_tab:
+            self.photos_tab.refresh_rows([photo['id']])
     
-    def get_cached_thumbnail(self, filepath, size):
-        """Get or create cached thumbnail"""
-        # Generate cache filename based on original file hash and size
-        file_hash = hashlib.md5(filepath.encode()).hexdigest()
-        cache_file = Path(self.cache_dir) / f"{file_hash}_{size}.jpg"
-        
-        # Return cached version if it exists and is newer than source
-        if cache_file.exists():
-            if cache_file.stat().st_mtime >= os.path.getmtime(filepath):
-                return QPixmap(str(cache_file))
-        
-        # Create thumbnail and cache it
-        if filepath and os.path.exists(filepath):
-            pixmap = QPixmap(filepath)
-            if not pixmap.isNull():
-                scaled_pixmap = pixmap.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                # Save to cache
-                scaled_pixmap.save(str(cache_file), "JPG", 85)
-                return scaled_pixmap
-        return None
+    def get_cached_thumbnail(self, filepath, size, version=None):
+        """Get or create cached thumbnail, decoding on the calling thread.
+
+        Decoded thumbnails are kept in ``self.thumbnail_cache``.  Pass the
+        row's stored ``file_mtime_ns`` as ``version`` to rebuild entries of
+        a file the rescan found modified; without it any cached entry is
+        used.  Scrolling views should use ``request_thumbnail`` instead,
+        which never blocks.
+        """
+        key = (filepath, size)
+        pixmap = self.thumbnail_cache.get(key, version)
+        if pixmap is not None:
+            return pixmap
+
+        image, source_version, _failure = render_thumbnail(filepath, size, self.thumbnail_store)
+        if image is None:
+            return None
+        pixmap = QPixmap.fromImage(image)
+        self.thumbnail_cache.put(key, pixmap, source_version if version is None else version)
+        return pixmap
+
+    def request_thumbnail(self, filepath, size, owner=None, version=None):
+        """Non-blocking thumbnail lookup for views.
+
+        ``version`` is the row's stored ``file_mtime_ns``.  Returns a
+        QPixmap, a placeholder string for missing/undecodable files, or
+        None while the thumbnail is generated in the background;
+        ``thumbnail_service.thumbnail_ready`` fires when it is available.
+        """
+        return self.thumbnail_service.request(filepath, size, owner, version)
+
+    def invalidate_thumbnail(self, filepath):
+        """Forget in-memory thumbnails of a file whose pixels changed."""
+        if filepath:
+            self.thumbnail_service.invalidate(str(filepath))
     
     def show_full_image(self, filepath, photo_id):
         """Show full image in a lightbox dialog with zoom and notes."""
@@ -6150,69 +6027,10 @@ class MainWindow(QMainWindow):
     def refresh_photo_row(self, photo_id: int):
         """Refresh a single photo row in the Library table by photo_id."""
         try:
-            photo = self.db.get_photo(photo_id)
-            if not photo:
-                return
-            # Find the row index by searching for this photo_id
-            for row in range(self.photo_table.rowCount()):
-                pid = self.get_photo_id_from_row(row)
-                if pid == photo_id:
-                    # Update Notes cell for this row
-                    self.photo_table.setItem(row, self.COL_NOTES, QTableWidgetItem(photo.get('notes') or ''))
-                    break
+            self.photos_tab.refresh_rows([photo_id])
         except Exception as e:
             print(f"refresh_photo_row error: {e}")
     
-    def add_thumbnail(self, row, col, filepath):
-        """Add thumbnail image to table cell"""
-        thumb_size = self.thumbnail_sizes[self.current_thumb_size]
-        
-        if thumb_size == 0:
-            # No thumbnail
-            self.photo_table.setItem(row, col, QTableWidgetItem(""))
-            return
-        
-        try:
-            if filepath and os.path.exists(filepath):
-                # Get cached thumbnail
-                pixmap = self.get_cached_thumbnail(filepath, thumb_size)
-                
-                if pixmap and not pixmap.isNull():
-                    label = QLabel()
-                    label.setPixmap(pixmap)
-                    label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                    label.setCursor(Qt.CursorShape.PointingHandCursor)
-                    label.setToolTip("Click to view full image (middle-click opens folder)")
-                    
-                    # Click handler: left = open image, middle = open folder only
-                    pid = self.get_photo_id_from_row(row)
-                    label.mousePressEvent = lambda event, fp=filepath, lbl=label, photo_id=pid: self.handle_thumbnail_mouse_press(lbl, event, fp, photo_id)
-                    
-                    self.photo_table.setCellWidget(row, col, label)
-                else:
-                    self.photo_table.setItem(row, col, QTableWidgetItem("[No Preview]"))
-            else:
-                self.photo_table.setItem(row, col, QTableWidgetItem("[Missing]"))
-        except Exception as e:
-            self.photo_table.setItem(row, col, QTableWidgetItem(f"[Error: {e}]"))
-
-    def handle_thumbnail_mouse_press(self, label, event, filepath, photo_id):
-        """Handle thumbnail click: left opens image, middle opens containing folder."""
-        try:
-            if event.button() == Qt.MouseButton.MiddleButton:
-                folder = os.path.dirname(filepath)
-                if folder and os.path.isdir(folder):
-                    os.startfile(folder)
-                event.accept()
-                return
-            if event.button() == Qt.MouseButton.LeftButton:
-                self.show_full_image(filepath, photo_id)
-                event.accept()
-                return
-        except Exception as e:
-            print(f"thumbnail click error: {e}")
-        event.ignore()
-    
     def toggle_thumbnail_size(self):
         """Delegate to PhotosTab."""
         if hasattr(self, 'photos_tab') and self.photos_tab:
@@ -6232,9 +6050,6 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'gallery_tab') and self.gallery_tab:
             self.gallery_tab.refresh_with_photos(list(photos))
     
-    def create_gallery_thumbnail(self, photo, size):
-        return self.gallery_tab._create_thumbnail(photo, size) if hasattr(self, 'gallery_tab') else None
-    
     def handle_gallery_thumbnail_click(self, event, filepath, photo_id):
         if hasattr(self, 'gallery_tab') and self.gallery_tab:
             self.gallery_tab._handle_thumbnail_click(event, filepath, photo_id)
@@ -6275,12 +6090,9 @@ class MainWindow(QMainWindow):
         if not target_ids:
             QMessageBox.information(self, "No Selection", "Please check photos to update (or select cells)")
             return
-        id_to_row = self.map_photo_ids_to_rows(set(target_ids))
         for pid in target_ids:
             self.db.set_packages(pid, packages)
-            row = id_to_row.get(pid)
-            if row is not None:
-                self.photo_table.item(row, self.COL_PACKAGE).setText(', '.join(packages))
+        self.photos_tab.refresh_rows(target_ids)
 
         self.batch_package.setText(', '.join(packages))
         self.statusBar().showMessage(f"Updated {len(target_ids)} photos with packages: {', '.join(packages)}", 3000)
@@ -6307,177 +6119,30 @@ class MainWindow(QMainWindow):
             pkgs = dlg.get_packages()
             if not pkgs:
                 # If cleared, clear packages for all
-                id_to_row = self.map_photo_ids_to_rows(set(target_ids))
                 for pid in target_ids:
                     self.db.set_packages(pid, [])
-                    row = id_to_row.get(pid)
-                    if row is not None:
-                        self.photo_table.item(row, self.COL_PACKAGE).setText('')
+                self.photos_tab.refresh_rows(target_ids)
                 self.statusBar().showMessage(f"Cleared packages for {len(target_ids)} photo(s)", 3000)
                 return
             # Apply to all selected
-            id_to_row = self.map_photo_ids_to_rows(set(target_ids))
             for pid in target_ids:
                 self.db.set_packages(pid, pkgs)
-                row = id_to_row.get(pid)
-                if row is not None:
-                    self.photo_table.item(row, self.COL_PACKAGE).setText(', '.join(pkgs))
+            self.photos_tab.refresh_rows(target_ids)
             self.batch_package.setText(', '.join(pkgs))
             self.statusBar().showMessage(f"Updated {len(target_ids)} photo(s) with packages", 3000)
     
     def apply_filters(self):
         """Apply filters to photo list. All filter state is read from FiltersTab."""
-        all_photos = self.db.get_all_photos()
-
-        # All filter widgets live on the FiltersTab instance.
+        # All filter widgets live on the FiltersTab instance; the database
+        # evaluates the resulting spec in a single query.
         _ft = getattr(self, 'filters_tab', None)
-
-        # ── Status ───────────────────────────────────────────────────
-        status_filters = []
-        if _ft and _ft.filter_raw.isChecked():
-            status_filters.append('raw')
-        if _ft and _ft.filter_needs_edit.isChecked():
-            status_filters.append('needs_edit')
-        if _ft and _ft.filter_ready.isChecked():
-            status_filters.append('ready')
-        if _ft and _ft.filter_released.isChecked():
-            status_filters.append('released')
-
-        show_only_unknowns = _ft.filter_unknowns.isChecked() if _ft else False
-
-        # ── Metadata ─────────────────────────────────────────────────
-        def _combo(_ft, attr):
-            w = getattr(_ft, attr, None)
-            v = w.currentText() if w else ''
-            return '' if v in ('', '(Any)') else v
-
-        def _text(_ft, attr):
-            w = getattr(_ft, attr, None)
-            return w.text().strip().lower() if w else ''
-
-        filter_scene = _combo(_ft, 'filter_scene')
-        filter_mood = _combo(_ft, 'filter_mood')
-        filter_subjects = _combo(_ft, 'filter_subjects')
-        filter_location = _text(_ft, 'filter_location')
-        filter_package = _text(_ft, 'filter_package')
-        filter_quality = _combo(_ft, 'filter_quality')
-        filter_tag = _text(_ft, 'filter_tag')
-        filter_content_rating = _combo(_ft, 'filter_content_rating')
-        filter_has_exif = _ft.filter_has_exif.isChecked() if _ft else False
-        filter_has_gps = _ft.filter_has_gps.isChecked() if _ft else False
-        filter_ig = _ft.filter_ig.isChecked() if _ft else False
-        filter_tiktok = _ft.filter_tiktok.isChecked() if _ft else False
-
-        # Filter photos
-        filtered_photos = []
-        for photo in all_photos:
-            # Unknown values filter
-            if show_only_unknowns:
-                ai_fields = ['scene_type', 'mood', 'subjects', 'location']
-                if not any(not photo.get(f) for f in ai_fields):
-                    continue
-
-            # Status filter
-            if status_filters and photo.get('status', 'raw') not in status_filters:
-                continue
-
-            # Platform filters
-            if filter_ig and not photo['released_instagram']:
-                continue
-            if filter_tiktok and not photo['released_tiktok']:
-                continue
-
-            # Metadata filters (case-insensitive partial match)
-            if filter_scene and filter_scene.lower() not in (photo.get('scene_type') or '').lower():
-                continue
-            if filter_mood and filter_mood.lower() not in (photo.get('mood') or '').lower():
-                continue
-            if filter_subjects and filter_subjects.lower() not in (photo.get('subjects') or '').lower():
-                continue
-            if filter_location and filter_location not in (photo.get('location') or '').lower():
-                continue
-            if filter_package:
-                pkgs = self.db.get_packages(photo['id'])
-                pkg_match = any(filter_package in p.lower() for p in pkgs)
-                legacy_match = filter_package in (photo.get('package_name') or '').lower()
-                if not (pkg_match or legacy_match):
-                    continue
-            if filter_quality and (photo.get('quality') or '') != filter_quality:
-                continue
-            if filter_has_exif and not photo.get('exif_camera'):
-                continue
-            if filter_has_gps and not (photo.get('exif_gps_lat') and photo.get('exif_gps_lon')):
-                continue
-            if filter_tag and filter_tag not in (photo.get('tags') or '').lower():
-                continue
-            if filter_content_rating and (photo.get('content_rating') or 'general') != filter_content_rating:
-                continue
-
-            filtered_photos.append(photo)
-        
-        # Populate table with filtered results
-        self.photo_table.setSortingEnabled(False)
-        self.photo_table.setRowCount(0)
-        self.photo_table.setRowCount(len(filtered_photos))
+        spec = _ft.build_filter() if _ft else PhotoFilter()
+        filtered_photos = self.db.get_filtered_photos(spec)
+        total_photos = self.db.count_photos()
         
-        for i, photo in enumerate(filtered_photos):
-            # Set row height based on thumbnail size
-            thumb_size = self.thumbnail_sizes[self.current_thumb_size]
-            if thumb_size > 0:
-                self.photo_table.setRowHeight(i, thumb_size + 10)
-            
-            # ID column - read only
-            id_item = QTableWidgetItem(f"{photo['id']:06d}")
-            id_item.setFlags(id_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.photo_table.setItem(i, 0, id_item)
-            
-            # Add thumbnail
-            self.add_thumbnail(i, 1, photo['filepath'])
-
-            # AI metadata columns (new general fields)
-            self.photo_table.setItem(i, self.COL_SCENE, QTableWidgetItem(photo.get('scene_type') or ''))
-            self.photo_table.setItem(i, self.COL_MOOD, QTableWidgetItem(photo.get('mood') or ''))
-            self.photo_table.setItem(i, self.COL_SUBJECTS, QTableWidgetItem(photo.get('subjects') or ''))
-            self.photo_table.setItem(i, self.COL_LOCATION, QTableWidgetItem(photo.get('location') or ''))
-            self.photo_table.setItem(i, self.COL_OBJECTS, QTableWidgetItem(photo.get('objects_detected') or ''))
-
-            # Status text
-            status_map = {'raw': 'Unreviewed', 'needs_edit': 'Editing', 'ready': 'Ready', 'released': 'Published'}
-            self.photo_table.setItem(i, self.COL_STATUS, QTableWidgetItem(status_map.get(photo.get('status', 'raw'), 'Unreviewed')))
-
-            # Checkboxes for release status
-            ig_item = QTableWidgetItem()
-            ig_item.setFlags(ig_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-            ig_item.setCheckState(Qt.CheckState.Checked if photo['released_instagram'] else Qt.CheckState.Unchecked)
-            self.photo_table.setItem(i, self.COL_IG, ig_item)
-
-            tiktok_item = QTableWidgetItem()
-            tiktok_item.setFlags(tiktok_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-            tiktok_item.setCheckState(Qt.CheckState.Checked if photo['released_tiktok'] else Qt.CheckState.Unchecked)
-            self.photo_table.setItem(i, self.COL_TIKTOK, tiktok_item)
-
-            packages = self.db.get_packages(photo['id'])
-            package_display = ', '.join(packages) if packages else (photo.get('package_name') or '')
-            self.photo_table.setItem(i, self.COL_PACKAGE, QTableWidgetItem(package_display))
-
-            self.photo_table.setItem(i, self.COL_TAGS, QTableWidgetItem(photo.get('tags') or ''))
-
-            # Date Created - read only, without fractional seconds
-            raw_date = str(photo['date_created'] or '')
-            if '.' in raw_date:
-                raw_date = raw_date.split('.')[0]
-            date_item = QTableWidgetItem(raw_date)
-            date_item.setFlags(date_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.photo_table.setItem(i, self.COL_DATE, date_item)
-
-            filepath_item = QTableWidgetItem(photo['filepath'] or '')
-            filepath_item.setToolTip(photo['filepath'] or 'No path')
-            self.photo_table.setItem(i, self.COL_FILEPATH, filepath_item)
-
-            self.photo_table.setItem(i, self.COL_NOTES, QTableWidgetItem(photo.get('notes') or ''))
-        
-        self.photo_table.setSortingEnabled(True)
-        self.statusBar().showMessage(f"Filtered: {len(filtered_photos)} of {len(all_photos)} photos", 5000)
+        # Populate table with filtered results (projected, not queried again)
+        self.photos_tab.show_rows(self.db.library_rows_from(filtered_photos))
+        self.statusBar().showMessage(f"Filtered: {len(filtered_photos)} of {total_photos} photos", 5000)
         
         # Also refresh gallery with filtered results
         self.refresh_gallery_with_photos(filtered_photos)
@@ -6491,118 +6156,12 @@ class MainWindow(QMainWindow):
         self.refresh_gallery()
         self.statusBar().showMessage("Filters cleared", 3000)
     
-    def on_table_item_changed(self, item):
-        """Delegate to PhotosTab."""
-        if hasattr(self, 'photos_tab') and self.photos_tab:
-            self.photos_tab.on_table_item_changed(item)
-    
-    def bulk_edit_cells(self):
-        """Bulk edit selected cells with the same value"""
-        selected_items = self.photo_table.selectedItems()
-        
-        if not selected_items:
-            QMessageBox.information(self, "No Selection", "Please select cells to edit")
-            return
-        
-        # Filter out non-editable columns (checkbox, ID, thumbnail, release toggles, date)
-        non_editable = [self.COL_CHECKBOX, self.COL_ID, self.COL_THUMBNAIL, self.COL_IG, self.COL_TIKTOK, self.COL_DATE]
-        editable_items = [item for item in selected_items if item.column() not in non_editable]
-        
-        if not editable_items:
-            QMessageBox.information(self, "No Editable Cells", "Please select editable metadata cells (not ID, Thumbnail, Date, or checkboxes)")
-            return
-        
-        # Get the column name for display
-        column_names = {
-            self.COL_SCENE: 'Scene',
-            self.COL_MOOD: 'Mood',
-            self.COL_SUBJECTS: 'Subjects',
-            self.COL_LOCATION: 'Location',
-            self.COL_OBJECTS: 'Objects',
-            self.COL_STATUS: 'Status',
-            self.COL_PACKAGE: 'Package',
-            self.COL_TAGS: 'Tags',
-            self.COL_FILEPATH: 'Filepath'
-        }
-        
-        # Check if all selected cells are in the same column
-        columns = set(item.column() for item in editable_items)
-        if len(columns) == 1:
-            col = list(columns)[0]
-            col_name = column_names.get(col, f"Column {col}")
-        else:
-            col_name = "multiple columns"
-        
-        # Prompt for new value
-        text, ok = QInputDialog.getText(self, "Bulk Edit", 
-                                        f"Enter new value for {len(editable_items)} cell(s) in {col_name}:")
-        
-        if ok:
-            # Column mapping to database fields
-            column_to_field = self.COLUMN_TO_FIELD
-            
-            # Block signals to prevent individual updates
-            self.photo_table.blockSignals(True)
-            
-            # AI fields that should track corrections
-            ai_fields = ['scene_type', 'mood', 'subjects', 'location', 'objects_detected']
-            
-            updates = []
-            tags_updated = False
-            for item in editable_items:
-                col = item.column()
-                row = item.row()
-                photo_id = self.get_photo_id_from_row(row)
-                if photo_id is None:
-                    continue
-
-                if col == self.COL_STATUS:  # Status - special handling
-                    status_map = {'Unreviewed': 'raw', 'Editing': 'needs_edit', 'Ready': 'ready', 'Published': 'released'}
-                    # Also accept old display names for backwards compat
-                    status_map.update({'Raw': 'raw', 'Needs Edit': 'needs_edit', 'Ready for Release': 'ready', 'Released': 'released'})
-                    db_value = status_map.get(text, text.lower().replace(' ', '_'))
-                    self.db.update_photo_metadata(photo_id, {'status': db_value})
-                    display_map = {'raw': 'Unreviewed', 'needs_edit': 'Editing', 'ready': 'Ready', 'released': 'Published'}
-                    item.setText(display_map.get(db_value, text))
-                elif col in column_to_field:
-                    field_name = column_to_field[col]
-                    if field_name == 'package_name':
-                        packages = [p.strip() for p in text.split(',') if p.strip()]
-                        self.db.set_packages(photo_id, packages)
-                        item.setText(', '.join(packages))
-                        continue
-                    
-                    # Track corrections for AI fields
-                    if field_name in ai_fields:
-                        photo = self.db.get_photo(photo_id)
-                        original_value = photo.get(field_name)
-                        if original_value and original_value != text:
-                            self.db.save_correction(photo_id, field_name, original_value, text)
-                    
-                    self.db.update_photo_metadata(photo_id, {field_name: text})
-                    item.setText(text)
-                    if field_name == 'tags':
-                        tags_updated = True
-                
-                updates.append(photo_id)
-            
-            # Re-enable signals
-            self.photo_table.blockSignals(False)
-            
-            # Refresh tag cloud if tags were updated
-            if tags_updated:
-                self.refresh_tag_cloud()
-            
-            self.statusBar().showMessage(f"Updated {len(editable_items)} cell(s) across {len(set(updates))} photo(s)", 3000)
-    
     def apply_status_to_selected(self):
         """Apply chosen status to checked/selected photos"""
         target_ids = set(self.get_target_photo_ids())
         if not target_ids:
             QMessageBox.information(self, "No Selection", "Please check photos to update (or select cells)")
             return
-        id_to_row = self.map_photo_ids_to_rows(target_ids)
-        
         status_text = self.status_dropdown.currentText()
         status_map = {'Unreviewed': 'raw', 'Editing': 'needs_edit', 'Ready': 'ready', 'Published': 'released'}
         status_value = status_map.get(status_text, 'raw')
@@ -6611,10 +6170,8 @@ class MainWindow(QMainWindow):
         updated = 0
         for pid in target_ids:
             self.db.update_photo_metadata(pid, {'status': status_value})
-            row = id_to_row.get(pid)
-            if row is not None:
-                self.photo_table.item(row, self.COL_STATUS).setText(status_text)
             updated += 1
+        self.photos_tab.refresh_rows(target_ids)
         
         self.statusBar().showMessage(f"Updated {updated} photos to {status_text}", 3000)
     
@@ -6624,29 +6181,15 @@ class MainWindow(QMainWindow):
         if not target_ids:
             QMessageBox.information(self, "No Selection", "Please check photos (or select cells)")
             return
-        id_to_row = self.map_photo_ids_to_rows(target_ids)
-        
-        column_map = {
-            'released_instagram': self.COL_IG,
-            'released_tiktok': self.COL_TIKTOK,
-        }
-        col = column_map[platform]
-        
-        # Toggle checkboxes
+        # Toggle release flags
         for pid in target_ids:
-            row = id_to_row.get(pid)
-            # Update DB release flag
-            item = self.photo_table.item(row, col) if row is not None else None
-            new_state = not (item.checkState() == Qt.CheckState.Checked) if item is not None else True
-            if item is not None:
-                item.setCheckState(Qt.CheckState.Checked if new_state else Qt.CheckState.Unchecked)
+            photo = self.db.get_photo(pid) or {}
+            new_state = not photo.get(platform)
             self.db.update_photo_metadata(pid, {platform: 1 if new_state else 0})
             # If marking as released, move to released folder structure
             if new_state:
-                dest_path = self.move_to_released(pid, platform)
-                if dest_path:
-                    if row is not None:
-                        self.photo_table.item(row, self.COL_FILEPATH).setText(dest_path)
+                self.move_to_released(pid, platform)
+        self.photos_tab.refresh_rows(target_ids)
         
         platform_name = platform.replace('released_', '').title()
         self.statusBar().showMessage(f"Toggled {platform_name} for {len(target_ids)} photos", 3000)
@@ -6721,38 +6264,6 @@ class MainWindow(QMainWindow):
         
         self.statusBar().showMessage("Re-analysis complete!", 3000)
     
-    def select_all_photos(self):
-        """Select all photos in the table"""
-        row_count = self.photo_table.rowCount()
-        # Check all row checkboxes and update persistent set
-        for row in range(row_count):
-            chk_container = self.photo_table.cellWidget(row, self.COL_CHECKBOX)
-            if chk_container and chk_container.layout() and chk_container.layout().count():
-                chk = chk_container.layout().itemAt(0).widget()
-                if isinstance(chk, QCheckBox):
-                    chk.blockSignals(True)
-                    chk.setChecked(True)
-                    chk.blockSignals(False)
-            pid = self.get_photo_id_from_row(row)
-            if pid is not None:
-                self.persistent_selected_ids.add(pid)
-        
-        self.statusBar().showMessage(f"Selected all {row_count} photos", 2000)
-    
-    def deselect_all_photos(self):
-        """Deselect all photos in the table"""
-        row_count = self.photo_table.rowCount()
-        for row in range(row_count):
-            chk_container = self.photo_table.cellWidget(row, self.COL_CHECKBOX)
-            if chk_container and chk_container.layout() and chk_container.layout().count():
-                chk = chk_container.layout().itemAt(0).widget()
-                if isinstance(chk, QCheckBox):
-                    chk.blockSignals(True)
-                    chk.setChecked(False)
-                    chk.blockSignals(False)
-        self.persistent_selected_ids.clear()
-        self.statusBar().showMessage("Cleared selection", 2000)
-    
     def cancel_analysis(self):
         """Cancel the ongoing analysis or re-analysis"""
         if self.analyzer_thread and self.analyzer_thread.isRunning():
@@ -6760,6 +6271,42 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage('Cancelling analysis...', 3000)
             self.cancel_btn.setEnabled(False)
             self.analyze_btn.setEnabled(True)
+        reanalyzer = getattr(self, 'reanalyzer_thread', None)
+        if reanalyzer is not None and reanalyzer.isRunning():
+            # Unfinished photos stay queued and can be resumed later.
+            reanalyzer.stop()
+            self.statusBar().showMessage('Cancelling re-analysis...', 3000)
+            self.cancel_btn.setEnabled(False)
+
+    def _offer_job_resume(self):
+        """Offer to resume analysis runs that were interrupted (app closed or crashed)."""
+        try:
+            imports = self.db.count_unfinished_jobs('import')
+            reanalysis = self.db.count_unfinished_jobs(ReanalyzerThread.JOB_SOURCE)
+        except Exception:
+            return
+        if not imports and not reanalysis:
+            return
+        if self.analyzer_thread and self.analyzer_thread.isRunning():
+            return
+        reply = QMessageBox.question(
+            self, "Resume Analysis",
+            f"{imports + reanalysis} photo(s) were not finished when PhotoFlow last closed.\n\n"
+            "Resume analyzing them now? Choose No to discard the unfinished work; "
+            "importing the folder again picks those photos up.",
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            # Otherwise the same question comes back on every launch.
+            try:
+                self.db.discard_unfinished_jobs('import')
+                self.db.discard_unfinished_jobs(ReanalyzerThread.JOB_SOURCE)
+            except Exception as e:
+                print(f"[Jobs] Could not discard unfinished jobs: {e}")
+            return
+        if imports:
+            self._start_analyzer(None, False)
+        if reanalysis and hasattr(self, 'photos_tab'):
+            self.photos_tab.resume_reanalysis()
     
     def refresh_tag_cloud(self):
         """Refresh the tag cloud display"""
@@ -6874,9 +6421,7 @@ class MainWindow(QMainWindow):
                     filtered_photos.append(photo)
         
         # Update table
-        self.photo_table.setRowCount(0)
-        for photo in filtered_photos:
-            self.add_photo_to_table(photo)
+        self.photos_tab.show_rows(self.db.get_library_rows(photo_ids=[p['id'] for p in filtered_photos]))
         
         # Update gallery
         self.refresh_gallery_with_photos(filtered_photos)
@@ -6924,6 +6469,9 @@ class MainWindow(QMainWindow):
                 fw.wait(1000)
         except Exception:
             pass
+        self.thumbnail_prewarmer.stop()
+        self.thumbnail_service.shutdown()
+        self.thumbnail_store.close()
         self.db.close()
         event.accept()
 
@@ -13,11 +13,17 @@ os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from PyQt6.QtWidgets import QApplication, QWidget
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication
 
 from ui.gallery_tab import GalleryTab
 from ui.albums_tab import AlbumsTab
 from ui.face_matching_tab import _AnalysisWorker
+from ui.photos_tab import PhotosTab, _LibraryModel, _LibraryProxy
+
+# Qt widgets, models and signals need an application object; create it at
+# import so pytest can run these tests without going through main().
+app = QApplication.instance() or QApplication([])
 
 
 class _DummyStatusBar:
@@ -52,16 +58,15 @@ class _DummyController:
         return None
 
 
-def test_gallery_pagination_sort_and_preserve_limit() -> None:
+def test_gallery_model_sort_group_and_lazy_thumbnails() -> None:
     ctrl = _DummyController()
+    thumb_calls = []
+    ctrl.get_cached_thumbnail = lambda fp, size, version=None: thumb_calls.append((fp, size))
     tab = GalleryTab(ctrl)
 
-    # Avoid heavy thumbnail creation in this logic test.
-    tab._create_thumbnail = lambda _photo, _size: QWidget()
-    tab._update_thumbnail_selection_styles = lambda: None
-
     photos = [
-        {"id": i, "filename": f"img_{300 - i:03d}.jpg", "status": "raw"}
+        {"id": i, "filename": f"img_{300 - i:03d}.jpg", "status": "raw",
+         "scene_type": "portrait" if i % 2 else "landscape"}
         for i in range(300)
     ]
 
@@ -70,17 +75,18 @@ def test_gallery_pagination_sort_and_preserve_limit() -> None:
 
     tab.refresh_with_photos(photos)
 
+    model = tab.gallery_model
     assert tab._display_photos[0]["filename"] == "img_001.jpg", "Expected sorted display list"
-    assert tab._rendered_count == tab.PAGE_SIZE, "Expected first page rendered"
-    assert len(tab._pending_photos) == 100, "Expected remaining photos queued"
+    assert model.rowCount() == 300, "Every photo should be a model row (no pagination)"
+    assert model.photo_at(model.index(0))["filename"] == "img_001.jpg", "Model order must follow sort"
+    assert thumb_calls == [], "Thumbnails must only be fetched when a cell is painted"
 
-    tab._load_next_page()
-    assert tab._rendered_count == 300, "Expected all photos rendered after Load More"
-    assert len(tab._pending_photos) == 0, "Expected no pending photos after second page"
-
-    # Preserve loaded slice on refresh/reflow.
-    tab.refresh_with_photos(photos, preserve_limit=True)
-    assert tab._rendered_count == 300, "Expected preserve_limit to keep loaded slice"
+    tab.gallery_group.setCurrentText("By Scene")
+    tab.refresh_with_photos(photos)
+    assert model.rowCount() == 302, "Grouping should add one header row per group"
+    assert model.data(model.index(0), model.HeaderRole) is not None, "First row should be a group header"
+    assert not (model.flags(model.index(0)) & Qt.ItemFlag.ItemIsSelectable), "Headers are not selectable"
+    assert len(model.photos()) == 300
 
 
 def test_smart_album_status_clause_parsing() -> None:
@@ -243,6 +249,26 @@ def test_date_albums_use_commit_false() -> None:
 
 # ── Round 10 tests ────────────────────────────────────────────────────────────
 
+def _make_db_file(folder: str) -> str:
+    """Create an empty, fully migrated photos.db in ``folder`` and return its path."""
+    from core.database import PhotoDatabase
+    db_path = os.path.join(folder, "photos.db")
+    PhotoDatabase(db_path).close()
+    PhotoDatabase(db_path).close()  # second open applies ensure_columns
+    return db_path
+
+
+def _make_images(folder: str, colors, size=(64, 48)) -> list:
+    """Save a solid-colour JPEG per colour as img_<i>.jpg in ``folder``; return their real paths."""
+    from PIL import Image
+    paths = []
+    for i, color in enumerate(colors):
+        fp = os.path.realpath(os.path.join(folder, f"img_{i}.jpg"))
+        Image.new("RGB", size, color).save(fp)
+        paths.append(fp)
+    return paths
+
+
 def _make_in_memory_db():
     """Return a PhotoDatabase instance backed by an in-memory SQLite database."""
     import sqlite3
@@ -284,7 +310,7 @@ def _make_in_memory_db():
             perceptual_hash TEXT DEFAULT '', file_size_kb INTEGER DEFAULT 0,
             image_width INTEGER DEFAULT 0, image_height INTEGER DEFAULT 0,
             color_profile TEXT DEFAULT '', content_rating TEXT DEFAULT 'general',
-            platform_status TEXT DEFAULT '{}',
+            platform_status TEXT DEFAULT '{}', file_mtime_ns INTEGER DEFAULT NULL,
             exif_camera TEXT DEFAULT '', exif_lens TEXT DEFAULT '',
             exif_focal_length TEXT DEFAULT '', exif_iso TEXT DEFAULT '',
             exif_aperture TEXT DEFAULT '', exif_shutter TEXT DEFAULT '',
@@ -292,7 +318,8 @@ def _make_in_memory_db():
             exif_date_taken TIMESTAMP DEFAULT NULL,
             blur_score REAL DEFAULT 0.0, exposure_score REAL DEFAULT 0.5,
             quality TEXT DEFAULT '', quality_issues TEXT DEFAULT '',
-            quality_score REAL DEFAULT 0.0, file_hash TEXT DEFAULT ''
+            quality_score REAL DEFAULT 0.0, file_hash TEXT DEFAULT '',
+            is_trashed INTEGER DEFAULT 0, date_trashed TIMESTAMP DEFAULT NULL
         );
         CREATE TABLE IF NOT EXISTS albums (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -477,11 +504,1460 @@ def test_batch_rename_db_sync() -> None:
         assert row[1] == "new_name.jpg", "DB filename should be updated after rename"
 
 
-def main() -> int:
-    app = QApplication.instance() or QApplication([])
+def test_filtered_photos_sql_matches_filter_semantics() -> None:
+    """get_filtered_photos should apply every FiltersTab predicate in SQL."""
+    from core.database import PhotoFilter
+
+    db = _make_in_memory_db()
+    rows = [
+        ("/tmp/a.jpg", "a.jpg", "raw", "Portrait", "calm", "people", "Beach", "", "good", "sunset,gold", "general", "Canon", 51.5, -0.1, 1),
+        ("/tmp/b.jpg", "b.jpg", "ready", "landscape", "", "", "", "", "poor", "", "", "", None, None, 0),
+        ("/tmp/c.jpg", "c.jpg", "raw", "portrait", "dark", "people", "city", "legacy_pkg", "good", "", "mature", "", 10.0, None, 0),
+    ]
+    for r in rows:
+        db.cursor.execute(
+            "INSERT INTO photos (filepath, filename, status, scene_type, mood, subjects, location,"
+            " package_name, quality, tags, content_rating, exif_camera, exif_gps_lat, exif_gps_lon,"
+            " released_instagram) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            r,
+        )
+    db.cursor.execute("INSERT INTO photos (filepath, filename, is_trashed) VALUES ('/tmp/t.jpg', 't.jpg', 1)")
+    db.cursor.execute("INSERT INTO photo_packages (photo_id, package_name) VALUES (1, 'Summer Set')")
+    db.cursor.execute("INSERT INTO photo_packages (photo_id, package_name) VALUES (1, 'Summer Extras')")
+    db.conn.commit()
+
+    def ids(**kwargs):
+        return sorted(p["id"] for p in db.get_filtered_photos(PhotoFilter(**kwargs)))
+
+    assert ids() == [1, 2, 3], "Empty filter should return all non-trashed photos"
+    assert ids(statuses=["raw"]) == [1, 3]
+    assert ids(scene_type="portrait") == [1, 3], "Scene match should be case-insensitive"
+    assert ids(unanalyzed_only=True) == [2]
+    assert ids(released_instagram=True) == [1]
+    assert ids(package="summer") == [1], "Package join must not duplicate rows"
+    assert ids(package="legacy") == [3], "Legacy package_name column should still match"
+    assert ids(tag="gold") == [1]
+    assert ids(content_rating="general") == [1, 2], "Empty content_rating counts as general"
+    assert ids(has_exif=True) == [1]
+    assert ids(has_gps=True) == [1], "GPS filter needs both coordinates"
+    assert ids(statuses=["raw"], quality="good", location="bea") == [1]
+    assert db.count_photos() == 3
+
+
+def test_library_model_rows_sort_and_edits() -> None:
+    """Library rows come from one projected query; sorting and search go through the proxy."""
+    from core.database import PhotoFilter
+
+    db = _make_in_memory_db()
+    for fp, scene, status in (("/x/b.jpg", "street", "raw"), ("/x/a.jpg", "beach", "ready"),
+                              ("/x/c.jpg", "Beach party", "raw")):
+        db.cursor.execute(
+            "INSERT INTO photos (filepath, filename, scene_type, status) VALUES (?, ?, ?, ?)",
+            (fp, os.path.basename(fp), scene, status),
+        )
+    db.conn.commit()
+    db.set_packages(1, ["pkg-a", "pkg-b"])
+
+    rows = db.get_library_rows()
+    assert len(rows) == 3
+    assert "pose" not in rows[0], "Rows should only carry projected columns"
+    by_id = {r["id"]: r for r in rows}
+    assert by_id[1]["packages"] == ["pkg-a", "pkg-b"], "Packages are joined without per-row queries"
+    assert [r["id"] for r in db.get_library_rows(photo_ids=[2])] == [2]
+    projected = db.library_rows_from(db.get_filtered_photos(PhotoFilter()))
+    assert projected == rows, "Rows from an existing filter result match the projected query"
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    assert [r["id"] for r in db.get_library_rows(PhotoFilter(statuses=["ready"]))] == [2]
+    db.conn.set_trace_callback(None)
+    package_reads = [q for q in statements if q.startswith("SELECT photo_id, package_name")]
+    assert len(package_reads) == 1 and "WHERE photo_id IN" in package_reads[0], \
+        "Only the packages of the filtered rows are read"
+
+    checked = set()
+    thumb_calls = []
+    edits = []
+    model = _LibraryModel(checked, lambda fp, size, version: thumb_calls.append(fp),
+                          lambda pid, field, value: edits.append((pid, field, value)))
+    proxy = _LibraryProxy()
+    proxy.setSourceModel(model)
+    model.set_rows(rows)
+
+    assert model.data(model.index(model.row_for_photo(1), PhotosTab.COL_PACKAGE)) == "pkg-a, pkg-b"
+    assert model.data(model.index(model.row_for_photo(2), PhotosTab.COL_STATUS)) == "Ready"
+    assert thumb_calls == [], "Thumbnails must only be fetched when a cell is painted"
+
+    proxy.sort(PhotosTab.COL_SCENE, Qt.SortOrder.AscendingOrder)
+    scenes = [proxy.index(r, PhotosTab.COL_SCENE).data() for r in range(proxy.rowCount())]
+    assert scenes == ["beach", "Beach party", "street"], "Proxy should sort case-insensitively"
+
+    proxy.set_query("beach")
+    assert proxy.rowCount() == 2, "Search should filter rows without a reload"
+    proxy.set_query("")
+
+    idx = model.index(model.row_for_photo(3), PhotosTab.COL_CHECKBOX)
+    model.setData(idx, Qt.CheckState.Checked.value, Qt.ItemDataRole.CheckStateRole)
+    assert checked == {3}, "Checkbox column should drive the persistent selection set"
+
+    model.setData(model.index(model.row_for_photo(3), PhotosTab.COL_STATUS), "Published")
+    model.setData(model.index(model.row_for_photo(3), PhotosTab.COL_PACKAGE), "x, y")
+    assert edits == [(3, "status", "released"), (3, "package_name", ["x", "y"])]
+    assert not (model.flags(model.index(0, PhotosTab.COL_FILEPATH)) & Qt.ItemFlag.ItemIsEditable)
+
+    db.cursor.execute("UPDATE photos SET scene_type = 'night' WHERE id = 2")
+    model.upsert_rows(db.get_library_rows(photo_ids=[2]))
+    assert model.rowCount() == 3
+    assert model.data(model.index(model.row_for_photo(2), PhotosTab.COL_SCENE)) == "night"
+
+    repainted = []
+    model.dataChanged.connect(lambda top, _bottom, *_roles: repainted.append(top.row()))
+    model.on_thumbnail_ready("/x/a.jpg", model.thumb_size)
+    assert repainted == [model.row_for_photo(2)], "Only the rows showing the file are repainted"
+
+
+def test_image_context_shared_by_local_extractors() -> None:
+    """One ImageContext read yields the same EXIF/hash results as per-file helpers."""
+    from PIL import Image
+    from core.image_context import ImageContext
+    from core.exif_extractor import extract_exif
+    from core.duplicate_detector import full_hash
+    from core.quality_scorer import score_image
+    from core.ingest_pipeline import local_metadata
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp = os.path.join(tmp, "big.jpg")
+        Image.new("RGB", (3000, 2000), (200, 120, 40)).save(fp, quality=90)
+
+        ctx = ImageContext.load(fp)
+        assert max(ctx.preview.size) <= 1024, "Preview is a reduced decode"
+        assert extract_exif(fp, ctx=ctx) == extract_exif(fp)
+        assert score_image(fp, ctx=ctx)["quality_issues"] == score_image(fp)["quality_issues"]
+
+        meta = local_metadata(fp)
+        assert meta["file_size_bytes"] == ctx.file_size == os.path.getsize(fp)
+        assert meta["hash_tier"] == "size" and "file_hash" not in meta and "partial_hash" not in meta, \
+            "Content hashes wait for a size collision"
+        assert (meta["image_width"], meta["image_height"]) == (3000, 2000)
+        assert local_metadata(os.path.join(tmp, "missing.jpg")) == {}
+
+        raw = os.path.join(tmp, "big.cr3")
+        with open(raw, "wb") as f:
+            f.write(b"\0" * (8 << 20))
+        ctx = ImageContext.load(raw)
+        assert ctx.image is None and ctx.preview is None and ctx.file_size == 8 << 20
+        assert ctx._data is None, "An undecodable file is probed, not read"
+        assert len(ctx.data) == 8 << 20 and full_hash(data=ctx.data) == full_hash(raw)
+
+
+def test_quality_score_is_pinned_at_the_analysis_scale() -> None:
+    """Blur is measured at the preview scale, so file and ImageContext scoring agree and stay calibrated."""
+    import random
+    from PIL import Image, ImageDraw, ImageFilter
+    from core import quality_scorer
+    from core.image_context import ImageContext
+
+    rng = random.Random(5)
+    img = Image.new("L", (4000, 3000), 128)
+    draw = ImageDraw.Draw(img)
+    for _ in range(400):
+        x, y = rng.randrange(4000), rng.randrange(3000)
+        draw.rectangle((x, y, x + rng.randrange(40, 600), y + rng.randrange(40, 600)),
+                       fill=rng.randrange(30, 226))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sharp, soft = os.path.join(tmp, "sharp.png"), os.path.join(tmp, "soft.png")
+        img.save(sharp)
+        img.filter(ImageFilter.GaussianBlur(16)).save(soft)  # ~4 px once scaled to the preview
+
+        score = quality_scorer.score_image(sharp)
+        assert score == quality_scorer.score_image(sharp, ctx=ImageContext.load(sharp)), \
+            "The full-resolution file scores like its preview"
+        assert score["quality"] == "excellent" and score["quality_issues"] == []
+        assert abs(score["exposure_score"] - 0.518) < 0.001
+        if quality_scorer._CV2:
+            assert abs(score["blur_score"] - 277.74) < 0.5, score["blur_score"]
+
+        assert quality_scorer.score_image(soft)["quality_issues"] == ["blurry"]
+
+
+def test_phash_index_matches_brute_force() -> None:
+    """Multi-index hash queries and find_duplicates agree with pairwise Hamming distance."""
+    import random
+    from core.duplicate_detector import PHashIndex, find_duplicates, hash_distance
+
+    rng = random.Random(7)
+    base = [rng.getrandbits(64) for _ in range(40)]
+    hashes = base + [b ^ (1 << rng.randrange(64)) for b in base[:10]]
+    hexes = [f"{h:016x}" for h in hashes]
+    index = PHashIndex(enumerate(hexes))
+    assert len(index) == len(hexes)
+
+    for i, h in enumerate(hexes):
+        expected = {j for j, other in enumerate(hexes) if hash_distance(h, other) <= 12}
+        assert {pid for _d, pid in index.query(h, 12)} == expected
+    assert not index.add(99, "not-hex")
+
+    photos = [{"id": i, "perceptual_hash": h, "file_hash": ""} for i, h in enumerate(hexes)]
+    photos.append({"id": 100, "perceptual_hash": "", "file_hash": "abc"})
+    photos.append({"id": 101, "perceptual_hash": "", "file_hash": "abc"})
+    groups = find_duplicates(photos, threshold=2)
+    as_sets = sorted(sorted(p["id"] for p in g) for g in groups)
+    assert [100, 101] in as_sets
+    for i in range(10):
+        assert [i, 40 + i] in as_sets
+
+
+def test_find_duplicates_union_find_is_order_independent() -> None:
+    """NumPy and index engines agree, chains merge transitively and input order does not matter."""
+    import random
+    import core.duplicate_detector as dd
+
+    rng = random.Random(11)
+    base = rng.getrandbits(64)
+    chain = [base, base ^ 0b111, base ^ 0b111111]  # 0-1 and 1-2 within 3 bits, 0-2 is 6 apart
+    others = [rng.getrandbits(64) for _ in range(30)]
+    photos = [
+        {"id": i, "perceptual_hash": f"{h:016x}", "file_hash": ""}
+        for i, h in enumerate(chain + others)
+    ]
+
+    def _ids(groups):
+        return sorted(sorted(p["id"] for p in g) for g in groups)
+
+    with_numpy = dd.find_duplicates(photos, threshold=3)
+    assert [0, 1, 2] in _ids(with_numpy)
+
+    shuffled = photos[:]
+    rng.shuffle(shuffled)
+    assert _ids(dd.find_duplicates(shuffled, threshold=3)) == _ids(with_numpy)
+
+    budget = dd.PAIRWISE_BLOCK_BYTES
+    dd.PAIRWISE_BLOCK_BYTES = 1  # one-row slabs
+    try:
+        assert _ids(dd.find_duplicates(photos, threshold=3)) == _ids(with_numpy)
+    finally:
+        dd.PAIRWISE_BLOCK_BYTES = budget
+
+    limit = dd.NUMPY_PAIRWISE_LIMIT
+    dd.NUMPY_PAIRWISE_LIMIT = 0
+    try:
+        assert _ids(dd.find_duplicates(photos, threshold=3)) == _ids(with_numpy)
+    finally:
+        dd.NUMPY_PAIRWISE_LIMIT = limit
+
+
+def test_duplicate_tracker_persists_groups() -> None:
+    """Tracking photos at import links exact and near duplicates into stored groups."""
+    from core.database import PhotoDatabase
+    from core.duplicate_detector import DuplicateTracker
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = _make_db_file(tmp)
+        db = PhotoDatabase(db_path)
+        try:
+            tracker = DuplicateTracker(db, threshold=4)
+            near = "ffff0000ffff0000"
+            photos = [
+                ("a.jpg", {"file_hash": "h1", "perceptual_hash": "0123456789abcdef"}),
+                ("b.jpg", {"file_hash": "h1", "perceptual_hash": "0123456789abcdef"}),
+                ("c.jpg", {"file_hash": "h2", "perceptual_hash": near}),
+                ("d.jpg", {"file_hash": "h3", "perceptual_hash": "ffff0000ffff0003"}),
+                ("e.jpg", {"file_hash": "h4", "perceptual_hash": "0f0f0f0f0f0f0f0f"}),
+            ]
+            ids = {}
+            for name, meta in photos:
+                ids[name] = db.add_photo(os.path.join(tmp, name), meta)
+                tracker.track(ids[name], meta)
+
+            groups = sorted(sorted(p["filename"] for p in g) for g in db.get_duplicate_groups())
+            assert groups == [["a.jpg", "b.jpg"], ["c.jpg", "d.jpg"]]
+
+            # Linking across groups merges them under the lowest id.
+            assert db.link_duplicates([ids["b.jpg"], ids["d.jpg"]]) == ids["a.jpg"]
+            assert len(db.get_duplicate_groups()) == 1
+
+            db.delete_photo(ids["a.jpg"])
+            db.remove_from_duplicate_groups([ids["b.jpg"]])
+            remaining = db.get_duplicate_groups()
+            assert [sorted(p["filename"] for p in g) for g in remaining] == [["c.jpg", "d.jpg"]]
+        finally:
+            db.close()
+
+
+def test_tiered_exact_hashing_escalates_only_on_collision() -> None:
+    """Size collisions get partial hashes; only matching partials are hashed in full."""
+    from core.database import PhotoDatabase
+    import core.duplicate_detector as dd
+
+    window = dd.PARTIAL_HASH_BYTES
+    dd.PARTIAL_HASH_BYTES = 1024
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            body = bytes(range(256)) * 40  # 10 KB: larger than both windows
+            files = {
+                "orig.raw": body,
+                "copy.raw": body,
+                "middle.raw": body[:5000] + b"X" + body[5001:],  # same head/tail, different middle
+                "tail.raw": body[:-1] + b"X",
+                "unique.raw": body + b"extra",
+            }
+            db_path = _make_db_file(tmp)
+            db = PhotoDatabase(db_path)
+            try:
+                tracker = dd.DuplicateTracker(db)
+                ids = {}
+                for name, data in files.items():
+                    fp = os.path.join(tmp, name)
+                    with open(fp, "wb") as f:
+                        f.write(data)
+                    meta = {"file_size_bytes": len(data), "hash_tier": dd.HASH_TIER_SIZE}
+                    ids[name] = db.add_photo(fp, meta)
+                    tracker.track(ids[name], meta, fp)
+
+                tiers = {name: db.get_photo(pid)["hash_tier"] for name, pid in ids.items()}
+                assert tiers["unique.raw"] == dd.HASH_TIER_SIZE, "No collision, no reads"
+                assert tiers["tail.raw"] == dd.HASH_TIER_PARTIAL
+                assert tiers["orig.raw"] == tiers["copy.raw"] == tiers["middle.raw"] == dd.HASH_TIER_FULL
+
+                groups = [sorted(p["filename"] for p in g) for g in db.get_duplicate_groups()]
+                assert groups == [["copy.raw", "orig.raw"]]
+            finally:
+                db.close()
+    finally:
+        dd.PARTIAL_HASH_BYTES = window
+
+
+def test_legacy_md5_hashes_are_compared_like_with_like() -> None:
+    """Pre-tiering MD5 file hashes are tagged, never matched against BLAKE2b, and rehashed on collision."""
+    import hashlib
+    from core.database import PhotoDatabase
+    import core.duplicate_detector as dd
+
+    with tempfile.TemporaryDirectory() as tmp:
+        body = bytes(range(256)) * 40
+        paths = {}
+        for name in ("old1.jpg", "old2.jpg", "new.jpg"):
+            paths[name] = os.path.join(tmp, name)
+            with open(paths[name], "wb") as f:
+                f.write(body)
+        db_path = _make_db_file(tmp)
+        db = PhotoDatabase(db_path)
+        legacy = {"file_hash": hashlib.md5(body).hexdigest(), "file_size_bytes": len(body)}
+        ids = {name: db.add_photo(paths[name], dict(legacy)) for name in ("old1.jpg", "old2.jpg")}
+        db.cursor.execute("ALTER TABLE photos DROP COLUMN hash_tier")  # as before tiering
+        db.conn.commit()
+        db.close()
+
+        db = PhotoDatabase(db_path)
+        try:
+            assert db.get_photo(ids["old1.jpg"])["hash_tier"] == dd.HASH_TIER_LEGACY, "Migration tags MD5 rows"
+            db.update_photo_metadata(ids["old2.jpg"], {"hash_tier": ""})
+            PhotoDatabase(db_path).close()
+            assert db.get_photo(ids["old2.jpg"])["hash_tier"] == "", "The migration runs only once"
+            db.update_photo_metadata(ids["old2.jpg"], {"hash_tier": dd.HASH_TIER_LEGACY})
+            meta = {"file_size_bytes": len(body), "file_hash": dd.full_hash(paths["new.jpg"]),
+                    "hash_tier": dd.HASH_TIER_FULL}
+            ids["new.jpg"] = db.add_photo(paths["new.jpg"], dict(meta))
+
+            def exact_groups():
+                photos = [dict(db.get_photo(pid), perceptual_hash="") for pid in ids.values()]
+                return sorted(sorted(p["filename"] for p in g) for g in dd.find_duplicates(photos))
+
+            assert exact_groups() == [["old1.jpg", "old2.jpg"]], "MD5 only matches MD5"
+
+            dd.DuplicateTracker(db).track(ids["new.jpg"], meta, paths["new.jpg"])
+            assert db.get_photo(ids["old1.jpg"])["hash_tier"] == dd.HASH_TIER_FULL, "Colliding peer is rehashed"
+            assert exact_groups() == [["new.jpg", "old1.jpg", "old2.jpg"]]
+        finally:
+            db.close()
+
+
+def test_thumbnail_memory_cache_budget_and_invalidation() -> None:
+    """The thumbnail LRU evicts by bytes, honours source mtimes and counts hits/misses."""
+    from PyQt6.QtGui import QPixmap
+    from core.thumbnail_cache import ThumbnailCache
+
+    pix = QPixmap(100, 100)  # 100*100*depth/8 bytes each
+    cost = 100 * 100 * pix.depth() // 8
+    cache = ThumbnailCache(max_bytes=cost * 3)
+
+    for name in ("a", "b", "c"):
+        cache.put((name, 150), pix, version=1.0)
+    assert cache.get(("a", 150)) is pix, "Hit without a version check"
+    cache.put(("d", 150), pix, version=1.0)  # evicts least recently used: b
+    assert ("b", 150) not in cache and ("a", 150) in cache
+    assert cache.total_bytes == cost * 3
+
+    assert cache.get(("c", 150), version=2.0) is None, "Stale mtime is a miss"
+    assert ("c", 150) not in cache
+
+    cache.put(("a", 300), pix)
+    cache.invalidate("a")
+    assert ("a", 150) not in cache and ("a", 300) not in cache
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_thumbnail_service_builds_in_background_and_cancels() -> None:
+    """Thumbnails are decoded off the GUI thread, announced by signal and cancellable."""
+    import time
+    from PIL import Image
+    from PyQt6.QtGui import QPixmap
+    from core.thumbnail_cache import ThumbnailCache
+    from core.thumbnail_service import MISSING, ThumbnailService, render_thumbnail
+    from core.thumbnail_store import ThumbnailStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp = os.path.join(tmp, "big.jpg")
+        Image.new("RGB", (1600, 1200), (200, 120, 40)).save(fp)
+        store = ThumbnailStore(os.path.join(tmp, "thumbnails.db"))
+
+        image, _mtime, failure = render_thumbnail(fp, 150, store)
+        assert failure is None and max(image.width(), image.height()) == 150, "Reduced decode fits the size"
+        assert render_thumbnail(os.path.join(tmp, "gone.jpg"), 150, store)[2] == MISSING
+
+        service = ThumbnailService(ThumbnailCache(), store, max_threads=1)
+        ready = []
+        service.thumbnail_ready.connect(lambda path, size: ready.append((path, size)))
+        stored = os.stat(fp).st_mtime_ns  # the row's file_mtime_ns
+        assert service.request(fp, 190, owner="grid", version=stored) is None, "First request is pending"
+        deadline = time.monotonic() + 10
+        while not ready and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        assert ready == [(fp, 190)]
+        assert isinstance(service.request(fp, 190, version=stored), QPixmap), "Ready thumbnail comes from the memory cache"
+
+        # Lookups never stat: an edit the rescan has not recorded yet keeps the cached pixmap.
+        os.utime(fp, ns=(stored, stored + 5_000_000_000))
+        assert isinstance(service.request(fp, 190, version=stored), QPixmap)
+        # Once the row carries the new mtime, the cached pixmap is stale.
+        ready.clear()
+        assert service.request(fp, 190, version=stored + 5_000_000_000) is None, "Changed file is re-rendered"
+        deadline = time.monotonic() + 10
+        while not ready and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        assert isinstance(service.request(fp, 190, version=stored + 5_000_000_000), QPixmap)
+
+        # With the single worker kept busy, the rest stay queued and can be dropped.
+        sizes = [60, 61, 62, 63]
+        for size in sizes:
+            service.request(fp, size, owner="grid")
+        dropped = service.cancel([(fp, size) for size in sizes])
+        assert dropped >= len(sizes) - 1, "Queued requests are cancelled"
+        service.shutdown()
+        app.processEvents()
+        store.close()
+
+
+def test_thumbnail_service_retries_failures_once_the_file_changes() -> None:
+    """A cached failure holds only while the stored file version is unchanged."""
+    import time
+    from PIL import Image
+    from PyQt6.QtGui import QPixmap
+    from core.thumbnail_cache import ThumbnailCache
+    from core.thumbnail_service import MISSING, ThumbnailService
+    from core.thumbnail_store import ThumbnailStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp = os.path.join(tmp, "late.jpg")
+        store = ThumbnailStore(os.path.join(tmp, "thumbnails.db"))
+        service = ThumbnailService(ThumbnailCache(), store, max_threads=1)
+        ready = []
+        service.thumbnail_ready.connect(lambda path, size: ready.append((path, size)))
+
+        def settle():
+            deadline = time.monotonic() + 10
+            while not ready and time.monotonic() < deadline:
+                app.processEvents()
+                time.sleep(0.01)
+            ready.clear()
+
+        assert service.request(fp, 120) is None
+        settle()
+        assert service.request(fp, 120) == MISSING, "Failure is remembered while nothing changes"
+
+        Image.new("RGB", (400, 300), (10, 160, 90)).save(fp)
+        assert service.request(fp, 120) == MISSING, "Lookups do not stat the file"
+        version = os.stat(fp).st_mtime_ns  # recorded by the rescan that found it
+        assert service.request(fp, 120, version=version) is None, "File that appeared is rendered again"
+        settle()
+        assert isinstance(service.request(fp, 120, version=version), QPixmap)
+        service.shutdown()
+        app.processEvents()
+        store.close()
+
+
+def test_thumbnail_store_derives_sizes_from_one_master_and_evicts_lru() -> None:
+    """One master per photo serves every size; stale masters miss and the cap evicts LRU."""
+    import time
+    from PIL import Image
+    from core.thumbnail_service import render_thumbnail
+    from core.thumbnail_store import MASTER_SIZE, ThumbnailStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp = os.path.join(tmp, "photo.jpg")
+        Image.new("RGB", (2000, 1000), (30, 90, 200)).save(fp)
+        store = ThumbnailStore(os.path.join(tmp, "thumbnails.db"))
+
+        for size in (60, 150, 250):
+            image, _mtime, _failure = render_thumbnail(fp, size, store)
+            assert image.width() == size, "Each size is derived to fit"
+        assert len(store) == 1, "Sizes share a single stored master"
+        st = os.stat(fp)
+        master = store.get(fp, st.st_mtime, st.st_size)
+        assert master is not None and store.get(fp, st.st_mtime + 1, st.st_size) is None, "Stale mtime misses"
+        from PyQt6.QtGui import QImage
+        assert QImage.fromData(master).width() == MASTER_SIZE
+
+        blob = b"x" * 1000
+        small = ThumbnailStore(os.path.join(tmp, "small.db"), max_bytes=3000)
+        for name in ("a", "b", "c"):
+            small.put(name, 1.0, 10, blob)
+            time.sleep(0.01)
+        assert small.get("a", 1.0, 10) == blob  # a is now the most recent
+        time.sleep(0.01)
+        small.put("d", 1.0, 10, blob)  # over the cap: evicts b, then c
+        assert small.get("b", 1.0, 10) is None and small.get("a", 1.0, 10) == blob
+        assert small.total_bytes <= 3000
+        small.close()
+        reopened = ThumbnailStore(os.path.join(tmp, "small.db"), max_bytes=3000)
+        assert reopened.total_bytes == small.total_bytes, "Byte total survives a reopen"
+        reopened.close()
+        store.close()
+
+
+def test_embedded_raw_preview_used_for_thumbnails() -> None:
+    """RAW thumbnails come from the smallest embedded JPEG preview that is big enough."""
+    import io
+    import struct
+    from PIL import Image
+    from core.embedded_preview import embedded_preview
+    from core.thumbnail_service import render_thumbnail
+    from core.thumbnail_store import ThumbnailStore
+
+    def _jpeg(w, h):
+        buf = io.BytesIO()
+        Image.new("RGB", (w, h), (10, 200, 90)).save(buf, "JPEG")
+        return buf.getvalue()
+
+    small, large = _jpeg(160, 120), _jpeg(800, 600)
+    # TIFF header, then two chained IFDs each pointing at one JPEG preview.
+    ifd_size = 2 + 2 * 12 + 4
+    small_at = 8 + 2 * ifd_size
+    large_at = small_at + len(small)
+
+    def _ifd(offset, length, next_ifd):
+        return (struct.pack("<H", 2)
+                + struct.pack("<HHII", 0x0201, 4, 1, offset)
+                + struct.pack("<HHII", 0x0202, 4, 1, length)
+                + struct.pack("<I", next_ifd))
+
+    raw = (b"II*\x00" + struct.pack("<I", 8)
+           + _ifd(small_at, len(small), 8 + ifd_size) + _ifd(large_at, len(large), 0)
+           + small + large)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp = os.path.join(tmp, "IMG_0001.cr2")
+        with open(fp, "wb") as f:
+            f.write(raw)
+        assert embedded_preview(fp, 100) == small, "Smallest preview that covers the size"
+        assert embedded_preview(fp, 320) == large
+        assert embedded_preview(fp, 2000) is None
+
+        store = ThumbnailStore(os.path.join(tmp, "thumbnails.db"))
+        image, _mtime, failure = render_thumbnail(fp, 150, store)
+        assert failure is None and (image.width(), image.height()) == (150, 112)
+        assert len(store) == 1, "A large enough preview becomes the stored master"
+        store.close()
+
+
+def test_thumbnail_prewarmer_waits_for_idle_and_resumes() -> None:
+    """Prewarming builds masters only while idle and resumes from its checkpoint."""
+    import time
+    from PIL import Image
+    from core.thumbnail_cache import ThumbnailCache
+    from core.thumbnail_service import ThumbnailPrewarmer, ThumbnailService
+    from core.thumbnail_store import ThumbnailStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photos = []
+        for i in range(1, 5):
+            fp = os.path.join(tmp, f"p{i}.jpg")
+            Image.new("RGB", (900, 600), (i * 50, 60, 90)).save(fp)
+            photos.append((i, fp))
+        store = ThumbnailStore(os.path.join(tmp, "thumbnails.db"))
+        service = ThumbnailService(ThumbnailCache(), store, max_threads=1)
+
+        def fetch(after_id, limit):
+            return [p for p in photos if p[0] > after_id][:limit]
+
+        def pump(until, seconds=10):
+            deadline = time.monotonic() + seconds
+            while not until() and time.monotonic() < deadline:
+                app.processEvents()
+                time.sleep(0.01)
+
+        busy = [True]
+        checkpoints, runs = [], []
+        warmer = ThumbnailPrewarmer(service, fetch, is_busy=lambda: busy[0], checkpoint=1,
+                                    interval_ms=5, idle_ms=0, batch_size=2)
+        warmer.checkpoint_changed.connect(checkpoints.append)
+        warmer.finished.connect(runs.append)
+        warmer.start()
+        pump(lambda: False, seconds=0.2)
+        assert len(store) == 0, "Nothing is built while the app is busy"
+
+        busy[0] = False
+        pump(lambda: runs)
+        assert runs == [3] and len(store) == 3, "Photos after the checkpoint get a master"
+        assert checkpoints[:2] == [3, 4], "Progress is reported per batch"
+
+        warmer.start()
+        pump(lambda: len(runs) == 2)
+        assert runs[-1] == 0, "A resumed run skips what is already done"
+        warmer.stop()
+        service.shutdown()
+        store.close()
+
+
+def test_folder_watcher_scandir_skips_unchanged_dirs_and_debounces() -> None:
+    """Polling lists only changed directories, waits for files to stop growing and batches them."""
+    import time
+    from core.folder_watcher import FolderWatcher
+    from core.scanner import DirectoryScanner
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.realpath(tmp)
+        sub = os.path.join(root, "sub")
+        os.mkdir(sub)
+        for path in (os.path.join(root, "a.JPG"), os.path.join(sub, "b.nef"), os.path.join(root, "notes.txt")):
+            with open(path, "wb") as f:
+                f.write(b"x")
+
+        scanner = DirectoryScanner(root)
+        assert sorted(e.path for e in scanner.scan()) == [os.path.join(root, "a.JPG"), os.path.join(sub, "b.nef")], \
+            "Extensions match case-insensitively; other files are ignored"
+        assert list(scanner.scan()) == [], "Unchanged directories are not listed again"
+        time.sleep(0.01)
+        with open(os.path.join(sub, "c.jpeg"), "wb") as f:
+            f.write(b"x")
+        assert sorted(e.path for e in scanner.scan()) == [os.path.join(sub, "b.nef"), os.path.join(sub, "c.jpeg")], \
+            "Only the changed directory is listed"
+
+        class _DB:
+            db_path = os.path.join(root, "photos.db")
+
+        watcher = FolderWatcher(root, _DB(), settle_secs=0.2, use_events=False, batch_size=2, batch_ms=0)
+        batches = []
+        watcher.new_photos_found.connect(batches.append)
+        found = []
+        watcher.new_photos_found.connect(lambda items: found.extend(fp for fp, _meta in items))
+        watcher._known_paths = {os.path.join(root, "a.JPG")}
+        watcher._start_watching()
+        watcher._scan()
+        watcher._release_settled()
+        watcher._flush_batch()
+        assert found == [], "New files wait to settle"
+
+        growing = os.path.join(root, "copying.jpg")
+        with open(growing, "wb") as f:
+            f.write(b"x" * 10)
+        watcher._scan()
+        time.sleep(0.25)
+        with open(growing, "ab") as f:
+            f.write(b"x" * 10)  # still being written
+        watcher._release_settled()
+        watcher._flush_batch()
+        assert sorted(found) == [os.path.join(sub, "b.nef"), os.path.join(sub, "c.jpeg")]
+        assert len(batches) == 1, "Settled files are reported together"
+        time.sleep(0.25)
+        watcher._release_settled()
+        watcher._flush_batch()
+        assert found[-1] == growing and len(found) == 3, "Reported once its size is stable"
+        watcher._scan()
+        time.sleep(0.25)
+        watcher._release_settled()
+        watcher._flush_batch()
+        assert len(found) == 3, "Files are reported once"
+
+
+def test_folder_watcher_flushes_pending_batch_on_stop_and_folder_change() -> None:
+    """Settled files still waiting in a batch are reported when the watcher stops or moves."""
+    import time
+    from unittest import mock
+    import core.folder_watcher as folder_watcher
+    from core.folder_watcher import FolderWatcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.realpath(tmp)
+
+        class _DB:
+            db_path = os.path.join(root, "photos.db")
+
+        watcher = FolderWatcher(root, _DB(), use_events=False, batch_ms=60000)
+        found = []
+        watcher.new_photos_found.connect(lambda items: found.extend(fp for fp, _meta in items))
+
+        def _stop_after_one_pass(_secs):
+            watcher._running = False
+
+        with mock.patch.object(folder_watcher.time, "sleep", _stop_after_one_pass):
+            watcher._batch, watcher._batch_started = ["/settled/a.jpg"], time.monotonic()
+            watcher.run()
+            assert found == ["/settled/a.jpg"], "Stopping reports the pending batch"
+
+            watcher._batch, watcher._batch_started = ["/settled/b.jpg"], time.monotonic()
+            watcher.set_folder(root)
+            watcher.run()
+            assert found == ["/settled/a.jpg", "/settled/b.jpg"], "Changing folder reports the pending batch"
+
+
+def test_folder_watcher_imports_and_tracks_duplicates_off_the_gui_thread() -> None:
+    """With import_photos the watcher stores batches and links duplicates, sending only ids."""
+    from PIL import Image
+    from core.database import PhotoDatabase
+    from core.folder_watcher import FolderWatcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.realpath(tmp)
+        db_path = _make_db_file(root)
+        paths = [os.path.join(root, name) for name in ("a.jpg", "copy.jpg", "other.jpg")]
+        Image.new("RGB", (64, 48), (200, 30, 30)).save(paths[0])
+        with open(paths[0], "rb") as src, open(paths[1], "wb") as dst:
+            dst.write(src.read())
+        Image.effect_noise((64, 48), 80).convert("RGB").save(paths[2])
+
+        class _DB:
+            pass
+
+        _DB.db_path = db_path
+        watcher = FolderWatcher(root, _DB(), use_events=False, batch_ms=0, import_photos=True)
+        found, imported = [], []
+        watcher.new_photos_found.connect(found.append)
+        watcher.photos_imported.connect(lambda ids, groups: imported.append((ids, groups)))
+        watcher._batch, watcher._batch_started = list(paths), 0.0
+        watcher._flush_batch(force=True)
+        watcher._import_db.close()
+
+        assert found == [], "The GUI gets no file list to import"
+        assert len(imported) == 1 and len(imported[0][0]) == 3
+        db = PhotoDatabase(db_path)
+        try:
+            groups = db.get_duplicate_groups()
+            assert [sorted(p["filename"] for p in g) for g in groups] == [["a.jpg", "copy.jpg"]]
+            assert imported[0][1] == [groups[0][0]["duplicate_group_id"]]
+        finally:
+            db.close()
+
+
+def test_settings_tab_watcher_imports_and_tracks_duplicates() -> None:
+    """The Settings-tab watcher is started like the main window's, so its imports link duplicates."""
+    import time
+    from types import SimpleNamespace
+    from PIL import Image
+    from PyQt6.QtWidgets import QCheckBox, QLabel, QLineEdit, QPushButton, QSpinBox
+    from core.database import PhotoDatabase
+    from nova_manager import MainWindow
+    from ui.settings_tab import SettingsTab
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.realpath(tmp)
+        db = PhotoDatabase(os.path.join(root, "photos.db"))
+        imported = []
+
+        class _Controller:
+            _start_folder_watcher = MainWindow._start_folder_watcher
+
+            def __init__(self):
+                self.db = db
+
+            def statusBar(self):
+                return None
+
+            def _on_photos_imported(self, photo_ids, group_ids):
+                imported.append((photo_ids, group_ids))
+
+        ctrl = _Controller()
+        interval = QSpinBox()
+        interval.setValue(5)
+        tab = SimpleNamespace(controller=ctrl, watch_folder_edit=QLineEdit(root), watcher_interval_spin=interval,
+                              watch_subfolders_cb=QCheckBox(), start_watcher_btn=QPushButton(),
+                              watcher_status=QLabel())
+        SettingsTab._toggle_watcher(tab)
+        watcher = ctrl._folder_watcher
+        assert watcher.import_photos and tab.start_watcher_btn.text() == "Stop Watcher"
+        assert not hasattr(SettingsTab, "_on_new_photos"), "No second, GUI-thread import path"
+        deadline = time.monotonic() + 10
+        while not watcher._running and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        watcher.stop()
+        assert watcher.wait(10000)
+
+        paths = [os.path.join(root, name) for name in ("a.jpg", "copy.jpg")]
+        Image.new("RGB", (64, 48), (30, 200, 30)).save(paths[0])
+        with open(paths[0], "rb") as src, open(paths[1], "wb") as dst:
+            dst.write(src.read())
+        watcher._batch, watcher._batch_started = list(paths), 0.0
+        watcher._flush_batch(force=True)
+        watcher._import_db.close()
+
+        assert len(imported) == 1 and len(imported[0][0]) == 2, "Batch reported through _on_photos_imported"
+        groups = db.get_duplicate_groups()
+        assert [sorted(p["filename"] for p in g) for g in groups] == [["a.jpg", "copy.jpg"]]
+        assert imported[0][1] == [groups[0][0]["duplicate_group_id"]]
+        assert all(p["file_hash"] for p in groups[0]), "Colliding copies were hashed on the watcher thread"
+        app.processEvents()  # deliver queued status updates while the watcher is still alive
+        db.close()
+
+
+def test_scanner_single_walk_with_excludes_and_parallel_subtrees() -> None:
+    """scan_files yields (path, size, mtime_ns, inode) once per file, honouring exclude globs."""
+    from core.scanner import scan_files
+
+    with tempfile.TemporaryDirectory() as tmp:
+        expected = set()
+        for d in ("2023", "2024", "2024/raw", "@eaDir", "2025"):
+            os.makedirs(os.path.join(tmp, d), exist_ok=True)
+        for rel in ("top.JPEG", "2023/a.jpg", "2024/b.Png", "2024/raw/c.CR2", "2025/d.heic"):
+            with open(os.path.join(tmp, rel), "wb") as f:
+                f.write(b"12345")
+            expected.add(os.path.join(tmp, rel))
+        for rel in ("@eaDir/thumb.jpg", "2023/skip.tmp.jpg", "2024/readme.txt"):
+            with open(os.path.join(tmp, rel), "wb") as f:
+                f.write(b"x")
+
+        entries = list(scan_files(tmp, exclude=("@eaDir", "*.tmp.jpg")))
+        assert {e.path for e in entries} == expected and len(entries) == len(expected)
+        top = next(e for e in entries if e.path.endswith("top.JPEG"))
+        st = os.stat(top.path)
+        assert (top.size, top.mtime_ns, top.inode) == (5, st.st_mtime_ns, st.st_ino)
+
+        parallel = {e.path for e in scan_files(tmp, exclude=("@eaDir", "*.tmp.jpg"), workers=3)}
+        assert parallel == expected, "Parallel subtrees find the same files"
+        flat = {e.path for e in scan_files(tmp, recursive=False)}
+        assert flat == {os.path.join(tmp, "top.JPEG")}
+        everything = {e.path for e in scan_files(tmp, extensions=None)}
+        assert os.path.join(tmp, "2024", "readme.txt") in everything
+
+
+def test_rescan_reprocesses_only_modified_files() -> None:
+    """Fingerprints skip unchanged photos; a modified file gets fresh hashes."""
+    from PIL import Image
+    from core.database import PhotoDatabase
+    from core.ingest_pipeline import IngestPipeline
+    from core.scanner import scan_files
+
+    def _analyze(_path, _db):
+        return {"scene_type": "landscape"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.realpath(tmp)
+        photos = os.path.join(root, "photos")
+        os.mkdir(photos)
+        _make_images(photos, [(i * 60, 90, 30) for i in range(3)])
+        db_path = _make_db_file(root)
+
+        IngestPipeline(db_path, list(scan_files(photos)), analyze=_analyze,
+                       use_processes=False, batch_interval=0.05).run()
+        db = PhotoDatabase(db_path)
+        try:
+            state = db.get_analysis_state()
+            assert all(fingerprint is not None for _pid, _done, fingerprint in state.values())
+            edited = os.path.join(photos, "img_1.jpg")
+            old_hash = db.get_photo_by_path(edited)["file_hash"]
+            # A photo imported before fingerprints existed.
+            legacy = db.get_photo_by_path(os.path.join(photos, "img_2.jpg"))["id"]
+            db.cursor.execute("UPDATE photos SET file_mtime_ns = NULL, file_inode = NULL WHERE id = ?", (legacy,))
+            db.conn.commit()
+        finally:
+            db.close()
+
+        Image.new("RGB", (80, 40), (250, 0, 0)).save(edited)
+        st = os.stat(edited)
+        os.utime(edited, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        local_paths, changed = [], []
+        rerun = IngestPipeline(db_path, list(scan_files(photos)), analyze=_analyze,
+                               use_processes=False, batch_interval=0.05)
+        rerun.on_local = lambda pid: local_paths.append(pid)
+        rerun.on_changed = lambda pid, path: changed.append(path)
+        rerun.run()
+        assert changed == [edited], changed
+        assert len(local_paths) == 1, "Unchanged photos are skipped"
+
+        db = PhotoDatabase(db_path)
+        try:
+            row = db.get_photo_by_path(edited)
+            assert row["file_size_bytes"] == os.path.getsize(edited), "Size tier refreshed"
+            assert not row["file_hash"] or row["file_hash"] != old_hash, "Stale hash dropped"
+            assert row["image_width"] == 80 and row["file_mtime_ns"] == os.stat(edited).st_mtime_ns
+            fingerprint = db.get_analysis_state()[os.path.join(photos, "img_2.jpg")][2]
+            assert fingerprint is not None, "Legacy row adopts its fingerprint without re-processing"
+        finally:
+            db.close()
+
+
+def test_ingest_pipeline_resumes_from_job_queue() -> None:
+    """An interrupted run resumes from analysis_jobs; failing AI jobs are retried, then kept as failed."""
+    from core.database import MAX_JOB_ATTEMPTS, PhotoDatabase
+    from core.ingest_pipeline import IngestPipeline, local_metadata
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = _make_images(tmp, [(i * 50, 10, 10) for i in range(4)], size=(32, 32))
+        db_path = _make_db_file(tmp)
+
+        ai_calls, local_calls = [], []
+
+        def _analyze(path, _db):
+            ai_calls.append(path)
+            if path == files[3]:
+                raise RuntimeError("model crashed")
+            return {"scene_type": "food"}
+
+        def _local(path):
+            local_calls.append(path)
+            return local_metadata(path)
+
+        first = IngestPipeline(db_path, files, analyze=_analyze, local=_local, use_processes=False,
+                               ai_workers=1, batch_interval=0.05)
+        first.on_ai = lambda _pid: first.stop()  # "close the app" after one AI result
+        first.run()
+        assert len(local_calls) == 4 and len(ai_calls) >= 1
+
+        db = PhotoDatabase(db_path)
+        try:
+            counts = db.get_job_counts("import")
+            assert counts.get(("local", "done")) == 4, counts
+            ai_done = counts.get(("ai", "done"), 0)
+            assert ai_done >= 1 and counts.get(("ai", "pending")) == 4 - ai_done, counts
+            # A crash leaves a claimed job running; the next run picks it up again.
+            db.cursor.execute("UPDATE analysis_jobs SET state = 'running' WHERE id = "
+                              "(SELECT MIN(id) FROM analysis_jobs WHERE stage = 'ai' AND state = 'pending')")
+            db.conn.commit()
+            assert db.count_unfinished_jobs("import") == 4 - ai_done
+        finally:
+            db.close()
+
+        ai_calls.clear()
+        local_calls.clear()
+        progress = []
+        resumed = IngestPipeline(db_path, [], analyze=_analyze, local=_local, use_processes=False,
+                                 ai_workers=1, batch_interval=0.05)
+        resumed.on_progress = lambda done, local_done, total, _name: progress.append((done, local_done, total))
+        resumed.run()
+        assert local_calls == [], "Local stage is not redone"
+        assert ai_calls.count(files[3]) == MAX_JOB_ATTEMPTS, ai_calls
+        assert resumed.failed == 1
+        remaining = 4 - ai_done
+        assert progress[-1] == (remaining, remaining, remaining), progress
+
+        db = PhotoDatabase(db_path)
+        try:
+            analysed = {path for path, (_pid, done, _fp) in db.get_analysis_state().items() if done}
+            assert analysed == set(files[:3])
+            failed = db.get_failed_jobs("import")
+            assert [(j["filepath"], j["last_error"]) for j in failed] == [(files[3], "model crashed")]
+            # Finished files are pruned; the failed one keeps its local job for the next retry.
+            assert db.count_unfinished_jobs("import") == 0
+            assert set(db.get_job_states("import", "local")) == {files[3]}
+
+            # A job left running on its last attempt can never be claimed, so nothing is offered.
+            db.cursor.execute("UPDATE analysis_jobs SET state = 'running' WHERE filepath = ? AND stage = 'ai'",
+                              (files[3],))
+            db.conn.commit()
+            assert db.count_unfinished_jobs("import") == 0
+            # Declining to resume drops the unfinished jobs instead of asking again,
+            # but jobs that already failed are kept as failed.
+            db.enqueue_jobs("import", [(files[0], "ai", None)])
+            assert db.count_unfinished_jobs("import") == 1
+            assert db.discard_unfinished_jobs("import") == 1
+            assert db.count_unfinished_jobs("import") == 0
+            assert [(j["filepath"], j["last_error"]) for j in db.get_failed_jobs("import")] == \
+                [(files[3], "model crashed")]
+        finally:
+            db.close()
+
+
+def test_reanalyzer_stop_cancels_queued_calls_and_releases_jobs() -> None:
+    """Stopping a re-analysis cancels its scheduler calls; their jobs go back to pending unwritten."""
+    import time
+    from concurrent.futures import Future
+    from unittest import mock
+    import nova_manager
+    from core.database import PhotoDatabase
+
+    class _Scheduler:
+        def __init__(self):
+            self.futures = []
 
+        def available(self, _priority):
+            return 2 - len(self.futures)
+
+        def try_submit_call(self, _fn, *_args, **_kwargs):
+            self.futures.append(Future())  # never started: queued behind other work
+            return self.futures[-1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "photos.db")
+        db = PhotoDatabase(db_path)
+        try:
+            photos = [{"id": db.add_photo(os.path.join(tmp, f"img_{i}.jpg")),
+                       "filepath": os.path.join(tmp, f"img_{i}.jpg")} for i in range(2)]
+        finally:
+            db.close()
+
+        scheduler = _Scheduler()
+        with mock.patch.object(nova_manager, "get_scheduler", lambda *_args: scheduler):
+            thread = nova_manager.ReanalyzerThread(photos, db_path)
+            thread.start()
+            deadline = time.monotonic() + 5
+            while len(scheduler.futures) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            thread.stop()
+            assert len(scheduler.futures) == 2 and all(f.cancelled() for f in scheduler.futures), \
+                "stop() cancels the queued calls itself"
+            assert thread.wait(5000)
+        app.processEvents()
+
+        db = PhotoDatabase(db_path)
+        try:
+            states = db.get_job_states(nova_manager.ReanalyzerThread.JOB_SOURCE, "ai")
+            assert sorted(states.values()) == ["pending", "pending"], states
+            db.cursor.execute("SELECT MAX(attempts) FROM analysis_jobs")
+            assert db.cursor.fetchone()[0] == 0, "A cancelled call does not use up an attempt"
+        finally:
+            db.close()
+
+
+def test_analyzer_service_adapts_concurrency_with_backpressure() -> None:
+    """AnalyzerService ramps up to what the host sustains, applies backpressure and backs off on errors."""
+    import threading
+    import time
+    from core.analyzer_service import AnalyzerService
+
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def _host(path, _db):
+        # A host with two parallel slots: more calls share them and each takes longer.
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            share = max(1.0, in_flight[0] / 2)
+        time.sleep(0.01 * share)
+        with lock:
+            in_flight[0] -= 1
+        return {"scene_type": path}
+
+    service = AnalyzerService(None, _host, max_concurrency=8)
+    try:
+        futures = [service.submit(str(i)) for i in range(120)]
+        assert [f.result(5)["scene_type"] for f in futures] == [str(i) for i in range(120)]
+        assert peak[0] >= 2, "Concurrency ramps up from one call"
+        assert 2 <= service.limit <= 4, service.stats()
+    finally:
+        service.shutdown()
+
+    release = threading.Event()
+    service = AnalyzerService(None, lambda _p, _db: release.wait(5) and {}, max_concurrency=2)
+    try:
+        held = [service.submit("a"), service.submit("b")]  # limit 1: one running, one queued
+        assert service.available() == 0
+        try:
+            service.submit("c", block=False)
+            raise AssertionError("submit should refuse work at capacity")
+        except RuntimeError:
+            pass
+        release.set()
+        assert [f.result(5) for f in held] == [{}, {}]
+    finally:
+        service.shutdown()
+
+    def _failing(_path, _db):
+        raise ConnectionError("host down")
+
+    service = AnalyzerService(None, _failing, max_concurrency=8, initial_concurrency=8)
+    try:
+        future = service.submit("x")
+        assert isinstance(future.exception(5), ConnectionError)
+        assert service.limit == 4, "A failed call halves the limit"
+    finally:
+        service.shutdown()
+
+
+def test_analyzer_service_latency_baseline_ignores_cache_hits_and_recovers() -> None:
+    """Cache hits and non-analysis calls do not feed the limiter, and one fast outlier does not pin it."""
+    import time
+    from core.analyzer_service import AnalyzerService
+
+    class _Cached(dict):
+        from_cache = True
+
+    def _host(path, _db):
+        if path.startswith("cached"):
+            return _Cached(scene_type="food")
+        time.sleep(0.01)
+        return {"scene_type": "food"}
+
+    service = AnalyzerService(None, _host, max_concurrency=4, initial_concurrency=4)
+    try:
+        for path in ["cached0", "cached1", "cached2"]:
+            service.submit(path).result(5)
+        service.submit_call(lambda _db: None).result(5)
+        assert service.latency is None and service.limit == 4, service.stats()
+        service.submit("real0").result(5)
+        assert service.latency is not None, "Model calls are sampled"
+    finally:
+        service.shutdown()
+
+    def _constant(path, _db):
+        # One instant measured call, then a host whose latency does not depend on load.
+        if path != "first":
+            time.sleep(0.01)
+        return {}
+
+    service = AnalyzerService(None, _constant, max_concurrency=4, initial_concurrency=4)
+    try:
+        service.submit("first").result(5)
+        futures = [service.submit(str(i)) for i in range(300)]
+        for future in futures:
+            future.result(5)
+        assert service.limit >= 3, service.stats()
+    finally:
+        service.shutdown()
+
+
+def test_ai_payload_is_reduced_jpeg() -> None:
+    """The model gets a JPEG reduced to the configured size; small JPEGs are sent untouched."""
+    import io
+    from PIL import Image
+    from core.ai_analyzer import encode_for_model
+    from core.image_context import ImageContext
+
+    with tempfile.TemporaryDirectory() as tmp:
+        big = os.path.join(tmp, "big.png")
+        Image.new("RGB", (3000, 2000), (10, 120, 200)).save(big)
+        ctx = ImageContext.load(big)
+        payload, encode_ms = encode_for_model(ctx, 1024, 80)
+        sent = Image.open(io.BytesIO(payload))
+        assert sent.format == "JPEG" and max(sent.size) == 1024, sent.size
+        assert len(payload) < ctx.file_size and encode_ms > 0
+
+        payload, _ms = encode_for_model(ctx, 1600, 80)
+        assert max(Image.open(io.BytesIO(payload)).size) == 1600, "Sizes above the shared preview decode again"
+
+        small = os.path.join(tmp, "small.jpg")
+        Image.new("RGB", (320, 200), (200, 50, 50)).save(small, quality=90)
+        ctx = ImageContext.load(small)
+        assert encode_for_model(ctx, 1024, 80) == (ctx.data, 0.0)
+
+
+def test_ai_results_cache_by_content_model_and_prompt() -> None:
+    """Cached AI results are reused for identical content (any path), across corrections, until a refresh is forced."""
+    import shutil
+    from PIL import Image
+    from core import ai_analyzer
+    from core.ai_analyzer import AnalyzerSession, analyze_image, prompt_hash
+    from core.database import PhotoDatabase
+    from core.duplicate_detector import full_hash
+
+    calls = []
+
+    class FakeClient:
+        def generate(self, stream=False, **kwargs):
+            calls.append(kwargs["images"][0])
+            return {"response": '{"scene_type": "portrait", "ai_caption": "Fresh"}', "eval_count": 12}
+
+    class FakeSession(AnalyzerSession):
+        client = FakeClient()
+
+    ollama = ai_analyzer.ollama
+    ai_analyzer.ollama = ollama or object()  # the fake client stands in for it
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, "a", "beach.jpg")
+        os.makedirs(os.path.dirname(original))
+        Image.new("RGB", (64, 48), (0, 120, 220)).save(original)
+        copy = os.path.join(tmp, "b", "beach copy.jpg")
+        os.makedirs(os.path.dirname(copy))
+        shutil.copy(original, copy)
+        db_path = _make_db_file(tmp)
+        db = PhotoDatabase(db_path)
+        try:
+            session = FakeSession(db)
+            session.stream = False
+            cached = {"scene_type": "landscape", "ai_caption": "Blue sky"}
+            # Metrics of the original call are not handed out again.
+            db.put_ai_result(full_hash(original), "llava", prompt_hash(), "{...}",
+                             dict(cached, ai_tokens=120, ai_generate_ms=900.0))
+
+            hit = analyze_image(original, db, session=session)
+            assert hit == cached and hit.from_cache, hit
+            assert analyze_image(copy, db, session=session) == cached, "Same content at another path"
+
+            photo_id = db.add_photo(original, {})
+            db.save_correction(photo_id, "scene_type", "landscape", "travel")
+            assert analyze_image(copy, db, session=FakeSession(db)) == cached, \
+                "A correction does not invalidate the cache"
+            assert calls == [], "Hits never reach the model"
+
+            session = FakeSession(db)
+            session.stream = False
+            miss = analyze_image(copy, db, image_size=512, session=session)
+            assert miss["ai_caption"] == "Fresh" and not getattr(miss, "from_cache", False)
+            assert len(calls) == 1, "Image settings are part of the key"
+            assert analyze_image(original, db, image_size=512, session=session)["ai_caption"] == "Fresh"
+            assert len(calls) == 1, "The miss was cached"
+
+            forced = analyze_image(original, db, force=True, session=session)
+            assert forced["ai_caption"] == "Fresh" and not getattr(forced, "from_cache", False)
+            assert len(calls) == 2, "force skips the cache"
+            assert analyze_image(copy, db, session=session)["ai_caption"] == "Fresh", "force refreshes the entry"
+            assert len(calls) == 2
+        finally:
+            db.close()
+            ai_analyzer.ollama = ollama
+
+
+def test_analyzer_session_builds_prompt_once() -> None:
+    """Correction examples and Ollama settings are read once per session, until they change."""
+    from PIL import Image
+    from core.ai_analyzer import analyze_image, get_session
+    from core.database import PhotoDatabase
+    from core.duplicate_detector import full_hash
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, "beach.jpg")
+        Image.new("RGB", (64, 48), (0, 120, 220)).save(image_path)
+        db_path = _make_db_file(tmp)
+        db = PhotoDatabase(db_path)
+        try:
+            calls = {"examples": 0, "credentials": 0}
+
+            def counting(name, method):
+                def wrapper(*args, **kwargs):
+                    calls[name] += 1
+                    return method(*args, **kwargs)
+                return wrapper
+
+            db.get_correction_examples = counting("examples", db.get_correction_examples)
+            db.get_credentials = counting("credentials", db.get_credentials)
+
+            session = get_session(db)
+            cached = {"scene_type": "landscape", "ai_caption": "Blue sky"}
+            db.put_ai_result(full_hash(image_path), session.model, session.prompt_hash, "{...}", cached)
+            for _ in range(5):
+                assert analyze_image(image_path, db) == cached
+            assert calls == {"examples": 1, "credentials": 1}, calls
+            assert get_session(db) is session
+
+            photo_id = db.add_photo(image_path, {})
+            db.save_correction(photo_id, "scene_type", "landscape", "travel")
+            rebuilt = get_session(db)
+            assert rebuilt is not session and "'landscape' → 'travel'" in rebuilt.prompt
+            assert calls == {"examples": 2, "credentials": 2}, calls
+
+            db.save_credentials("ollama", {"model": "llava:13b"})
+            assert get_session(db).model == "llava:13b"
+            assert get_session(db).prompt == rebuilt.prompt
+            assert calls == {"examples": 3, "credentials": 3}, calls
+        finally:
+            db.close()
+
+
+def test_streaming_analysis_stops_at_complete_json() -> None:
+    """Streamed replies are cut off once the JSON object is complete, with TTFT and token counts."""
+    from core.ai_analyzer import AnalyzerSession, JsonStreamParser, _parse_response, generate_analysis
+
+    parser = JsonStreamParser()
+    pieces = ['Sure {not json} ', '{"ai_caption": "A } in \\"quotes\\" {",', ' "scene_type": "food"', '}', ' trailing']
+    results = [parser.feed(piece) for piece in pieces]
+    assert results[:3] == [None, None, None]
+    assert results[3] == {"ai_caption": 'A } in "quotes" {', "scene_type": "food"}, results[3]
+    assert results[4] is results[3]
+    assert parser.text.endswith('"food"}')
+
+    reply = '{"scene_type": "food", "ai_caption": "Soup"}\n\nThis photo shows a bowl of soup on a table.'
+    consumed = []
+    closed = []
+
+    class FakeStream:
+        def __iter__(self):
+            for i, ch in enumerate(reply):
+                consumed.append(ch)
+                yield {"response": ch, "done": False}
+            yield {"response": "", "done": True, "eval_count": len(reply)}
+
+        def close(self):
+            closed.append(True)
+
+    class FakeClient:
+        def generate(self, stream=False, **kwargs):
+            if stream:
+                return FakeStream()
+            return {"response": reply, "eval_count": len(reply)}
+
+    class FakeSession(AnalyzerSession):
+        client = FakeClient()
+
+    session = FakeSession()
+    assert session.stream
+    text, metrics = generate_analysis(session, b"jpeg")
+    json_len = reply.index("}") + 1
+    assert len(consumed) == json_len, "Generation must stop at the closing brace"
+    assert closed == [True]
+    assert metrics["ai_tokens"] == json_len and metrics["ai_ttft_ms"] is not None
+    assert _parse_response(text)["ai_caption"] == "Soup"
+
+    session.stream = False
+    text, metrics = generate_analysis(session, b"jpeg")
+    assert text == reply and metrics["ai_tokens"] == len(reply) and metrics["ai_ttft_ms"] is None
+
+
+def test_ai_scheduler_serves_interactive_requests_first() -> None:
+    """Interactive AI requests start ahead of queued bulk work, and queued work can be cancelled."""
+    import threading
+    from core.analyzer_service import BULK, INTERACTIVE, REANALYSIS, AnalyzerService, get_scheduler
+
+    release = threading.Event()
+    started = []
+
+    def _host(path, _db):
+        started.append(path)
+        release.wait(5)
+        return path
+
+    def _wait_started(count):
+        for _ in range(500):
+            if len(started) >= count:
+                return
+            threading.Event().wait(0.01)
+
+    service = AnalyzerService(None, _host, max_concurrency=1)
+    try:
+        bulk = [service.submit(f"bulk{i}") for i in range(2)]  # limit 1: one running, one queued
+        _wait_started(1)
+        rean = service.submit("rean", block=False, priority=REANALYSIS)
+        caption = service.submit_call(lambda path, _db: started.append(path) or "caption", "ui")
+        # One slot over the limit is kept for interactive requests.
+        assert caption.result(5) == "caption"
+        assert started == ["bulk0", "ui"], started
+        assert service.cancel(BULK) == 1 and bulk[1].cancelled()
+        release.set()
+        assert bulk[0].result(5) == "bulk0" and rean.result(5) == "rean"
+        assert started == ["bulk0", "ui", "rean"], started
+    finally:
+        service.shutdown()
+
+    release.clear()
+    started.clear()
+    service = AnalyzerService(None, _host, max_concurrency=1, class_limits={INTERACTIVE: 1})
+    try:
+        service.submit("bulk")
+        _wait_started(1)
+        ui = [service.submit("ui0", priority=INTERACTIVE), service.submit("ui1", priority=INTERACTIVE)]
+        queued = service.submit("later", priority=REANALYSIS)
+        _wait_started(2)
+        assert started == ["bulk", "ui0"], "Interactive requests are capped by their class limit"
+        release.set()
+        assert [f.result(5) for f in ui] == ["ui0", "ui1"] and queued.result(5) == "later"
+        assert started.index("ui1") < started.index("later")
+    finally:
+        service.shutdown()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "photos.db")
+        shared = get_scheduler(db_path, 2)
+        try:
+            assert get_scheduler(db_path, 3) is shared and shared.max_concurrency == 3
+        finally:
+            shared.shutdown()
+        assert get_scheduler(db_path) is not shared
+        get_scheduler(db_path).shutdown()
+
+
+def test_ingest_pipeline_survives_limit_drop_between_available_and_submit() -> None:
+    """Jobs the AnalyzerService no longer takes after ``available`` go back to pending instead of aborting the run."""
+    from core.analyzer_service import BULK, AnalyzerService
+    from core.database import PhotoDatabase
+    from core.ingest_pipeline import IngestPipeline
+
+    class _Overstating(AnalyzerService):
+        # As if the limit dropped right after every ``available`` call.
+        def available(self, priority=BULK):
+            return super().available(priority) + 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = _make_images(tmp, [(i * 20, 10, 10) for i in range(10)], size=(32, 32))
+        db_path = _make_db_file(tmp)
+
+        analyzer = _Overstating(None, lambda _path, _db: {"scene_type": "food"}, max_concurrency=1)
+        assert analyzer.try_submit("x") is not None and analyzer.try_submit("y") is not None
+        assert analyzer.try_submit("z") is None, "try_submit returns None at capacity"
+        try:
+            pipeline = IngestPipeline(db_path, files, use_processes=False, batch_interval=0.05,
+                                      analyzer=analyzer)
+            pipeline.run()
+        finally:
+            analyzer.shutdown()
+        assert pipeline.failed == 0
+        db = PhotoDatabase(db_path)
+        try:
+            assert db.count_unfinished_jobs("import") == 0
+            assert all(done for _pid, done, _fp in db.get_analysis_state().values())
+        finally:
+            db.close()
+
+
+def test_ingest_pipeline_local_stage_not_blocked_by_ai() -> None:
+    """Local metadata for every file is committed before the (slow) AI stage finishes."""
+    import threading
+    from core.database import PhotoDatabase
+    from core.ingest_pipeline import IngestPipeline
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = _make_images(tmp, [(i * 40, 80, 120) for i in range(6)])
+        db_path = _make_db_file(tmp)
+
+        release_ai = threading.Event()
+        local_ids, ai_ids = [], []
+
+        def _slow_ai(path, _db):
+            release_ai.wait(5)
+            return {"scene_type": "portrait", "mood": "calm"}
+
+        def _on_local(photo_id):
+            local_ids.append(photo_id)
+            if len(local_ids) == len(files):
+                release_ai.set()
+
+        pipeline = IngestPipeline(db_path, files, analyze=_slow_ai, use_processes=False,
+                                  cpu_workers=2, ai_workers=2, batch_interval=0.05)
+        pipeline.on_local = _on_local
+        pipeline.on_ai = ai_ids.append
+        pipeline.run()
+
+        assert len(local_ids) == 6 and sorted(ai_ids) == sorted(local_ids)
+        db = PhotoDatabase(db_path)
+        try:
+            rows = db.get_all_photos()
+            assert len(rows) == 6
+            assert all(r["file_size_bytes"] and r["image_width"] == 64 for r in rows), "Local metadata stored"
+            assert all(r["scene_type"] == "portrait" for r in rows), "AI fields stored"
+        finally:
+            db.close()
+
+        # A second run skips photos that are already analysed.
+        rerun = IngestPipeline(db_path, files, analyze=_slow_ai, use_processes=False, batch_interval=0.05)
+        rerun.on_local = lambda _pid: (_ for _ in ()).throw(AssertionError("should skip"))
+        rerun.run()
+
+
+def main() -> int:
     tests = [
-        ("Gallery pagination + preserve_limit", test_gallery_pagination_sort_and_preserve_limit),
+        ("Gallery model sort/group + lazy thumbnails", test_gallery_model_sort_group_and_lazy_thumbnails),
         ("Smart album status parsing", test_smart_album_status_clause_parsing),
         ("Face worker finished once", test_face_worker_emits_finished_once),
         ("Face worker cancel flag", test_face_worker_cancel_no_success_dialog),
@@ -493,6 +1969,38 @@ def main() -> int:
         ("Smart album 5 missing filter controls", test_smart_album_missing_filter_controls),
         ("add_vocabulary_value returns False for duplicate", test_add_vocabulary_value_returns_false_for_duplicate),
         ("Batch rename DB sync", test_batch_rename_db_sync),
+        ("Filter spec compiles to SQL", test_filtered_photos_sql_matches_filter_semantics),
+        ("Library table model/proxy", test_library_model_rows_sort_and_edits),
+        ("Ingest pipeline stages", test_ingest_pipeline_local_stage_not_blocked_by_ai),
+        ("Shared image context", test_image_context_shared_by_local_extractors),
+        ("Quality score pinned at analysis scale", test_quality_score_is_pinned_at_the_analysis_scale),
+        ("Perceptual hash index", test_phash_index_matches_brute_force),
+        ("Duplicate clustering", test_find_duplicates_union_find_is_order_independent),
+        ("Persisted duplicate groups", test_duplicate_tracker_persists_groups),
+        ("Tiered exact hashing", test_tiered_exact_hashing_escalates_only_on_collision),
+        ("Legacy MD5 hashes", test_legacy_md5_hashes_are_compared_like_with_like),
+        ("Thumbnail memory cache", test_thumbnail_memory_cache_budget_and_invalidation),
+        ("Background thumbnail service", test_thumbnail_service_builds_in_background_and_cancels),
+        ("Thumbnail failures retried on change", test_thumbnail_service_retries_failures_once_the_file_changes),
+        ("Packed thumbnail store", test_thumbnail_store_derives_sizes_from_one_master_and_evicts_lru),
+        ("Embedded RAW previews", test_embedded_raw_preview_used_for_thumbnails),
+        ("Idle thumbnail prewarming", test_thumbnail_prewarmer_waits_for_idle_and_resumes),
+        ("Folder watcher scandir + debounce", test_folder_watcher_scandir_skips_unchanged_dirs_and_debounces),
+        ("Folder watcher flushes its batch on stop", test_folder_watcher_flushes_pending_batch_on_stop_and_folder_change),
+        ("Folder watcher imports off the GUI thread", test_folder_watcher_imports_and_tracks_duplicates_off_the_gui_thread),
+        ("Settings-tab watcher tracks duplicates", test_settings_tab_watcher_imports_and_tracks_duplicates),
+        ("Shared directory scanner", test_scanner_single_walk_with_excludes_and_parallel_subtrees),
+        ("Rescan re-processes only modified files", test_rescan_reprocesses_only_modified_files),
+        ("Ingest resumes from the job queue", test_ingest_pipeline_resumes_from_job_queue),
+        ("Reanalyzer stop cancels queued calls", test_reanalyzer_stop_cancels_queued_calls_and_releases_jobs),
+        ("Analyzer service adaptive concurrency", test_analyzer_service_adapts_concurrency_with_backpressure),
+        ("Analyzer latency baseline ignores cache hits", test_analyzer_service_latency_baseline_ignores_cache_hits_and_recovers),
+        ("AI payload is a reduced JPEG", test_ai_payload_is_reduced_jpeg),
+        ("AI results cache", test_ai_results_cache_by_content_model_and_prompt),
+        ("Analyzer session builds prompt once", test_analyzer_session_builds_prompt_once),
+        ("Streaming analysis stops at complete JSON", test_streaming_analysis_stops_at_complete_json),
+        ("AI scheduler serves interactive requests first", test_ai_scheduler_serves_interactive_requests_first),
+        ("Pipeline survives a limit drop before submit", test_ingest_pipeline_survives_limit_drop_between_available_and_submit),
     ]
 
     print("=" * 60)
@@ -515,8 +2023,6 @@ def main() -> int:
     print(f"Results: {passed} passed, {failed} failed")
     print("=" * 60)
 
-    # keep app referenced
-    _ = app
     return 0 if failed == 0 else 1
 
 
@@ -41,8 +41,15 @@ class DuplicatesTab(QWidget):
         self.controller = controller
         self._groups: list[list[dict]] = []
         self._keep_selections: dict[int, int] = {}  # group_idx -> photo_id to keep
+        self._loaded = False
         self._build_ui()
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._loaded:
+            self._loaded = True
+            self.load_saved_groups()
+
     def _build_ui(self):
         layout = QVBoxLayout(self)
 
@@ -63,6 +70,7 @@ class DuplicatesTab(QWidget):
 
         # Info bar
         self.info_label = QLabel('Click "Scan Library" to find duplicate and near-duplicate photos.')
+        self.info_label.setWordWrap(True)
         self.info_label.setStyleSheet('color: #aaa; font-size: 11px; padding: 4px;')
         layout.addWidget(self.info_label)
 
@@ -109,6 +117,20 @@ class DuplicatesTab(QWidget):
 
     # ── Scanning ─────────────────────────────────────────────────
 
+    def load_saved_groups(self):
+        """Show the duplicate groups kept up to date at import, without rescanning."""
+        try:
+            groups = self.controller.db.get_duplicate_groups()
+        except Exception as e:
+            print(f'[Duplicates] Could not load saved groups: {e}')
+            return
+        self._on_scan_done(groups, save=False)
+        if not groups:
+            self.info_label.setText(
+                'No duplicates recorded. New imports are checked automatically; '
+                'click "Scan Library" to check photos imported earlier.'
+            )
+
     def _scan(self):
         self.scan_btn.setEnabled(False)
         self.info_label.setText('Scanning...')
@@ -119,8 +141,13 @@ class DuplicatesTab(QWidget):
         self._thread.finished.connect(self._on_scan_done)
         self._thread.start()
 
-    def _on_scan_done(self, groups: list):
+    def _on_scan_done(self, groups: list, save: bool = True):
         self.scan_btn.setEnabled(True)
+        if save:
+            try:
+                self.controller.db.replace_duplicate_groups(groups)
+            except Exception as e:
+                print(f'[Duplicates] Could not save groups: {e}')
         self._groups = groups
         self._keep_selections.clear()
         self._render_groups()
@@ -278,7 +305,7 @@ class DuplicatesTab(QWidget):
         self.result_label.setText(f'Deleted {deleted} files. {errors} errors.')
         if self.controller.statusBar():
             self.controller.statusBar().showMessage(f'Deleted {deleted} duplicate files.', 4000)
-        self._scan()  # Re-scan
+        self.load_saved_groups()  # Deleted rows drop out of their groups
 
     def _mark_reviewed(self):
         """Hide these groups from future scans by tagging photos."""
@@ -291,6 +318,12 @@ class DuplicatesTab(QWidget):
                         self.controller.db.update_photo_metadata(photo['id'], {'tags': new_tags})
                 except Exception:
                     pass
+        try:
+            self.controller.db.remove_from_duplicate_groups(
+                p['id'] for group in self._groups for p in group
+            )
+        except Exception as e:
+            print(f'[Duplicates] Could not clear reviewed groups: {e}')
         self.result_label.setText(f'Marked {len(self._groups)} groups as reviewed.')
         self._groups = []
         self._render_groups()
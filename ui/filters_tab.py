@@ -14,6 +14,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import QSize
 from core.icons import icon as _icon
+from core.database import PhotoFilter
 
 
 class FiltersTab(QWidget):
@@ -143,6 +144,37 @@ class FiltersTab(QWidget):
 
         layout.addLayout(btn_row)
 
+    def build_filter(self) -> PhotoFilter:
+        """Return a PhotoFilter describing the current widget state."""
+        def _combo(w):
+            v = w.currentText()
+            return '' if v in ('', '(Any)') else v
+
+        statuses = [
+            status for cb, status in (
+                (self.filter_raw, 'raw'),
+                (self.filter_needs_edit, 'needs_edit'),
+                (self.filter_ready, 'ready'),
+                (self.filter_released, 'released'),
+            ) if cb.isChecked()
+        ]
+        return PhotoFilter(
+            statuses=statuses,
+            unanalyzed_only=self.filter_unknowns.isChecked(),
+            released_instagram=self.filter_ig.isChecked(),
+            released_tiktok=self.filter_tiktok.isChecked(),
+            scene_type=_combo(self.filter_scene),
+            mood=_combo(self.filter_mood),
+            subjects=_combo(self.filter_subjects),
+            location=self.filter_location.text().strip(),
+            package=self.filter_package.text().strip(),
+            quality=_combo(self.filter_quality),
+            tag=self.filter_tag.text().strip(),
+            content_rating=_combo(self.filter_content_rating),
+            has_exif=self.filter_has_exif.isChecked(),
+            has_gps=self.filter_has_gps.isChecked(),
+        )
+
     def apply_filters(self):
         """Delegate filter application to the main controller."""
         if hasattr(self.controller, 'apply_filters'):
@@ -3,14 +3,18 @@ Gallery tab UI for PhotoFlow.
 Grid view with quality badges, search, EXIF details panel, and caption generator.
 """
 import os
+from collections import OrderedDict
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
-    QPushButton, QScrollArea, QGridLayout, QSplitter,
-    QLineEdit, QMessageBox, QFrame, QTextEdit, QGroupBox,
-    QFormLayout, QMenu, QCompleter,
+    QPushButton, QScrollArea, QSplitter, QListView,
+    QLineEdit, QMessageBox, QTextEdit, QGroupBox,
+    QFormLayout, QMenu, QCompleter, QStyledItemDelegate, QStyle,
 )
-from PyQt6.QtCore import Qt, QTimer, QSize, QStringListModel
-from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont, QAction
+from PyQt6.QtCore import (
+    Qt, QTimer, QSize, QRect, QEvent, QStringListModel,
+    QAbstractListModel, QModelIndex, pyqtSignal,
+)
+from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont, QPen, QAction
 from core.icons import icon as _icon
 
 
@@ -22,24 +26,211 @@ _QUALITY_BADGE = {
 }
 
 
+_HEADER_HEIGHT = 28
+_INFO_HEIGHT = 30       # two lines of 9px caption text under each thumbnail
+_CELL_PADDING = 6
+
+
+class _GalleryModel(QAbstractListModel):
+    """Flat list model of gallery cells: photos interleaved with group headers.
+
+    Thumbnails are fetched through ``thumbnail_provider`` whenever the
+    delegate paints a cell.  A provider may return None while it builds
+    the thumbnail in the background; the cell shows a placeholder until
+    :meth:`on_thumbnail_ready` repaints it.
+    """
+
+    PhotoRole = Qt.ItemDataRole.UserRole + 1
+    HeaderRole = Qt.ItemDataRole.UserRole + 2
+
+    def __init__(self, thumbnail_provider, parent=None):
+        super().__init__(parent)
+        self._thumbnail_provider = thumbnail_provider
+        self._rows: list[tuple[str, object]] = []   # ('photo', dict) | ('header', (label, count))
+        self._photo_rows: dict[int, int] = {}
+        self._path_rows: dict[str, list] = {}
+        self.thumb_size = 190
+
+    def set_rows(self, rows: list, thumb_size: int):
+        self.beginResetModel()
+        self._rows = rows
+        self._photo_rows = {
+            payload['id']: i for i, (kind, payload) in enumerate(rows) if kind == 'photo'
+        }
+        self._path_rows = {}
+        for i, (kind, payload) in enumerate(rows):
+            if kind == 'photo' and payload.get('filepath'):
+                self._path_rows.setdefault(payload['filepath'], []).append(i)
+        self.thumb_size = thumb_size
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        if self._rows[index.row()][0] == 'header':
+            return Qt.ItemFlag.ItemIsEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        kind, payload = self._rows[index.row()]
+        if kind == 'header':
+            if role == self.HeaderRole:
+                return payload
+            if role == Qt.ItemDataRole.DisplayRole:
+                return payload[0]
+            return None
+        if role == self.PhotoRole:
+            return payload
+        if role == Qt.ItemDataRole.DisplayRole:
+            scene = (payload.get('scene_type') or payload.get('type_of_shot') or '').replace('_', ' ')[:14]
+            status = payload.get('status') or ''
+            info = f"ID:{payload['id']}"
+            if scene:
+                info += f'  {scene}'
+            if status:
+                info += f'\n{status}'
+            return info
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return payload.get('filename') or ''
+        return None
+
+    def photo_at(self, index) -> dict | None:
+        if not index.isValid():
+            return None
+        kind, payload = self._rows[index.row()]
+        return payload if kind == 'photo' else None
+
+    def index_for_photo(self, photo_id) -> QModelIndex:
+        row = self._photo_rows.get(photo_id)
+        return self.index(row) if row is not None else QModelIndex()
+
+    def photos(self) -> list:
+        return [payload for kind, payload in self._rows if kind == 'photo']
+
+    def thumbnail(self, photo: dict):
+        """Return a QPixmap, or a placeholder string when no preview exists (yet).
+
+        Pixmaps are not kept here: the provider reads the shared
+        ThumbnailCache, which bounds their memory and rebuilds them once the
+        row's ``file_mtime_ns`` changes.
+        """
+        fp = photo.get('filepath')
+        if not fp:
+            return '[Missing]'
+        # The stored mtime versions the cached pixmap; no stat while painting.
+        result = self._thumbnail_provider(fp, self.thumb_size, photo.get('file_mtime_ns'))
+        if result is None:
+            return 'Loading…'  # being built: asked again on the next paint
+        if isinstance(result, QPixmap) and result.isNull():
+            return '[No Preview]'
+        return result
+
+    def on_thumbnail_ready(self, filepath: str, size: int):
+        """Repaint the cells showing ``filepath`` once its thumbnail has been built."""
+        if size != self.thumb_size:
+            return
+        for row in self._path_rows.get(filepath, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class _GalleryDelegate(QStyledItemDelegate):
+    """Paints thumbnail cells and full-width group headers."""
+
+    def __init__(self, tab):
+        super().__init__(tab)
+        self._tab = tab
+
+    def sizeHint(self, option, index):
+        model = index.model()
+        if index.data(_GalleryModel.HeaderRole) is not None:
+            view = self._tab.gallery_view
+            width = view.viewport().width() - 2 * view.spacing() - 1
+            return QSize(max(width, 1), _HEADER_HEIGHT)
+        size = model.thumb_size
+        return QSize(size + _CELL_PADDING, size + _CELL_PADDING + _INFO_HEIGHT)
+
+    def paint(self, painter, option, index):
+        header = index.data(_GalleryModel.HeaderRole)
+        painter.save()
+        if header is not None:
+            label, count = header
+            font = QFont(option.font)
+            font.setBold(True)
+            painter.setFont(font)
+            painter.setPen(option.palette.color(option.palette.ColorRole.Text))
+            rect = option.rect.adjusted(4, 6, -4, -2)
+            painter.drawText(rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, label)
+            label_w = painter.fontMetrics().horizontalAdvance(label)
+            small = QFont(option.font)
+            small.setPixelSize(11)
+            painter.setFont(small)
+            painter.setPen(QColor('#888'))
+            painter.drawText(
+                rect.adjusted(label_w + 8, 0, 0, 0),
+                Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                f'{count} photo{"s" if count != 1 else ""}',
+            )
+            painter.restore()
+            return
+
+        model = index.model()
+        photo = model.photo_at(index)
+        size = model.thumb_size
+        cell = option.rect
+        selected = (
+            photo['id'] == self._tab.selected_gallery_photo_id
+            or bool(option.state & QStyle.StateFlag.State_Selected)
+        )
+        painter.setPen(QPen(QColor('#3da5ff') if selected else QColor('#555'), 2 if selected else 1))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRect(cell.adjusted(1, 1, -1, -1))
+
+        img_rect = QRect(cell.x() + _CELL_PADDING // 2, cell.y() + _CELL_PADDING // 2, size, size)
+        thumb = model.thumbnail(photo)
+        if isinstance(thumb, QPixmap):
+            scaled = thumb.size().scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio)
+            target = QRect(0, 0, scaled.width(), scaled.height())
+            target.moveCenter(img_rect.center())
+            painter.drawPixmap(target, thumb)
+            quality = photo.get('quality', '')
+            if quality in _QUALITY_BADGE:
+                _paint_quality_badge(painter, img_rect, quality)
+        else:
+            painter.setPen(QColor('#aaa'))
+            painter.drawText(img_rect, Qt.AlignmentFlag.AlignCenter, thumb)
+
+        info_rect = QRect(cell.x(), img_rect.bottom() + 2, cell.width(), _INFO_HEIGHT)
+        font = QFont(option.font)
+        font.setPixelSize(9)
+        painter.setFont(font)
+        painter.setPen(QColor('#ccc'))
+        painter.drawText(info_rect, Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignTop,
+                         index.data(Qt.ItemDataRole.DisplayRole) or '')
+        painter.restore()
+
+
 class GalleryTab(QWidget):
     """Gallery grid with detail panel and search."""
 
-    PAGE_SIZE = 200  # thumbnails rendered per page
+    # kind ('caption' | 'alt_text'), Future, photo id, result, error; see _submit_ai.
+    _ai_done = pyqtSignal(str, object, int, object, object)
 
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
+        self._ai_requests = {}  # kind -> Future of the pending AI request
+        self._ai_done.connect(self._on_ai_done)
         self.current_gallery_photo_id = None
         self.selected_gallery_photo_id = None
-        self._thumbnail_frames = {}
         self._all_photos = []
         self._display_photos = []
-        self._pending_photos = []   # photos not yet rendered (pagination)
-        self._rendered_count = 0    # how many thumbnails are currently in the grid
-        self._render_limit = self.PAGE_SIZE
         self._current_thumb_size = 190
-        self._current_columns = 4
         self._resize_timer = QTimer(self)
         self._resize_timer.setSingleShot(True)
         self._resize_timer.timeout.connect(self._on_resize_debounced)
@@ -106,26 +297,37 @@ class GalleryTab(QWidget):
         # ── Main splitter ────────────────────────────────────────
         splitter = QSplitter(Qt.Orientation.Horizontal)
 
-        # Grid
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        self.gallery_container = QWidget()
-        self.gallery_grid = QGridLayout(self.gallery_container)
-        self.gallery_grid.setSpacing(8)
-        self.gallery_grid.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-        scroll.setWidget(self.gallery_container)
-
-        # "Load More" button below the grid (hidden when not needed)
-        grid_outer = QWidget()
-        grid_vbox = QVBoxLayout(grid_outer)
-        grid_vbox.setContentsMargins(0, 0, 0, 0)
-        grid_vbox.setSpacing(4)
-        grid_vbox.addWidget(scroll)
-        self._load_more_btn = QPushButton('Load More...')
-        self._load_more_btn.setVisible(False)
-        self._load_more_btn.clicked.connect(self._load_next_page)
-        grid_vbox.addWidget(self._load_more_btn)
-        splitter.addWidget(grid_outer)
+        # Grid — virtualized: only visible cells are painted
+        self.gallery_model = _GalleryModel(self._load_thumbnail, self)
+        self.gallery_view = QListView()
+        self.gallery_view.setViewMode(QListView.ViewMode.IconMode)
+        self.gallery_view.setFlow(QListView.Flow.LeftToRight)
+        self.gallery_view.setWrapping(True)
+        self.gallery_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.gallery_view.setMovement(QListView.Movement.Static)
+        self.gallery_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.gallery_view.setBatchSize(500)
+        self.gallery_view.setSpacing(4)
+        self.gallery_view.setUniformItemSizes(False)  # group headers span the row
+        self.gallery_view.setSelectionMode(QListView.SelectionMode.SingleSelection)
+        self.gallery_view.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.gallery_view.setModel(self.gallery_model)
+        self.gallery_view.setItemDelegate(_GalleryDelegate(self))
+        self.gallery_view.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.gallery_view.clicked.connect(self._on_index_clicked)
+        self.gallery_view.doubleClicked.connect(self._on_index_double_clicked)
+        self.gallery_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.gallery_view.customContextMenuRequested.connect(self._on_view_context_menu)
+        self.gallery_view.viewport().installEventFilter(self)
+        service = getattr(self.controller, 'thumbnail_service', None)
+        if service is not None:
+            service.thumbnail_ready.connect(self.gallery_model.on_thumbnail_ready)
+            # Queued thumbnails of cells scrolled out of view are dropped.
+            self.gallery_view.verticalScrollBar().valueChanged.connect(
+                lambda _value: service.viewport_changed('gallery')
+            )
+            self.gallery_model.modelReset.connect(lambda: service.viewport_changed('gallery'))
+        splitter.addWidget(self.gallery_view)
 
         # Details panel
         self._detail_panel = self._build_detail_panel()
@@ -135,6 +337,14 @@ class GalleryTab(QWidget):
         splitter.setCollapsible(1, True)
         layout.addWidget(splitter)
 
+    def _load_thumbnail(self, filepath: str, size: int, version=None):
+        request = getattr(self.controller, 'request_thumbnail', None)
+        if request is not None:
+            return request(filepath, size, 'gallery', version)
+        if not os.path.exists(filepath):
+            return '[Missing]'
+        return self.controller.get_cached_thumbnail(filepath, size, version) or '[No Preview]'
+
     def _build_detail_panel(self) -> QWidget:
         panel = QWidget()
         panel.setMinimumWidth(0)
@@ -335,13 +545,7 @@ class GalleryTab(QWidget):
         else:
             self.refresh_with_photos(self._all_photos)
 
-    def refresh_with_photos(self, photos, preserve_limit: bool = False):
-        self._thumbnail_frames = {}
-        while self.gallery_grid.count():
-            item = self.gallery_grid.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-
+    def refresh_with_photos(self, photos):
         sort_by = self.gallery_sort.currentText()
         if sort_by == 'Date (newest)':
             photos = sorted(photos, key=lambda p: str(p.get('exif_date_taken') or p.get('date_created') or ''), reverse=True)
@@ -357,57 +561,31 @@ class GalleryTab(QWidget):
         elif sort_by == 'Scene':
             photos = sorted(photos, key=lambda p: p.get('scene_type') or '')
 
-        # Pagination must use the same sorted order that is rendered.
         self._display_photos = list(photos)
 
         size_map = {'Small': 140, 'Medium': 190, 'Large': 240}
         self._current_thumb_size = size_map[self.gallery_size.currentText()]
 
-        scroll_width = self.gallery_container.parent().width() if self.gallery_container.parent() else 800
-        cell_width = self._current_thumb_size + self.gallery_grid.spacing() + 10
-        self._current_columns = max(1, scroll_width // cell_width)
-
         group_by = self.gallery_group.currentText()
-        if preserve_limit and self._rendered_count > 0:
-            self._render_limit = max(self.PAGE_SIZE, self._rendered_count)
-        else:
-            self._render_limit = self.PAGE_SIZE
-        self._render_current_page(group_by)
-
-    def _render_current_page(self, group_by: str):
-        """Render the currently visible page from the stored sorted photo list."""
-        while self.gallery_grid.count():
-            item = self.gallery_grid.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-
-        visible = self._display_photos[:self._render_limit]
-        self._pending_photos = self._display_photos[self._render_limit:]
         if group_by == 'None':
-            self._render_flat(visible, self._current_thumb_size, self._current_columns)
+            rows = [('photo', p) for p in self._display_photos]
         else:
-            self._render_grouped(visible, self._current_thumb_size, self._current_columns, group_by)
+            groups: dict[str, list] = OrderedDict()
+            for p in self._display_photos:
+                groups.setdefault(self._group_key(p, group_by), []).append(p)
+            rows = []
+            for group_label, group_photos in groups.items():
+                rows.append(('header', (group_label, len(group_photos))))
+                rows.extend(('photo', p) for p in group_photos)
+
+        self.gallery_model.set_rows(rows, self._current_thumb_size)
+        if self.selected_gallery_photo_id is not None:
+            idx = self.gallery_model.index_for_photo(self.selected_gallery_photo_id)
+            if idx.isValid():
+                self.gallery_view.setCurrentIndex(idx)
 
-        self._rendered_count = len(visible)
-        remaining = len(self._pending_photos)
         total = len(self._display_photos)
-        shown = self._rendered_count
-        if remaining > 0:
-            self._load_more_btn.setText(f'Load {min(self.PAGE_SIZE, remaining)} more  ({shown} of {total} shown)')
-            self._load_more_btn.setVisible(True)
-        else:
-            self._load_more_btn.setVisible(False)
-
-        self.photo_count_label.setText(f'{shown} / {total} photo{"s" if total != 1 else ""}')
-        self._update_thumbnail_selection_styles()
-
-    def _load_next_page(self):
-        """Increase the visible slice and rebuild safely.
-
-        Rebuilding avoids row/header collisions in grouped mode.
-        """
-        self._render_limit += self.PAGE_SIZE
-        self._render_current_page(self.gallery_group.currentText())
+        self.photo_count_label.setText(f'{total} photo{"s" if total != 1 else ""}')
 
     def _group_key(self, photo: dict, group_by: str) -> str:
         if group_by == 'By Date':
@@ -421,105 +599,45 @@ class GalleryTab(QWidget):
             return (photo.get('quality') or 'Unscored').title()
         return ''
 
-    def _render_flat(self, photos, thumb_size, columns):
-        for idx, photo in enumerate(photos):
-            thumb = self._create_thumbnail(photo, thumb_size)
-            self.gallery_grid.addWidget(thumb, idx // columns, idx % columns)
-
-    def _render_grouped(self, photos, thumb_size, columns, group_by):
-        from collections import OrderedDict
-        groups: dict[str, list] = OrderedDict()
-        for p in photos:
-            key = self._group_key(p, group_by)
-            groups.setdefault(key, []).append(p)
-
-        grid_row = 0
-        for group_label, group_photos in groups.items():
-            # Section header spanning all columns
-            header = QLabel(f'<b>{group_label}</b>  <span style="color:#888;font-size:11px;">{len(group_photos)} photo{"s" if len(group_photos)!=1 else ""}</span>')
-            header.setTextFormat(Qt.TextFormat.RichText)
-            header.setStyleSheet('padding: 6px 4px 2px 4px; background: transparent;')
-            self.gallery_grid.addWidget(header, grid_row, 0, 1, columns)
-            grid_row += 1
-
-            for idx, photo in enumerate(group_photos):
-                thumb = self._create_thumbnail(photo, thumb_size)
-                self.gallery_grid.addWidget(thumb, grid_row + idx // columns, idx % columns)
-            grid_row += (len(group_photos) + columns - 1) // columns
-
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        # Debounce: reflow grid 150ms after resize stops
+        # Debounce: re-measure full-width group headers 150ms after resize stops
         self._resize_timer.start(150)
 
     def _on_resize_debounced(self):
-        if self._all_photos:
-            q = self.search_edit.text().strip()
-            if q:
-                ql = q.lower()
-                filtered = [
-                    p for p in self._all_photos
-                    if any(ql in str(p.get(f) or '').lower() for f in (
-                        'filename', 'ai_caption', 'suggested_hashtags', 'tags',
-                        'objects_detected', 'location', 'subjects', 'scene_type',
-                        'mood', 'notes', 'exif_camera',
-                    ))
-                ]
-                self.refresh_with_photos(filtered, preserve_limit=True)
-            else:
-                self.refresh_with_photos(self._all_photos, preserve_limit=True)
-
-    # ── Thumbnail creation ───────────────────────────────────────
-
-    def _create_thumbnail(self, photo, size):
-        frame = QFrame()
-        frame.setFrameStyle(QFrame.Shape.Box | QFrame.Shadow.Raised)
-        frame.setLineWidth(2)
-        frame.setCursor(Qt.CursorShape.PointingHandCursor)
-        frame.setProperty('photo_id', photo['id'])
-        self._thumbnail_frames[photo['id']] = frame
-
-        vl = QVBoxLayout(frame)
-        vl.setContentsMargins(3, 3, 3, 3)
-        vl.setSpacing(2)
-
-        img_label = QLabel()
-        img_label.setFixedSize(size, size)
-        img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-        if photo.get('filepath') and os.path.exists(photo['filepath']):
-            pix = self.controller.get_cached_thumbnail(photo['filepath'], size)
-            if pix and not pix.isNull():
-                # Overlay quality badge
-                quality = photo.get('quality', '')
-                if quality in _QUALITY_BADGE:
-                    pix = _add_quality_badge(pix, quality, size)
-                img_label.setPixmap(pix)
-            else:
-                img_label.setText('[No Preview]')
-        else:
-            img_label.setText('[Missing]')
-        vl.addWidget(img_label)
-
-        # Info row
-        scene = (photo.get('scene_type') or photo.get('type_of_shot') or '').replace('_', ' ')[:14]
-        status = photo.get('status') or ''
-        info = f"ID:{photo['id']}"
-        if scene:
-            info += f'  {scene}'
-        if status:
-            info += f'\n{status}'
+        if self.gallery_group.currentText() != 'None':
+            self.gallery_view.doItemsLayout()
+
+    # ── Thumbnail interaction ────────────────────────────────────
+
+    def eventFilter(self, obj, event):
+        if (obj is self.gallery_view.viewport()
+                and event.type() == QEvent.Type.MouseButtonPress
+                and event.button() == Qt.MouseButton.MiddleButton):
+            photo = self.gallery_model.photo_at(self.gallery_view.indexAt(event.position().toPoint()))
+            if photo:
+                self._handle_click(event, photo)
+                return True
+        return super().eventFilter(obj, event)
+
+    def _on_index_clicked(self, index):
+        photo = self.gallery_model.photo_at(index)
+        if photo:
+            self.selected_gallery_photo_id = photo['id']
+            self.show_details(photo)
 
-        info_lbl = QLabel(info)
-        info_lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        info_lbl.setStyleSheet('font-size: 9px; color: #ccc;')
-        vl.addWidget(info_lbl)
+    def _on_index_double_clicked(self, index):
+        photo = self.gallery_model.photo_at(index)
+        if photo:
+            try:
+                self.controller.show_full_image(photo.get('filepath', ''), photo['id'])
+            except Exception as e:
+                print(f'gallery double-click error: {e}')
 
-        frame.mousePressEvent = lambda ev, p=photo: self._handle_click(ev, p)
-        frame.mouseDoubleClickEvent = lambda ev, p=photo: self._handle_double_click(ev, p)
-        frame.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        frame.customContextMenuRequested.connect(lambda pos, p=photo: self._thumb_context_menu(pos, p, frame))
-        return frame
+    def _on_view_context_menu(self, pos):
+        photo = self.gallery_model.photo_at(self.gallery_view.indexAt(pos))
+        if photo:
+            self._thumb_context_menu(pos, photo, self.gallery_view.viewport())
 
     def _handle_click(self, event, photo):
         try:
@@ -532,19 +650,10 @@ class GalleryTab(QWidget):
             if event.button() == Qt.MouseButton.LeftButton:
                 self.selected_gallery_photo_id = photo['id']
                 self.show_details(photo)
-                self._update_thumbnail_selection_styles()
                 event.accept()
         except Exception as e:
             print(f'gallery click error: {e}')
 
-    def _handle_double_click(self, event, photo):
-        try:
-            if event.button() == Qt.MouseButton.LeftButton:
-                self.controller.show_full_image(photo.get('filepath', ''), photo['id'])
-                event.accept()
-        except Exception as e:
-            print(f'gallery double-click error: {e}')
-
     def _thumb_context_menu(self, pos, photo, frame):
         menu = QMenu(frame)
         menu.addAction('Open Full Size').triggered.connect(
@@ -558,12 +667,7 @@ class GalleryTab(QWidget):
         menu.exec(frame.mapToGlobal(pos))
 
     def _update_thumbnail_selection_styles(self):
-        selected = self.selected_gallery_photo_id
-        for photo_id, frame in self._thumbnail_frames.items():
-            if photo_id == selected:
-                frame.setStyleSheet('QFrame { border: 2px solid #3da5ff; }')
-            else:
-                frame.setStyleSheet('')
+        self.gallery_view.viewport().update()
 
     # ── Details panel ────────────────────────────────────────────
 
@@ -737,22 +841,71 @@ class GalleryTab(QWidget):
             QMessageBox.warning(self, 'Caption', 'Photo file not found.')
             return
         try:
+            import functools
             from core.ai_analyzer import analyze_image
-            metadata = analyze_image(fp, self.controller.db)
-            caption = metadata.get('ai_caption', '')
-            hashtags = metadata.get('suggested_hashtags', '')
+            self._submit_ai('caption', functools.partial(analyze_image, raise_errors=True), fp)
+            if self.controller.statusBar():
+                self.controller.statusBar().showMessage('Generating caption…')
+        except Exception as e:
+            QMessageBox.warning(self, 'Caption Error', str(e))
+
+    def _submit_ai(self, kind, fn, *args):
+        """Run ``fn(*args, db)`` through the shared AI scheduler at interactive priority.
+
+        Interactive requests go ahead of any running import or re-analysis.
+        A newer request of the same kind cancels one that is still queued.
+        The result is delivered on the GUI thread through ``_ai_done``.
+        """
+        from core.analyzer_service import INTERACTIVE, configured_concurrency, get_scheduler
+        previous = self._ai_requests.pop(kind, None)
+        if previous is not None:
+            previous.cancel()
+        db = self.controller.db
+        photo_id = self.current_gallery_photo_id
+        future = get_scheduler(db.db_path, configured_concurrency(db)).submit_call(
+            fn, *args, priority=INTERACTIVE)
+        self._ai_requests[kind] = future
+
+        def done(f):
+            # Runs on a scheduler thread; the signal hands over to the GUI thread.
+            if not f.cancelled():
+                self._ai_done.emit(kind, f, photo_id, f.result() if f.exception() is None else None,
+                                   f.exception())
+        future.add_done_callback(done)
+
+    def _on_ai_done(self, kind, future, photo_id, result, error):
+        # An older request that was already running when it was superseded
+        # must not drop the newer one, or the next click could not cancel it.
+        if self._ai_requests.get(kind) is future:
+            del self._ai_requests[kind]
+        status = self.controller.statusBar()
+        if error is not None:
+            if status:
+                status.clearMessage()
+            title = 'Caption Error' if kind == 'caption' else 'Alt Text Error'
+            QMessageBox.warning(self, title, str(error))
+            return
+        # The result is stored even if another photo has been selected meanwhile.
+        current = photo_id == self.current_gallery_photo_id
+        if kind == 'caption':
+            caption = result.get('ai_caption', '')
+            hashtags = result.get('suggested_hashtags', '')
             if caption:
-                self.gallery_caption.setPlainText(caption)
                 self.controller.db.update_photo_metadata(
-                    self.current_gallery_photo_id,
-                    {'ai_caption': caption, 'suggested_hashtags': hashtags}
+                    photo_id, {'ai_caption': caption, 'suggested_hashtags': hashtags}
                 )
-            if hashtags:
+                if current:
+                    self.gallery_caption.setPlainText(caption)
+            if hashtags and current:
                 self.gallery_hashtags.setText(hashtags)
-            if self.controller.statusBar():
-                self.controller.statusBar().showMessage('Caption generated.', 3000)
-        except Exception as e:
-            QMessageBox.warning(self, 'Caption Error', str(e))
+            message = 'Caption generated.'
+        else:
+            self.controller.db.update_photo_metadata(photo_id, {'alt_text': result})
+            if current:
+                self.gallery_alt_text.setText(result)
+            message = 'Alt text generated.'
+        if status:
+            status.showMessage(message, 3000)
 
     # ── Alt text generator ───────────────────────────────────────
 
@@ -774,29 +927,12 @@ class GalleryTab(QWidget):
             QMessageBox.warning(self, 'Alt Text', 'Photo file not found.')
             return
         try:
-            import ollama
-            creds = self.controller.db.get_credentials('ollama') or {}
-            model = creds.get('model') or 'llava:latest'
-            with open(fp, 'rb') as fh:
-                img_bytes = fh.read()
-            resp = ollama.chat(
-                model=model,
-                messages=[{
-                    'role': 'user',
-                    'content': (
-                        'In one concise sentence (under 125 characters), describe this image '
-                        'for a screen reader. Focus on the main subject and action.'
-                    ),
-                    'images': [img_bytes],
-                }],
-            )
-            alt = resp['message']['content'].strip()
-            self.gallery_alt_text.setText(alt)
-            self.controller.db.update_photo_metadata(
-                self.current_gallery_photo_id, {'alt_text': alt}
-            )
+            from core import ai_analyzer
+            if ai_analyzer.ollama is None:
+                raise ImportError('ollama')
+            self._submit_ai('alt_text', ai_analyzer.generate_alt_text, fp)
             if self.controller.statusBar():
-                self.controller.statusBar().showMessage('Alt text generated.', 3000)
+                self.controller.statusBar().showMessage('Generating alt text…')
         except ImportError:
             QMessageBox.warning(self, 'Alt Text', 'ollama package not installed.')
         except Exception as e:
@@ -879,18 +1015,17 @@ class GalleryTab(QWidget):
             self.gallery_size.setCurrentText(size_label)
 
 
-def _add_quality_badge(pix: QPixmap, quality: str, size: int) -> QPixmap:
-    """Overlay a small quality badge in the top-right corner of a thumbnail."""
+def _paint_quality_badge(painter: QPainter, img_rect: QRect, quality: str) -> None:
+    """Paint a small quality badge in the top-right corner of a thumbnail cell."""
     color, label = _QUALITY_BADGE.get(quality, ('#888', ''))
     if not label:
-        return pix
-    result = QPixmap(pix)
-    painter = QPainter(result)
+        return
+    painter.save()
     painter.setRenderHint(QPainter.RenderHint.Antialiasing)
     badge_w, badge_h = 56, 14
     margin = 3
-    x = size - badge_w - margin
-    y = margin
+    x = img_rect.right() - badge_w - margin
+    y = img_rect.top() + margin
     painter.setBrush(QColor(color))
     painter.setPen(Qt.PenStyle.NoPen)
     painter.drawRoundedRect(x, y, badge_w, badge_h, 4, 4)
@@ -900,5 +1035,4 @@ def _add_quality_badge(pix: QPixmap, quality: str, size: int) -> QPixmap:
     font.setBold(True)
     painter.setFont(font)
     painter.drawText(x, y, badge_w, badge_h, Qt.AlignmentFlag.AlignCenter, label)
-    painter.end()
-    return result
+    painter.restore()
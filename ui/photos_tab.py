@@ -3,7 +3,6 @@ Photos/Library tab extracted from the monolithic main window.
 """
 import os
 import json
-from pathlib import Path
 from PyQt6.QtWidgets import (
     QWidget,
     QVBoxLayout,
@@ -12,19 +11,334 @@ from PyQt6.QtWidgets import (
     QComboBox,
     QPushButton,
     QLineEdit,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QMessageBox,
     QInputDialog,
     QHeaderView,
     QAbstractItemView,
-    QCheckBox,
+    QStyledItemDelegate,
+    QApplication,
 )
-from PyQt6.QtCore import Qt, QSize, QTimer
-from PyQt6.QtGui import QPixmap, QKeySequence, QShortcut
+from PyQt6.QtCore import (
+    Qt, QSize, QTimer, QRect, QAbstractTableModel, QModelIndex, QSortFilterProxyModel,
+)
+from PyQt6.QtGui import QPixmap, QColor, QKeySequence, QShortcut
 from core.icons import icon as _icon
 
 
+_STATUS_LABELS = {'raw': 'Unreviewed', 'needs_edit': 'Editing', 'ready': 'Ready', 'released': 'Published'}
+# Accept both current and legacy display names when a status cell is edited.
+_STATUS_VALUES = {
+    'Unreviewed': 'raw', 'Editing': 'needs_edit', 'Ready': 'ready', 'Published': 'released',
+    'Raw': 'raw', 'Needs Edit': 'needs_edit', 'Ready for Release': 'ready', 'Released': 'released',
+}
+
+_SEARCH_FIELDS = (
+    'filename', 'ai_caption', 'suggested_hashtags', 'tags',
+    'objects_detected', 'location', 'subjects', 'scene_type',
+    'mood', 'notes', 'exif_camera', 'package_name',
+)
+
+
+class _LibraryModel(QAbstractTableModel):
+    """Table model over lightweight Library rows from ``get_library_rows``.
+
+    Cells are computed on demand from the row dicts, so populating the table
+    costs one list assignment and painting cost scales with the visible rows.
+    Thumbnails are fetched through ``thumbnail_provider`` as cells are
+    painted; a provider returning None is still building the thumbnail and
+    :meth:`on_thumbnail_ready` repaints the cell when it lands.  Edits are
+    handed to ``commit_edit(photo_id, field, value)``.
+    """
+
+    SortRole = Qt.ItemDataRole.UserRole + 1
+
+    HEADERS = [
+        "", "ID", "Thumbnail", "Scene", "Mood", "Subjects", "Location", "Objects",
+        "Status", "IG", "TikTok", "Package", "Tags", "Date Created", "Filepath", "Notes",
+    ]
+
+    def __init__(self, checked_ids: set, thumbnail_provider, commit_edit, parent=None):
+        super().__init__(parent)
+        self._checked = checked_ids
+        self._thumbnail_provider = thumbnail_provider
+        self._commit_edit = commit_edit
+        self._rows: list[dict] = []
+        self._row_of: dict[int, int] = {}
+        self._path_rows: dict[str, list] = {}  # filepath -> source rows showing it
+        self.thumb_size = 100
+        self._text_fields = {
+            PhotosTab.COL_SCENE: 'scene_type',
+            PhotosTab.COL_MOOD: 'mood',
+            PhotosTab.COL_SUBJECTS: 'subjects',
+            PhotosTab.COL_LOCATION: 'location',
+            PhotosTab.COL_OBJECTS: 'objects_detected',
+            PhotosTab.COL_TAGS: 'tags',
+            PhotosTab.COL_FILEPATH: 'filepath',
+            PhotosTab.COL_NOTES: 'notes',
+        }
+        self._release_fields = {
+            PhotosTab.COL_IG: 'released_instagram',
+            PhotosTab.COL_TIKTOK: 'released_tiktok',
+        }
+
+    # ── Row management ──────────────────────────────────────────────────
+
+    def set_rows(self, rows: list):
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._row_of = {row['id']: i for i, row in enumerate(self._rows)}
+        self._path_rows = {}
+        for i, row in enumerate(self._rows):
+            self._index_path(i, row)
+        self.endResetModel()
+
+    def _index_path(self, i: int, row: dict):
+        if row.get('filepath'):
+            self._path_rows.setdefault(row['filepath'], []).append(i)
+
+    def _unindex_path(self, i: int, row: dict):
+        rows = self._path_rows.get(row.get('filepath'))
+        if rows and i in rows:
+            rows.remove(i)
+            if not rows:
+                del self._path_rows[row['filepath']]
+
+    def upsert_rows(self, rows: list):
+        """Replace rows already present and append the others."""
+        new_rows = []
+        last_col = self.columnCount() - 1
+        for row in rows:
+            i = self._row_of.get(row['id'])
+            if i is None:
+                new_rows.append(row)
+                continue
+            if self._rows[i].get('filepath') != row.get('filepath'):
+                self._unindex_path(i, self._rows[i])
+                self._index_path(i, row)
+            self._rows[i] = row
+            self.dataChanged.emit(self.index(i, 0), self.index(i, last_col))
+        if new_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            for offset, row in enumerate(new_rows):
+                self._rows.append(row)
+                self._row_of[row['id']] = start + offset
+                self._index_path(start + offset, row)
+            self.endInsertRows()
+
+    def row_data(self, row: int) -> dict | None:
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def row_for_photo(self, photo_id) -> int | None:
+        return self._row_of.get(photo_id)
+
+    def photo_ids(self) -> list:
+        return [row['id'] for row in self._rows]
+
+    def set_thumb_size(self, size: int):
+        if size != self.thumb_size:
+            self.thumb_size = size
+            if self._rows:
+                col = PhotosTab.COL_THUMBNAIL
+                self.dataChanged.emit(self.index(0, col), self.index(len(self._rows) - 1, col))
+
+    def thumbnail(self, row: dict):
+        """Return a QPixmap, or a placeholder string when no preview exists (yet).
+
+        Pixmaps are not kept here: the provider reads the shared
+        ThumbnailCache, which bounds their memory and rebuilds them once the
+        row's ``file_mtime_ns`` changes.
+        """
+        fp = row.get('filepath')
+        if not fp:
+            return '[Missing]'
+        # The stored mtime versions the cached pixmap; no stat while painting.
+        result = self._thumbnail_provider(fp, self.thumb_size, row.get('file_mtime_ns'))
+        if result is None:
+            return 'Loading…'  # being built: asked again on the next paint
+        if isinstance(result, QPixmap) and result.isNull():
+            return '[No Preview]'
+        return result
+
+    def on_thumbnail_ready(self, filepath: str, size: int):
+        """Repaint the thumbnail cells of ``filepath`` once it has been built."""
+        if size != self.thumb_size:
+            return
+        col = PhotosTab.COL_THUMBNAIL
+        for i in self._path_rows.get(filepath, ()):
+            self.dataChanged.emit(self.index(i, col), self.index(i, col))
+
+    # ── Qt model interface ──────────────────────────────────────────────
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        col = index.column()
+        if col == PhotosTab.COL_CHECKBOX or col in self._release_fields:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        elif col in self._text_fields or col in (PhotosTab.COL_STATUS, PhotosTab.COL_PACKAGE):
+            if col != PhotosTab.COL_FILEPATH:
+                flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def _display(self, row: dict, col: int) -> str:
+        if col == PhotosTab.COL_ID:
+            return f"{row['id']:06d}"
+        if col in self._text_fields:
+            return row.get(self._text_fields[col]) or ''
+        if col == PhotosTab.COL_STATUS:
+            return _STATUS_LABELS.get(row.get('status') or 'raw', row.get('status') or '')
+        if col == PhotosTab.COL_PACKAGE:
+            return ', '.join(row.get('packages') or []) or (row.get('package_name') or '')
+        if col == PhotosTab.COL_DATE:
+            return str(row.get('date_created') or '').split('.')[0]
+        return ''
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        col = index.column()
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self._display(row, col)
+        if role == Qt.ItemDataRole.CheckStateRole:
+            if col == PhotosTab.COL_CHECKBOX:
+                checked = row['id'] in self._checked
+            elif col in self._release_fields:
+                checked = bool(row.get(self._release_fields[col]))
+            else:
+                return None
+            return Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked
+        if role == self.SortRole:
+            if col == PhotosTab.COL_ID:
+                return row['id']
+            if col == PhotosTab.COL_CHECKBOX:
+                return int(row['id'] in self._checked)
+            if col in self._release_fields:
+                return int(bool(row.get(self._release_fields[col])))
+            return self._display(row, col).lower()
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if col == PhotosTab.COL_FILEPATH:
+                return row.get('filepath') or 'No path'
+            if col == PhotosTab.COL_LOCATION:
+                return f"Location: {row.get('location') or 'Not set'}"
+            if col == PhotosTab.COL_THUMBNAIL:
+                return "Click to view full image (middle-click opens folder)"
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid():
+            return False
+        row = self._rows[index.row()]
+        col = index.column()
+        photo_id = row['id']
+        if role == Qt.ItemDataRole.CheckStateRole:
+            checked = Qt.CheckState(value) == Qt.CheckState.Checked
+            if col == PhotosTab.COL_CHECKBOX:
+                if checked:
+                    self._checked.add(photo_id)
+                else:
+                    self._checked.discard(photo_id)
+            elif col in self._release_fields:
+                field = self._release_fields[col]
+                self._commit_edit(photo_id, field, 1 if checked else 0)
+                row[field] = 1 if checked else 0
+            else:
+                return False
+            self.dataChanged.emit(index, index, [role])
+            return True
+        if role != Qt.ItemDataRole.EditRole:
+            return False
+
+        text = str(value or '')
+        if col == PhotosTab.COL_STATUS:
+            status = _STATUS_VALUES.get(text, text.lower().replace(' ', '_'))
+            self._commit_edit(photo_id, 'status', status)
+            row['status'] = status
+        elif col == PhotosTab.COL_PACKAGE:
+            packages = [p.strip() for p in text.split(',') if p.strip()]
+            self._commit_edit(photo_id, 'package_name', packages)
+            row['packages'] = packages
+            row['package_name'] = packages[0] if packages else ''
+        elif col in self._text_fields:
+            field = self._text_fields[col]
+            self._commit_edit(photo_id, field, text)
+            row[field] = text
+        else:
+            return False
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class _LibraryProxy(QSortFilterProxyModel):
+    """Sorts on ``_LibraryModel.SortRole`` and applies the quick-search query."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._query = ''
+        self.setSortRole(_LibraryModel.SortRole)
+
+    def set_query(self, query: str):
+        self._query = query
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._query:
+            return True
+        row = self.sourceModel().row_data(source_row)
+        return any(self._query in str(row.get(f) or '').lower() for f in _SEARCH_FIELDS)
+
+
+class _ThumbnailDelegate(QStyledItemDelegate):
+    """Paints the lazily loaded thumbnail for a Library row."""
+
+    def paint(self, painter, option, index):
+        self.initStyleOption(option, index)
+        style = option.widget.style() if option.widget else None
+        if style:
+            # Selection/background only; the cell carries no text.
+            style.drawPrimitive(style.PrimitiveElement.PE_PanelItemViewItem, option, painter, option.widget)
+        proxy = index.model()
+        model = proxy.sourceModel()
+        size = model.thumb_size
+        if size <= 0:
+            return
+        row = model.row_data(proxy.mapToSource(index).row())
+        if row is None:
+            return
+        thumb = model.thumbnail(row)
+        painter.save()
+        if isinstance(thumb, QPixmap):
+            scaled = thumb.size().scaled(
+                min(size, option.rect.width() - 4), min(size, option.rect.height() - 4),
+                Qt.AspectRatioMode.KeepAspectRatio,
+            )
+            target = QRect(0, 0, scaled.width(), scaled.height())
+            target.moveCenter(option.rect.center())
+            painter.drawPixmap(target, thumb)
+        else:
+            painter.setPen(QColor('#aaa'))
+            painter.drawText(option.rect, Qt.AlignmentFlag.AlignCenter, thumb)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        size = index.model().sourceModel().thumb_size
+        return QSize(size + 10, size + 10)
+
+
 class PhotosTab(QWidget):
     """Encapsulates the photos library table and batch operations."""
 
@@ -92,7 +406,7 @@ class PhotosTab(QWidget):
         reanalyze_btn = QPushButton()
         reanalyze_btn.setIcon(_icon('reanalyze'))
         reanalyze_btn.setIconSize(QSize(18, 18))
-        reanalyze_btn.setToolTip("Re-analyze selected photos with AI")
+        reanalyze_btn.setToolTip("Re-analyze selected photos with AI\n(Shift+click to ignore cached results)")
         reanalyze_btn.clicked.connect(self.reanalyze_selected)
         toolbar.addWidget(reanalyze_btn)
 
@@ -256,42 +570,46 @@ class PhotosTab(QWidget):
 
         layout.addLayout(toolbar)
 
-        # Table
-        self.photo_table = QTableWidget()
+        # Table: a model/view pair so only visible cells are ever materialised.
+        self.photo_model = _LibraryModel(
+            self.persistent_selected_ids,
+            self._load_thumbnail,
+            self._commit_cell_edit,
+            self,
+        )
+        self.photo_model.thumb_size = self.thumbnail_sizes[self.current_thumb_size]
+        self.photo_proxy = _LibraryProxy(self)
+        self.photo_proxy.setSourceModel(self.photo_model)
+
+        self.photo_table = QTableView()
+        self.photo_table.setModel(self.photo_proxy)
         self.photo_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectItems)
         self.photo_table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.photo_table.setEditTriggers(
             QAbstractItemView.EditTrigger.DoubleClicked | QAbstractItemView.EditTrigger.EditKeyPressed
         )
-
-        columns = [
-            "",
-            "ID",
-            "Thumbnail",
-            "Scene",
-            "Mood",
-            "Subjects",
-            "Location",
-            "Objects",
-            "Status",
-            "IG",
-            "TikTok",
-            "Package",
-            "Tags",
-            "Date Created",
-            "Filepath",
-            "Notes",
-        ]
-        self.photo_table.setColumnCount(len(columns))
-        self.photo_table.setHorizontalHeaderLabels(columns)
-        self.photo_table.setColumnWidth(0, 30)
+        self.photo_table.setItemDelegateForColumn(self.COL_THUMBNAIL, _ThumbnailDelegate(self.photo_table))
+        self.photo_table.setColumnWidth(self.COL_CHECKBOX, 30)
         self.photo_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.photo_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self._apply_row_height()
+        # No sort indicator: rows keep the database order until a header is clicked.
+        self.photo_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
         self.photo_table.setSortingEnabled(True)
 
-        self.photo_table.itemChanged.connect(self.on_table_item_changed)
-        self.photo_table.cellDoubleClicked.connect(self.on_table_cell_double_clicked)
-        self.photo_table.cellClicked.connect(self.debug_log_cell_click)
+        self.photo_table.doubleClicked.connect(
+            lambda index: self.on_table_cell_double_clicked(index.row(), index.column())
+        )
+        self.photo_table.clicked.connect(self._on_index_clicked)
         self.photo_table.viewport().installEventFilter(self.controller)
+        service = getattr(self.controller, 'thumbnail_service', None)
+        if service is not None:
+            service.thumbnail_ready.connect(self.photo_model.on_thumbnail_ready)
+            # Queued thumbnails of rows scrolled out of view are dropped.
+            self.photo_table.verticalScrollBar().valueChanged.connect(
+                lambda _value: service.viewport_changed('library')
+            )
+            self.photo_model.modelReset.connect(lambda: service.viewport_changed('library'))
 
         layout.addWidget(self.photo_table)
 
@@ -407,133 +725,87 @@ class PhotosTab(QWidget):
         self._search_timer.start(250)
 
     def _apply_search_filter(self):
-        """Re-render the table applying the current search query without a full DB reload."""
-        self.refresh()
+        """Re-filter the loaded rows with the current search query without a DB reload."""
+        self.photo_proxy.set_query(self._search_query)
 
     # ── Data loading ────────────────────────────────────────────────────
 
     def refresh(self):
         """Reload all photos and repopulate table, respecting the active search query."""
         self._refresh_batch_settings_label()
-        self.photo_table.setRowCount(0)
-        photos = self.controller.db.get_all_photos()
-
-        # Apply in-memory search filter when query is present
-        q = self._search_query
-        if q:
-            _search_fields = (
-                'filename', 'ai_caption', 'suggested_hashtags', 'tags',
-                'objects_detected', 'location', 'subjects', 'scene_type',
-                'mood', 'notes', 'exif_camera', 'package_name',
-            )
-            photos = [
-                p for p in photos
-                if any(q in str(p.get(f) or '').lower() for f in _search_fields)
-            ]
-
-        for i, photo in enumerate(photos):
-            self.photo_table.insertRow(i)
-            self.photo_table.setRowHeight(i, self.thumbnail_sizes[self.current_thumb_size])
-
-            # Checkbox column
-            checkbox_widget = QWidget()
-            checkbox_layout = QHBoxLayout(checkbox_widget)
-            cb = QCheckBox()
-            cb.setProperty("photo_id", photo["id"])
-            cb.stateChanged.connect(self.controller.on_row_checkbox_toggled)
-            checkbox_layout.addWidget(cb)
-            checkbox_layout.setContentsMargins(0, 0, 0, 0)
-            self.photo_table.setCellWidget(i, self.COL_CHECKBOX, checkbox_widget)
-
-            # ID
-            id_item = QTableWidgetItem(str(photo["id"]))
-            id_item.setFlags(id_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.photo_table.setItem(i, self.COL_ID, id_item)
-
-            # Thumbnail
-            thumb_label = QLabel()
-            thumb_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            if photo["filepath"] and os.path.exists(photo["filepath"]):
-                pixmap = self.controller.get_cached_thumbnail(photo["filepath"], 60)
-                if pixmap and not pixmap.isNull():
-                    thumb_label.setPixmap(pixmap)
-                else:
-                    thumb_label.setText("[No Preview]")
-            else:
-                thumb_label.setText("[Missing]")
-            self.photo_table.setCellWidget(i, self.COL_THUMBNAIL, thumb_label)
-
-            # AI metadata columns
-            self.photo_table.setItem(i, self.COL_SCENE, QTableWidgetItem(photo.get("scene_type") or ""))
-            self.photo_table.setItem(i, self.COL_MOOD, QTableWidgetItem(photo.get("mood") or ""))
-            self.photo_table.setItem(i, self.COL_SUBJECTS, QTableWidgetItem(photo.get("subjects") or ""))
-            self.photo_table.setItem(i, self.COL_LOCATION, QTableWidgetItem(photo.get("location") or ""))
-            self.photo_table.setItem(i, self.COL_OBJECTS, QTableWidgetItem(photo.get("objects_detected") or ""))
-
-            # Status
-            status_text = photo["status"] or "raw"
-            self.photo_table.setItem(i, self.COL_STATUS, QTableWidgetItem(status_text))
-
-            # Platform toggles
-            ig_item = QTableWidgetItem("✓" if photo.get("released_instagram") else "")
-            self.photo_table.setItem(i, self.COL_IG, ig_item)
-
-            tt_item = QTableWidgetItem("✓" if photo.get("released_tiktok") else "")
-            self.photo_table.setItem(i, self.COL_TIKTOK, tt_item)
-
-            packages = self.controller.db.get_packages(photo["id"])
-            package_display = ", ".join(packages) if packages else (photo.get("package_name") or "")
-            self.photo_table.setItem(i, self.COL_PACKAGE, QTableWidgetItem(package_display))
-
-            self.photo_table.setItem(i, self.COL_TAGS, QTableWidgetItem(photo["tags"] or ""))
+        self.show_rows(self.controller.db.get_library_rows())
+        self.controller.refresh_tag_cloud()
 
-            raw_date = str(photo["date_created"] or "")
-            if "." in raw_date:
-                raw_date = raw_date.split(".")[0]
-            date_item = QTableWidgetItem(raw_date)
-            date_item.setFlags(date_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.photo_table.setItem(i, self.COL_DATE, date_item)
+    def show_rows(self, rows: list):
+        """Replace the table contents with rows from ``get_library_rows``."""
+        self.photo_proxy.set_query(self._search_query)
+        self.photo_model.set_rows(rows)
+
+    def refresh_rows(self, photo_ids):
+        """Re-read the given photos from the database and update their rows in place.
+
+        Photos not yet in the table are appended.
+        """
+        photo_ids = list(photo_ids)
+        if photo_ids:
+            self.photo_model.upsert_rows(self.controller.db.get_library_rows(photo_ids=photo_ids))
+
+    def _load_thumbnail(self, filepath: str, size: int, version=None):
+        request = getattr(self.controller, 'request_thumbnail', None)
+        if request is not None:
+            return request(filepath, size, 'library', version)
+        if not os.path.exists(filepath):
+            return '[Missing]'
+        return self.controller.get_cached_thumbnail(filepath, size, version) or '[No Preview]'
+
+    def _commit_cell_edit(self, photo_id: int, field: str, value):
+        """Persist an edit made through the table model."""
+        if field == "package_name":
+            self.controller.db.set_packages(photo_id, value)
+        else:
+            self.controller.db.update_photo_metadata(photo_id, {field: value})
 
-            filepath_item = QTableWidgetItem(photo["filepath"] or "")
-            filepath_item.setToolTip(photo["filepath"] or "No path")
-            self.photo_table.setItem(i, self.COL_FILEPATH, filepath_item)
+    def _apply_row_height(self):
+        size = self.thumbnail_sizes[self.current_thumb_size]
+        header = self.photo_table.verticalHeader()
+        header.setDefaultSectionSize(size + 10 if size > 0 else header.minimumSectionSize() + 8)
 
-            self.photo_table.setItem(i, self.COL_NOTES, QTableWidgetItem(photo.get("notes") or ""))
+    # ── Row helpers (rows are view rows, i.e. after sorting/search) ─────
 
-        self.photo_table.setSortingEnabled(True)
-        self.controller.refresh_tag_cloud()
+    def row_data(self, row: int) -> dict | None:
+        """Return the projected row dict shown at view ``row``."""
+        source = self.photo_proxy.mapToSource(self.photo_proxy.index(row, 0))
+        return self.photo_model.row_data(source.row()) if source.isValid() else None
 
-    def on_table_item_changed(self, item):
-        """Handle edits to table cells."""
-        row = item.row()
-        col = item.column()
-        photo_id = self.get_photo_id_from_row(row)
-        if photo_id is None:
-            return
+    def get_photo_id_from_row(self, row: int) -> int:
+        """Extract photo ID from table row."""
+        data = self.row_data(row)
+        return data['id'] if data else None
 
-        field_map = {
-            self.COL_SCENE: "scene_type",
-            self.COL_MOOD: "mood",
-            self.COL_SUBJECTS: "subjects",
-            self.COL_LOCATION: "location",
-            self.COL_OBJECTS: "objects_detected",
-            self.COL_STATUS: "status",
-            self.COL_PACKAGE: "package_name",
-            self.COL_TAGS: "tags",
-            self.COL_NOTES: "notes",
-        }
+    def selected_photo_ids(self) -> list:
+        """Return IDs of rows with at least one selected cell, in view order."""
+        rows = sorted({idx.row() for idx in self.photo_table.selectionModel().selectedIndexes()})
+        ids = []
+        for row in rows:
+            pid = self.get_photo_id_from_row(row)
+            if pid is not None:
+                ids.append(pid)
+        return ids
 
-        field = field_map.get(col)
-        if field:
-            self.controller.db.update_photo_metadata(photo_id, {field: item.text()})
+    def _on_index_clicked(self, index):
+        if index.column() == self.COL_THUMBNAIL:
+            data = self.row_data(index.row())
+            if data and hasattr(self.controller, 'show_full_image'):
+                self.controller.show_full_image(data.get('filepath'), data['id'])
+        self.debug_log_cell_click(index.row(), index.column())
 
     def on_table_cell_double_clicked(self, row: int, col: int):
         """Open the folder when package cell is double-clicked."""
         try:
             if col == self.COL_PACKAGE:
-                fp_item = self.photo_table.item(row, self.COL_FILEPATH)
-                if fp_item:
-                    path = fp_item.text()
+                data = self.row_data(row)
+                if data:
+                    path = data.get("filepath") or ""
                     folder = os.path.dirname(path)
                     if folder and os.path.isdir(folder):
                         os.startfile(folder)
@@ -543,24 +815,12 @@ class PhotosTab(QWidget):
     def debug_log_cell_click(self, row: int, col: int):
         """Log cell clicks for debugging."""
         try:
-            photo_id = self.get_photo_id_from_row(row)
-            header_item = self.photo_table.horizontalHeaderItem(col)
-            header = header_item.text() if header_item else "<no header>"
+            header = self.photo_model.HEADERS[col] if 0 <= col < len(self.photo_model.HEADERS) else "<no header>"
             if self.controller.statusBar():
                 self.controller.statusBar().showMessage(f"Clicked r{row} c{col} [{header}]", 2000)
         except Exception as exc:
             print(f"debug_log_cell_click error: {exc}")
 
-    def get_photo_id_from_row(self, row: int) -> int:
-        """Extract photo ID from table row."""
-        try:
-            id_item = self.photo_table.item(row, self.COL_ID)
-            if id_item:
-                return int(id_item.text())
-        except (ValueError, AttributeError):
-            pass
-        return None
-
     def toggle_thumbnail_size(self):
         """Toggle thumbnail size between small, medium, large."""
         sizes = ["small", "medium", "large"]
@@ -568,9 +828,8 @@ class PhotosTab(QWidget):
         self.current_thumb_size = sizes[(idx + 1) % len(sizes)]
         self.thumb_btn.setText(f"Thumbnails: {self.current_thumb_size.title()}")
 
-        row_height = self.thumbnail_sizes[self.current_thumb_size]
-        for i in range(self.photo_table.rowCount()):
-            self.photo_table.setRowHeight(i, row_height)
+        self.photo_model.set_thumb_size(self.thumbnail_sizes[self.current_thumb_size])
+        self._apply_row_height()
 
     def apply_package(self):
         """Apply batch package name to selected photos."""
@@ -788,16 +1047,25 @@ class PhotosTab(QWidget):
 
     def reanalyze_selected(self):
         """Trigger re-analysis of selected photos."""
-        from nova_manager import ReanalyzerThread
-
         target_ids = self.get_target_photo_ids()
         if not target_ids:
             QMessageBox.information(self, "No Selection", "Please select photos first")
             return
 
         photos_to_reanalyze = [self.controller.db.get_photo(pid) for pid in target_ids if self.controller.db.get_photo(pid)]
+        # Results for unchanged photos and prompts come from the AI cache; Shift forces new calls.
+        force = bool(QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier)
+        self._start_reanalyzer(photos_to_reanalyze, force)
+
+    def resume_reanalysis(self):
+        """Finish re-analysis jobs left over from an interrupted run."""
+        self._start_reanalyzer([])
+
+    def _start_reanalyzer(self, photos_to_reanalyze, force=False):
+        from nova_manager import ReanalyzerThread
 
-        self.controller.reanalyzer_thread = ReanalyzerThread(photos_to_reanalyze, self.controller.db.db_path)
+        self.controller.reanalyzer_thread = ReanalyzerThread(photos_to_reanalyze, self.controller.db.db_path,
+                                                             force=force)
         self.controller.reanalyzer_thread.progress.connect(self.on_reanalyze_progress)
         self.controller.reanalyzer_thread.finished.connect(self.on_reanalyze_finished)
         self.controller.reanalyzer_thread.error.connect(self.on_reanalyze_error)
@@ -841,67 +1109,19 @@ class PhotosTab(QWidget):
         if not ok or not value:
             return
 
-        self.photo_table.blockSignals(True)
-        updated_rows: set[int] = set()
-        for index in self.photo_table.selectedIndexes():
-            item = self.photo_table.item(index.row(), index.column())
-            if item:
-                item.setText(value)
-                updated_rows.add(index.row())
-        self.photo_table.blockSignals(False)
-
-        # Persist each changed row to the database via on_table_item_changed logic
-        field_map = {
-            self.COL_SCENE: "scene_type",
-            self.COL_MOOD: "mood",
-            self.COL_SUBJECTS: "subjects",
-            self.COL_LOCATION: "location",
-            self.COL_OBJECTS: "objects_detected",
-            self.COL_STATUS: "status",
-            self.COL_PACKAGE: "package_name",
-            self.COL_TAGS: "tags",
-            self.COL_NOTES: "notes",
-        }
-        cols_in_selection = {idx.column() for idx in self.photo_table.selectedIndexes()}
-        for row in updated_rows:
-            photo_id = self.get_photo_id_from_row(row)
-            if photo_id is None:
-                continue
-            updates = {}
-            for col in cols_in_selection:
-                field = field_map.get(col)
-                if field:
-                    updates[field] = value
-            if updates:
-                self.controller.db.update_photo_metadata(photo_id, updates)
+        # setData persists each edit through _commit_cell_edit; read-only
+        # columns reject it.
+        for index in self.photo_table.selectionModel().selectedIndexes():
+            if index.flags() & Qt.ItemFlag.ItemIsEditable:
+                self.photo_proxy.setData(index, value, Qt.ItemDataRole.EditRole)
 
     def get_target_photo_ids(self) -> list:
         """Get checked or selected photo IDs."""
-        ids = []
-        seen = set()
-
         # Prefer checked rows if any are checked.
-        for row in range(self.photo_table.rowCount()):
-            widget = self.photo_table.cellWidget(row, self.COL_CHECKBOX)
-            if not widget:
-                continue
-            cb = widget.findChild(QCheckBox)
-            if cb and cb.isChecked():
-                pid = self.get_photo_id_from_row(row)
-                if pid is not None and pid not in seen:
-                    seen.add(pid)
-                    ids.append(pid)
-
+        ids = [pid for pid in self.photo_model.photo_ids() if pid in self.persistent_selected_ids]
         if ids:
             return ids
-
-        rows = {it.row() for it in self.photo_table.selectedItems()}
-        ids = []
-        for r in rows:
-            pid = self.get_photo_id_from_row(r)
-            if pid is not None:
-                ids.append(pid)
-        return ids
+        return self.selected_photo_ids()
 
     def _capture_undo_snapshot(self, photo_ids, fields, label=None):
         """Capture previous values for multi-step batch undo."""
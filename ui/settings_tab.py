@@ -15,6 +15,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QSize, QThread, pyqtSignal
 from core.icons import icon as _icon
+from core.ai_analyzer import AI_IMAGE_QUALITY, AI_IMAGE_SIZE
+from core.analyzer_service import DEFAULT_MAX_CONCURRENCY
 from PyQt6.QtGui import QFont
 
 
@@ -392,6 +394,32 @@ class SettingsTab(QWidget):
         self.ollama_model = QLineEdit()
         self.ollama_model.setPlaceholderText('llava:latest (default)')
         ai_layout.addRow('Model:', self.ollama_model)
+        self.ollama_parallel = QSpinBox()
+        self.ollama_parallel.setRange(1, 16)
+        self.ollama_parallel.setValue(DEFAULT_MAX_CONCURRENCY)
+        self.ollama_parallel.setToolTip(
+            'Most Ollama calls to run at once (match OLLAMA_NUM_PARALLEL on the host).\n'
+            'Analysis adapts below this limit when the host slows down.'
+        )
+        ai_layout.addRow('Parallel requests:', self.ollama_parallel)
+        self.ollama_image_size = QSpinBox()
+        self.ollama_image_size.setRange(256, 4096)
+        self.ollama_image_size.setSingleStep(128)
+        self.ollama_image_size.setSuffix(' px')
+        self.ollama_image_size.setValue(AI_IMAGE_SIZE)
+        self.ollama_image_size.setToolTip('Longest side of the JPEG sent to the model.')
+        ai_layout.addRow('Image size:', self.ollama_image_size)
+        self.ollama_image_quality = QSpinBox()
+        self.ollama_image_quality.setRange(50, 100)
+        self.ollama_image_quality.setValue(AI_IMAGE_QUALITY)
+        ai_layout.addRow('JPEG quality:', self.ollama_image_quality)
+        self.ollama_stream = QCheckBox('Stream responses')
+        self.ollama_stream.setChecked(True)
+        self.ollama_stream.setToolTip(
+            'Read the reply as it is generated and stop the model as soon as\n'
+            'the JSON answer is complete.'
+        )
+        ai_layout.addRow('', self.ollama_stream)
         layout.addWidget(ai_group)
 
         ai_btn_row = QHBoxLayout()
@@ -470,6 +498,10 @@ class SettingsTab(QWidget):
             ai = self.controller.db.get_credentials('ollama') or {}
             self.ollama_url.setText(ai.get('url', ''))
             self.ollama_model.setText(ai.get('model', ''))
+            self.ollama_parallel.setValue(int(ai.get('parallel') or DEFAULT_MAX_CONCURRENCY))
+            self.ollama_image_size.setValue(int(ai.get('image_size') or AI_IMAGE_SIZE))
+            self.ollama_image_quality.setValue(int(ai.get('image_quality') or AI_IMAGE_QUALITY))
+            self.ollama_stream.setChecked(bool(ai.get('stream', True)))
         except Exception:
             pass
         # Watch folder settings
@@ -628,7 +660,11 @@ class SettingsTab(QWidget):
             QMessageBox.critical(self, 'Error', str(e))
 
     def _save_ai(self):
-        ai = {'url': self.ollama_url.text().strip(), 'model': self.ollama_model.text().strip()}
+        ai = {'url': self.ollama_url.text().strip(), 'model': self.ollama_model.text().strip(),
+              'parallel': self.ollama_parallel.value(),
+              'image_size': self.ollama_image_size.value(),
+              'image_quality': self.ollama_image_quality.value(),
+              'stream': self.ollama_stream.isChecked()}
         try:
             self.controller.db.save_credentials('ollama', ai)
             if self.controller.statusBar():
@@ -683,42 +719,19 @@ class SettingsTab(QWidget):
         except Exception:
             pass
 
-        try:
-            from core.folder_watcher import FolderWatcher
-            watcher = FolderWatcher(
-                folder=folder,
-                db=controller.db,
-                interval_secs=self.watcher_interval_spin.value(),
-                include_subfolders=self.watch_subfolders_cb.isChecked(),
-            )
-            watcher.new_photo_found.connect(self._on_new_photo)
-            watcher.status_update.connect(self.watcher_status.setText)
-            watcher.start()
-            controller._folder_watcher = watcher
-            self.start_watcher_btn.setText('Stop Watcher')
-            self.watcher_status.setText(f'Watching: {folder}')
-        except Exception as e:
-            QMessageBox.warning(self, 'Watcher Error', str(e))
-
-    def _on_new_photo(self, filepath: str):
-        """Handle a newly discovered file from the folder watcher."""
-        try:
-            from pathlib import Path
-            db = self.controller.db
-            if db.get_photo_by_path(filepath):
-                return  # Already in DB
-            db.add_photo(filepath, {})
-            if self.controller.statusBar():
-                self.controller.statusBar().showMessage(
-                    f'Auto-imported: {Path(filepath).name}', 3000
-                )
-            # Refresh gallery if available
-            try:
-                self.controller.gallery_tab.refresh()
-            except Exception:
-                pass
-        except Exception as e:
-            print(f'[Watcher] Import error: {e}')
+        # Same watcher as the main window's: it imports and tracks
+        # duplicates on its own thread, then refreshes the views once per batch.
+        watcher = controller._start_folder_watcher(
+            folder,
+            interval_secs=self.watcher_interval_spin.value(),
+            include_subfolders=self.watch_subfolders_cb.isChecked(),
+        )
+        if watcher is None:
+            QMessageBox.warning(self, 'Watcher Error', f'Could not start watching {folder}.')
+            return
+        watcher.status_update.connect(self.watcher_status.setText)
+        self.start_watcher_btn.setText('Stop Watcher')
+        self.watcher_status.setText(f'Watching: {folder}')
 
     # ── Public helpers used by other tabs ────────────────────────
 